@@ -1,10 +1,28 @@
-from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for
+from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, Response, stream_with_context, g
 import json
+import math
 import os
+import random
+from functools import wraps
 from datetime import datetime
 from config import Config
-from models import Client, GSTReturn
-from database import create_database_tables
+from models import Client, GSTReturn, RowVersionConflict, return_data_unchanged
+from periods import get_calendar
+from overdue import OverdueTracker, current_financial_year
+from changefeed import ChangeFeed
+from pubsub import Broker, RESYNC
+from database import create_database_file, create_database_tables, create_database_indexes, get_pool
+from tenants import TenantScoped, UnknownTenant, current_tenant, set_tenant, reset_tenant, tenant_ids, use_tenant
+from records import format_record, CLIENT_LIST, CLIENT_SUMMARY, RETURN_GRID
+from reports import ReturnStatusReport
+from archive import get_archive
+from backup import BackupManager, SNAPSHOT, INCREMENTAL
+from throughput import ThroughputRollups
+from gstin import normalize_gstin, validate_gstin
+from client_import import ClientImport, MODE_INSERT
+from coalesce import SingleFlight
+from ratelimit import RateLimiter
+from profiling import StackSampler, ProfileStore
 import openpyxl
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from werkzeug.utils import secure_filename
@@ -13,22 +31,111 @@ import tempfile
 app = Flask(__name__)
 app.config.from_object(Config)
 
-# Ensure database tables exist
-create_database_tables()
-
-# Initialize models
-client_model = Client()
-gst_return_model = GSTReturn()
+# Initialize models; each firm (tenant) gets its own instances on first use
+client_model = TenantScoped(Client)
+gst_return_model = TenantScoped(GSTReturn)
+change_feed = TenantScoped(ChangeFeed)
+overdue_tracker = TenantScoped(lambda: OverdueTracker(change_feed.get()))
+throughput_rollups = TenantScoped(lambda: ThroughputRollups(change_feed.get(), overdue_tracker.get()))
+return_broker = Broker(Config.SSE_QUEUE_SIZE)
+dashboard_flight = SingleFlight(ttl=Config.DASHBOARD_CACHE_SECONDS)
+dashboard_limiter = RateLimiter(Config.DASHBOARD_RATE_PER_SECOND, Config.DASHBOARD_RATE_BURST)
+profile_store = ProfileStore()
+
+# Ensure every tenant's database and tables exist
+for tenant in tenant_ids():
+    with use_tenant(tenant):
+        if create_database_file():
+            create_database_tables()
+            create_database_indexes()
+            client_model.vault.migrate_plaintext()
+
+@app.before_request
+def select_tenant():
+    """Work on the firm named by the X-Tenant-ID header or the tenant cookie"""
+    tenant = request.headers.get('X-Tenant-ID') or request.cookies.get('tenant') or Config.DEFAULT_TENANT
+    try:
+        g.tenant_token = set_tenant(tenant)
+    except UnknownTenant as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+
+@app.teardown_request
+def release_tenant(exception=None):
+    token = g.pop('tenant_token', None)
+    if token is not None:
+        reset_tenant(token)
+
+@app.before_request
+def start_profile():
+    """Sample this request's stack when picked at random or, if PROFILE_ON_REQUEST is set, asked to"""
+    requested = request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1'
+    if ((Config.PROFILE_ON_REQUEST and requested)
+            or (Config.PROFILE_SAMPLE_RATE and random.random() < Config.PROFILE_SAMPLE_RATE)):
+        g.profile_sampler = StackSampler().start()
+
+def finish_profile():
+    """Stop the request's sampler, if any, and store its profile; returns the file name"""
+    sampler = g.pop('profile_sampler', None)
+    if sampler is None:
+        return None
+    sampler.stop()
+    return profile_store.save(request.endpoint, request.method, sampler)
+
+@app.after_request
+def attach_profile(response):
+    name = finish_profile()
+    if name:
+        response.headers['X-Profile-File'] = name
+    return response
+
+@app.teardown_request
+def discard_profile(exception=None):
+    finish_profile()  # requests that failed before after_request
+
+@app.context_processor
+def inject_tenants():
+    return {'tenants': tenant_ids(), 'current_tenant': current_tenant()}
+
+def rate_limited(limiter):
+    """Answer 429 with Retry-After once the calling client exceeds `limiter`"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            retry_after = limiter.check(request.remote_addr)
+            if retry_after is not None:
+                response = jsonify({'success': False, 'error': 'Too many requests, please retry shortly'})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(math.ceil(retry_after))
+                return response
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
 
 @app.route('/')
 def index():
     """Main dashboard page"""
     return render_template('index.html')
 
+@app.route('/api/tenants', methods=['GET'])
+def get_tenants():
+    """API endpoint listing the configured tenants and the one in use"""
+    return jsonify({'success': True, 'data': tenant_ids(), 'current': current_tenant()})
+
+@app.route('/api/tenants', methods=['POST'])
+def choose_tenant():
+    """API endpoint switching the browser to another tenant (stored in the tenant cookie)"""
+    tenant = (request.json or {}).get('tenant')
+    if tenant not in tenant_ids():
+        return jsonify({'success': False, 'error': f'Unknown tenant: {tenant}'})
+    
+    response = jsonify({'success': True, 'current': tenant})
+    response.set_cookie('tenant', tenant, samesite='Lax')
+    return response
+
 @app.route('/master_data')
 def master_data():
     """Master data management page"""
-    clients = client_model.get_all_clients()
+    clients = client_model.get_all_clients(fields=CLIENT_LIST)
     return render_template('master_data.html', 
                          clients=clients,
                          taxpayer_types=Config.TAXPAYER_TYPES)
@@ -45,28 +152,28 @@ def gst_returns():
         gst_returns_json=json.dumps(Config.GST_RETURNS)
     )
 
+def format_client(client):
+    """JSON representation of a client record (credentials are fetched separately)"""
+    return format_record(client)
+
+def check_gstin(data, client_code=None):
+    """Normalize data['gstin'] in place; returns an error message if it is invalid or taken by another client"""
+    data['gstin'] = normalize_gstin(data.get('gstin'))
+    error = validate_gstin(data['gstin'])
+    if error:
+        return error
+    
+    holder = client_model.get_client_by_gstin(data['gstin'], fields=CLIENT_SUMMARY)
+    if holder and holder.client_code != client_code:
+        return f"GSTIN {data['gstin']} already belongs to client {holder.client_code} ({holder.client_name})"
+    return None
+
 @app.route('/api/clients', methods=['GET'])
 def get_clients():
     """API endpoint to get all clients"""
     try:
         clients = client_model.get_all_clients()
-        clients_data = []
-        for client in clients:
-            clients_data.append({
-                'client_code': client[0],
-                'client_name': client[1],
-                'date_of_registration': client[2].strftime('%Y-%m-%d') if client[2] else None,
-                'effective_date_of_cancellation': client[3].strftime('%Y-%m-%d') if client[3] else None,
-                'gstin': client[4],
-                'taxpayer_type': client[5],
-                'gst_portal_userid': client[6],
-                'gst_portal_password': client[7],
-                'eway_bill_userid': client[8],
-                'eway_bill_password': client[9],
-                'client_email_id': client[10],
-                'mobile_no': client[11],
-                'email_password': client[12]
-            })
+        clients_data = [format_client(client) for client in clients]
         return jsonify({'success': True, 'data': clients_data})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
@@ -86,6 +193,10 @@ def create_client():
             if not data.get(field):
                 return jsonify({'success': False, 'error': f'Missing required field: {field}'})
         
+        error = check_gstin(data)
+        if error:
+            return jsonify({'success': False, 'error': error})
+        
         # Convert date strings to date objects
         if data.get('date_of_registration'):
             data['date_of_registration'] = datetime.strptime(data['date_of_registration'], '%Y-%m-%d').date()
@@ -108,13 +219,26 @@ def update_client(client_code):
     try:
         data = request.json
         
+        error = check_gstin(data, client_code)
+        if error:
+            return jsonify({'success': False, 'error': error})
+        
         # Convert date strings to date objects
         if data.get('date_of_registration'):
             data['date_of_registration'] = datetime.strptime(data['date_of_registration'], '%Y-%m-%d').date()
         if data.get('effective_date_of_cancellation'):
             data['effective_date_of_cancellation'] = datetime.strptime(data['effective_date_of_cancellation'], '%Y-%m-%d').date()
         
-        success = client_model.update_client(client_code, data)
+        try:
+            success = client_model.update_client(client_code, data)
+        except RowVersionConflict as conflict:
+            current = format_client(conflict.current) if conflict.current else None
+            return jsonify({
+                'success': False,
+                'conflict': True,
+                'error': 'This client was updated by someone else. Reload it and apply your changes again.',
+                'current': current
+            }), 409
         
         if success:
             return jsonify({'success': True, 'message': 'Client updated successfully'})
@@ -124,6 +248,19 @@ def update_client(client_code):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/clients/<int:client_code>/credentials', methods=['GET'])
+def get_client_credentials(client_code):
+    """API endpoint to reveal a client's decrypted passwords (audited)"""
+    try:
+        credentials = client_model.vault.get_credentials(
+            client_code,
+            accessed_by=request.remote_addr,
+            purpose=request.args.get('purpose', 'view')
+        )
+        return jsonify({'success': True, 'data': credentials})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
 @app.route('/api/clients/<int:client_code>', methods=['DELETE'])
 def delete_client(client_code):
     """API endpoint to delete client"""
@@ -140,6 +277,7 @@ def delete_client(client_code):
 
 
 @app.route('/api/return_dashboard', methods=['POST'])
+@rate_limited(dashboard_limiter)
 def get_return_dashboard():
     try:
         data = request.json
@@ -148,53 +286,131 @@ def get_return_dashboard():
         month = data.get('month')
         quarter = data.get('quarter')
 
-        MONTH_SHORT_MAP = {
-            "January": "Jan", "February": "Feb", "March": "Mar",
-            "April": "Apr", "May": "May", "June": "Jun",
-            "July": "Jul", "August": "Aug", "September": "Sep",
-            "October": "Oct", "November": "Nov", "December": "Dec",
-            # Also include 3-letter codes for idempotency
-            "Jan": "Jan", "Feb": "Feb", "Mar": "Mar", "Apr": "Apr", "May": "May",
-            "Jun": "Jun", "Jul": "Jul", "Aug": "Aug", "Sep": "Sep", "Oct": "Oct", "Nov": "Nov", "Dec": "Dec"
-        }
-
-        def get_period_year_from_financial_year(month, financial_year):
-            fy_start_year = int(financial_year.split('-')[0])
-            if month in ['Jan', 'Feb', 'Mar']:
-                return fy_start_year + 1  # Jan-Mar: next calendar year
-            else:
-                return fy_start_year
-        
-        def get_period_year_from_financial_year_for_quartely(quarter, financial_year):
-            fy_start_year = int(financial_year.split('-')[0])
-            if quarter in ['Jan-Mar']:
-                return fy_start_year + 1  # Jan-Mar: next calendar year
-            else:
-                return fy_start_year
-
-        # Convert month to three-letter code
-        month_short = MONTH_SHORT_MAP.get(month, month)
-
-        if frequency == 'Monthly':
-            period_year = get_period_year_from_financial_year(month_short, financial_year)
-            period = f"{month_short}-{period_year}"
-        elif frequency == 'Quarterly':
-            month_short = MONTH_SHORT_MAP.get(quarter[-3:], quarter[-3:])
-            period_year = get_period_year_from_financial_year(month_short, financial_year)
-            period = f"{month_short}-{period_year}"
-        elif frequency == 'Annually':
-            period = financial_year
-        else:
+        period = get_calendar().period_for(frequency, financial_year, month=month, quarter=quarter)
+        if period is None:
             return jsonify({'success': False, 'error': 'Invalid frequency'})
 
-        dashboard_data = {}
-        for return_type, return_config in Config.GST_RETURNS.items():
-            if return_config['frequency'] == frequency:
-                dashboard_data[return_type] = gst_return_model.get_return_dashboard_data(return_type, period)
+        # Keyed on the resolved period, so every way of asking for it shares one result
+        dashboard_data = dashboard_flight.do(
+            (current_tenant(), frequency, period), lambda: return_dashboard_counts(frequency, period))
 
         return jsonify({'success': True, 'data': dashboard_data, 'period': period})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
+
+def return_dashboard_counts(frequency, period):
+    """Filing counts of every return type of a frequency for one period"""
+    return {return_type: overdue_tracker.get_counts(return_type, period)
+            for return_type, return_config in Config.GST_RETURNS.items()
+            if return_config['frequency'] == frequency}
+
+@app.route('/api/profiles', methods=['GET'])
+def list_profiles():
+    """API endpoint listing stored request profiles, newest first"""
+    try:
+        return jsonify({'success': True, 'data': profile_store.list_profiles()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/profiles/<name>', methods=['GET'])
+def download_profile(name):
+    """Download one collapsed-stack profile (input for flamegraph.pl or speedscope)"""
+    path = profile_store.path_for(name)
+    if path is None:
+        return jsonify({'success': False, 'error': 'Profile not found'}), 404
+    return send_file(path, as_attachment=True, download_name=name, mimetype='text/plain')
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """API endpoint with dashboard coalescing/rate-limit counters and the tenant's connection pool usage"""
+    return jsonify({'success': True, 'data': {
+        'return_dashboard': {
+            'coalescing': dashboard_flight.metrics(),
+            'rate_limit': dashboard_limiter.metrics()
+        },
+        'db_pool': get_pool().stats()
+    }})
+        
+
+@app.route('/api/overdue', methods=['GET'])
+def get_overdue():
+    """API endpoint for overdue, due-soon and late-filed returns in a financial year"""
+    try:
+        financial_year = request.args.get('financial_year') or current_financial_year()
+        within_days = request.args.get('within_days', type=int)
+        return_type = request.args.get('return_type')
+        as_of = request.args.get('as_of')
+        if as_of:
+            as_of = datetime.strptime(as_of, '%Y-%m-%d').date()
+        
+        data = overdue_tracker.get_overdue(
+            financial_year,
+            as_of=as_of,
+            within_days=within_days,
+            return_types=[return_type] if return_type else None
+        )
+        return jsonify({'success': True, 'data': data})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+        
+
+@app.route('/api/changes', methods=['GET'])
+def get_changes():
+    """API endpoint for the change feed; without `since` only the latest sequence is returned"""
+    try:
+        since = request.args.get('since', type=int)
+        limit = min(request.args.get('limit', 500, type=int), 5000)
+        
+        if since is None:
+            return jsonify({'success': True, 'data': [], 'latest': change_feed.latest_seq()})
+        
+        changes = change_feed.get_changes(since, limit)
+        latest = changes[-1]['seq'] if changes else since
+        return jsonify({'success': True, 'data': changes, 'latest': latest, 'more': len(changes) == limit})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/return_history', methods=['GET'])
+def get_return_history():
+    """API endpoint for the status transitions of one return row"""
+    try:
+        client_code = request.args.get('client_code', type=int)
+        return_type = request.args.get('return_type')
+        period = request.args.get('period')
+        if not client_code or not return_type or not period:
+            return jsonify({'success': False, 'error': 'client_code, return_type and period are required'})
+        
+        data = gst_return_model.history.get_history(client_code, return_type, period)
+        return jsonify({'success': True, 'data': data})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/analytics/throughput', methods=['GET'])
+def get_throughput():
+    """API endpoint for daily filings, backlog burn-down, status mix and status activity in a financial year"""
+    try:
+        data = throughput_rollups.get_throughput(
+            request.args.get('financial_year') or current_financial_year(),
+            return_types=request.args.getlist('return_type') or None,
+            period=request.args.get('period')
+        )
+        return jsonify({'success': True, 'data': data})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/analytics/cycle_time', methods=['GET'])
+def get_cycle_time():
+    """API endpoint for days from one status to another per return type (default Data Received to Filed)"""
+    try:
+        data = gst_return_model.history.cycle_times(
+            from_status=request.args.get('from_status'),
+            to_status=request.args.get('to_status') or Config.RETURN_STATUS[-1],
+            financial_year=request.args.get('financial_year'),
+            return_types=request.args.getlist('return_type') or None
+        )
+        return jsonify({'success': True, 'data': data})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
         
 
 @app.route('/api/return_clients', methods=['POST'])
@@ -206,23 +422,22 @@ def get_return_clients():
         period = data.get('period')
         
         # Get applicable clients
-        clients = gst_return_model.get_applicable_clients(return_type, period)
+        clients = gst_return_model.get_applicable_clients(return_type, period, fields=CLIENT_SUMMARY)
+        
+        # One read of the period's stored rows, joined to the clients in memory
+        stored = gst_return_model.get_period_return_data(return_type, period, fields=RETURN_GRID)
         
         clients_data = []
         for client in clients:
-            # Get return data if exists
-            return_data = gst_return_model.get_return_data(client[0], return_type, period)
+            return_data = stored.get(client.client_code)
             
             client_info = {
-                'client_code': client[0],
-                'client_name': client[1],
-                'gstin': client[2],
-                'period': period,
-                'date_of_filing': return_data[4].strftime('%Y-%m-%d') if return_data and return_data[4] else None,
-                'status': return_data[5] if return_data else 'Data Received',
-                'arn': return_data[6] if return_data else None,
-                'remarks': return_data[7] if return_data else None
+                'client_code': client.client_code,
+                'client_name': client.client_name,
+                'gstin': client.gstin,
+                'period': period
             }
+            client_info.update(format_return_fields(return_data))
             clients_data.append(client_info)
         
         return jsonify({'success': True, 'data': clients_data})
@@ -230,46 +445,213 @@ def get_return_clients():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+def format_return_fields(return_data):
+    """Editable grid fields for a GSTReturnData row (defaults when there is none)"""
+    return {
+        'date_of_filing': return_data.date_of_filing.strftime('%Y-%m-%d') if return_data and return_data.date_of_filing else None,
+        'status': return_data.status if return_data else 'Data Received',
+        'arn': return_data.arn if return_data else None,
+        'remarks': return_data.remarks if return_data else None,
+        'row_version': (return_data.row_version or 0) if return_data else 0
+    }
+
+def prepare_return_data(data):
+    """Convert and validate a return row in place; returns an error message or None"""
+    # Convert date string to date object
+    if data.get('date_of_filing') and isinstance(data['date_of_filing'], str):
+        data['date_of_filing'] = datetime.strptime(data['date_of_filing'], '%Y-%m-%d').date()
+    
+    if data.get('status') not in Config.RETURN_STATUS:
+        return f"Unknown status: {data.get('status')}"
+    
+    # ✅ Validation: ARN required if status is Filed
+    if data.get('status') == 'Filed':
+        missing_fields = []
+        if not data.get('arn'):
+            missing_fields.append('ARN')
+        if not data.get('date_of_filing'):
+            missing_fields.append('Date of Filing')
+
+        if missing_fields:
+            missing_str = ' and '.join(missing_fields)
+            return f'{missing_str} required.'
+    return None
+
 @app.route('/api/save_return_data', methods=['POST'])
 def save_return_data():
     """API endpoint to save return data"""
     try:
         data = request.json
         
-        # Convert date string to date object
-        if data.get('date_of_filing'):
-            data['date_of_filing'] = datetime.strptime(data['date_of_filing'], '%Y-%m-%d').date()
-        
-        # ✅ Validation: ARN required if status is Filed
-        if data.get('status') == 'Filed':
-            missing_fields = []
-            if not data.get('arn'):
-                missing_fields.append('ARN')
-            if not data.get('date_of_filing'):
-                missing_fields.append('Date of Filing')
-
-            if missing_fields:
-                missing_str = ' and '.join(missing_fields)
-                return jsonify({
-                    'success': False, 
-                    'error': f'{missing_str} required.'
-                })
-        
-        success = gst_return_model.save_return_data(data)
-        
-        if success:
-            return jsonify({'success': True, 'message': 'Return data saved successfully'})
+        error = prepare_return_data(data)
+        if error:
+            return jsonify({'success': False, 'error': error})
+        
+        existing = gst_return_model.get_return_data(data['client_code'], data['return_type'], data['period'])
+        if return_data_unchanged(existing, data):
+            current_version = (existing.row_version or 0) if existing else 0
+            return jsonify({'success': True, 'unchanged': True, 'message': 'No changes to save', 'row_version': current_version})
+        
+        try:
+            row_version = gst_return_model.save_return_data(data, existing=existing)
+        except RowVersionConflict as conflict:
+            return jsonify({
+                'success': False,
+                'conflict': True,
+                'error': 'This return was updated by someone else. Review the current values and save again.',
+                'current': format_return_fields(conflict.current)
+            }), 409
+        
+        if row_version:
+            data['row_version'] = row_version
+            publish_return_update(data)
+            return jsonify({'success': True, 'message': 'Return data saved successfully', 'row_version': row_version})
         else:
             return jsonify({'success': False, 'error': 'Failed to save return data'})
             
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/save_return_data_bulk', methods=['POST'])
+def save_return_data_bulk():
+    """API endpoint to save many return rows; each row succeeds or conflicts on its own
+    
+    Stored values are read once for the whole period and rows that would not
+    change anything are reported as 'unchanged' without being written. The
+    rest are saved in a single transaction.
+    """
+    try:
+        data = request.json
+        return_type = data.get('return_type')
+        period = data.get('period')
+        
+        stored = gst_return_model.get_period_return_data(return_type, period)
+        results = []
+        to_save = []
+        for row in data.get('rows', []):
+            row['return_type'] = return_type
+            row['period'] = period
+            result = {'client_code': row.get('client_code')}
+            results.append(result)
+            
+            error = prepare_return_data(row)
+            if error:
+                result.update({'result': 'error', 'error': error})
+                continue
+            
+            existing = stored.get(row.get('client_code'))
+            if return_data_unchanged(existing, row):
+                current_version = (existing.row_version or 0) if existing else 0
+                result.update({'result': 'unchanged', 'row_version': current_version})
+                continue
+            to_save.append((row, result))
+        
+        # Everything that changed is written in one transaction
+        saved = gst_return_model.save_return_rows(return_type, period, [row for row, _ in to_save], stored) if to_save else {}
+        for row, result in to_save:
+            outcome = saved.get(row['client_code'])
+            if isinstance(outcome, RowVersionConflict):
+                result.update({'result': 'conflict', 'current': format_return_fields(outcome.current)})
+            elif outcome:
+                row['row_version'] = outcome
+                publish_return_update(row)
+                result.update({'result': 'saved', 'row_version': outcome})
+            else:
+                result.update({'result': 'error', 'error': 'Failed to save return data'})
+        
+        summary = {outcome: sum(1 for r in results if r['result'] == outcome)
+                   for outcome in ('saved', 'unchanged', 'conflict', 'error')}
+        return jsonify({'success': True, 'results': results, 'summary': summary})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/return_status_transition', methods=['POST'])
+def return_status_transition():
+    """API endpoint moving every applicable client of a return type and period from one status to the next
+    
+    Body: return_type, period, from_status, to_status, optional remarks and
+    optional client_codes to limit the selection. Only forward moves in
+    RETURN_STATUS order are allowed.
+    """
+    try:
+        data = request.json
+        for field in ('return_type', 'period', 'from_status', 'to_status'):
+            if not data.get(field):
+                return jsonify({'success': False, 'error': f'Missing required field: {field}'})
+        
+        counts = gst_return_model.transition_status(
+            data['return_type'], data['period'], data['from_status'], data['to_status'],
+            remarks=(data.get('remarks') or '').strip() or None,
+            client_codes=data.get('client_codes')
+        )
+        if counts is None:
+            return jsonify({'success': False, 'error': 'Failed to update return status'})
+        
+        if counts['updated'] or counts['inserted']:
+            # Open grids of this return type and period reload their rows
+            return_broker.publish((current_tenant(), data['return_type'], data['period']), RESYNC)
+            dashboard_flight.invalidate(current_tenant())
+        total = counts['updated'] + counts['inserted']
+        return jsonify({
+            'success': True,
+            'message': f"Moved {total} returns from {data['from_status']} to {data['to_status']}",
+            'updated': counts['updated'],
+            'inserted': counts['inserted'],
+            'total': total
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+def publish_return_update(return_data):
+    """Broadcast a saved return row to subscribers of its (tenant, return_type, period) channel"""
+    dashboard_flight.invalidate(current_tenant())
+    date_of_filing = return_data.get('date_of_filing')
+    return_broker.publish((current_tenant(), return_data['return_type'], return_data['period']), {
+        'client_code': return_data['client_code'],
+        'date_of_filing': date_of_filing.strftime('%Y-%m-%d') if date_of_filing else None,
+        'status': return_data['status'],
+        'arn': return_data.get('arn'),
+        'remarks': return_data.get('remarks'),
+        'row_version': return_data.get('row_version')
+    })
+
+@app.route('/api/return_stream', methods=['GET'])
+def return_stream():
+    """Server-Sent Events stream of row updates for one return type and period"""
+    return_type = request.args.get('return_type')
+    period = request.args.get('period')
+    if not return_type or not period:
+        return jsonify({'success': False, 'error': 'return_type and period are required'})
+    
+    subscription = return_broker.subscribe((current_tenant(), return_type, period))
+    
+    def generate():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                message = subscription.get(timeout=Config.SSE_HEARTBEAT_SECONDS)
+                if message is None:
+                    yield ": keep-alive\n\n"
+                elif message is RESYNC:
+                    yield "event: resync\ndata: {}\n\n"
+                else:
+                    yield f"event: row\ndata: {json.dumps(message)}\n\n"
+        finally:
+            subscription.close()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/export_clients')
 def export_clients():
     """Export clients to Excel"""
     try:
         clients = client_model.get_all_clients()
+        credentials = client_model.vault.get_all_credentials(accessed_by=request.remote_addr)
         
         # Create workbook and worksheet
         wb = openpyxl.Workbook()
@@ -300,19 +682,20 @@ def export_clients():
         
         # Add client data
         for row_num, client in enumerate(clients, 2):
-            ws.cell(row=row_num, column=1, value=client[0])
-            ws.cell(row=row_num, column=2, value=client[1])
-            ws.cell(row=row_num, column=3, value=client[2].strftime('%Y-%m-%d') if client[2] else None)
-            ws.cell(row=row_num, column=4, value=client[3].strftime('%Y-%m-%d') if client[3] else None)
-            ws.cell(row=row_num, column=5, value=client[4])
-            ws.cell(row=row_num, column=6, value=client[5])
-            ws.cell(row=row_num, column=7, value=client[6])
-            ws.cell(row=row_num, column=8, value=client[7])
-            ws.cell(row=row_num, column=9, value=client[8])
-            ws.cell(row=row_num, column=10, value=client[9])
-            ws.cell(row=row_num, column=11, value=client[10])
-            ws.cell(row=row_num, column=12, value=client[11])
-            ws.cell(row=row_num, column=13, value=client[12])
+            passwords = credentials.get(client.client_code, {})
+            ws.cell(row=row_num, column=1, value=client.client_code)
+            ws.cell(row=row_num, column=2, value=client.client_name)
+            ws.cell(row=row_num, column=3, value=client.date_of_registration.strftime('%Y-%m-%d') if client.date_of_registration else None)
+            ws.cell(row=row_num, column=4, value=client.effective_date_of_cancellation.strftime('%Y-%m-%d') if client.effective_date_of_cancellation else None)
+            ws.cell(row=row_num, column=5, value=client.gstin)
+            ws.cell(row=row_num, column=6, value=client.taxpayer_type)
+            ws.cell(row=row_num, column=7, value=client.gst_portal_userid)
+            ws.cell(row=row_num, column=8, value=passwords.get('gst_portal_password'))
+            ws.cell(row=row_num, column=9, value=client.eway_bill_userid)
+            ws.cell(row=row_num, column=10, value=passwords.get('eway_bill_password'))
+            ws.cell(row=row_num, column=11, value=client.client_email_id)
+            ws.cell(row=row_num, column=12, value=client.mobile_no)
+            ws.cell(row=row_num, column=13, value=passwords.get('email_password'))
         
         # Auto-adjust column widths
         for column in ws.columns:
@@ -340,9 +723,13 @@ def export_clients():
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/api/import_clients', methods=['POST'])
-
 def import_clients():
-    """Import clients from Excel"""
+    """Import clients from Excel
+    
+    Form fields: mode=insert (default, new clients only) or mode=upsert
+    (also update clients matched by Client Code or GSTIN), and dry_run=1 to
+    get the planned inserts and field-level changes without writing.
+    """
     try:
         if 'file' not in request.files:
             return jsonify({'success': False, 'error': 'No file selected for upload.'})
@@ -354,92 +741,137 @@ def import_clients():
         if not file.filename.endswith(('.xlsx', '.xls')):
             return jsonify({'success': False, 'error': 'Invalid file format. Please upload a .xlsx or .xls Excel file.'})
 
+        mode = request.form.get('mode', MODE_INSERT)
+        dry_run = request.form.get('dry_run') in ('1', 'true')
+
         # Save uploaded Excel file temporarily
         temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
         file.save(temp_file.name)
         temp_file.close()  # Crucial to prevent [WinError 32]
 
-        # Load workbook
-        wb = openpyxl.load_workbook(temp_file.name, data_only=True)
-        ws = wb.active
-
-        imported_count = 0
-        errors = []
-        headers = [cell.value for cell in ws[1]]  # Read header row for reference
-
-        for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-            try:
-                if not any(row):
-                    continue  # Skip completely empty rows
-
-                client_data = {
-                    'client_name': row[1],
-                    'date_of_registration': row[2],
-                    'effective_date_of_cancellation': row[3],
-                    'gstin': row[4],
-                    'taxpayer_type': str(row[5]).strip() if row[5] else None,
-                    'gst_portal_userid': row[6],
-                    'gst_portal_password': row[7],
-                    'eway_bill_userid': row[8],
-                    'eway_bill_password': row[9],
-                    'client_email_id': row[10],
-                    'mobile_no': str(row[11]).strip() if row[11] else None,
-                    'email_password': row[12]
-                }
-
-                # Check required fields
-                required_fields = [
-                    'client_name', 'date_of_registration', 'gstin',
-                    'taxpayer_type', 'gst_portal_userid', 'gst_portal_password',
-                    'client_email_id', 'mobile_no'
-                ]
-                missing_fields = [field for field in required_fields if not client_data.get(field)]
-
-                if missing_fields:
-                    errors.append(f"Row {row_num}: Missing required fields: {', '.join(missing_fields)}")
-                    continue
-
-                # Convert dates (Excel can return date objects or strings)
-                if isinstance(client_data['date_of_registration'], str):
-                    try:
-                        client_data['date_of_registration'] = datetime.strptime(
-                            client_data['date_of_registration'], '%Y-%m-%d').date()
-                    except ValueError:
-                        errors.append(f"Row {row_num}: Invalid date format for 'Date of Registration'")
-                        continue
-
-                if client_data['effective_date_of_cancellation']:
-                    if isinstance(client_data['effective_date_of_cancellation'], str):
-                        try:
-                            client_data['effective_date_of_cancellation'] = datetime.strptime(
-                                client_data['effective_date_of_cancellation'], '%Y-%m-%d').date()
-                        except ValueError:
-                            errors.append(f"Row {row_num}: Invalid date format for 'Effective Date of Cancellation'")
-                            continue
-
-                # Create client
-                created = client_model.create_client(client_data)
-                if created:
-                    imported_count += 1
-                else:
-                    errors.append(f"Row {row_num}: Failed to create client (possibly duplicate GSTIN or DB error)")
-
-            except Exception as ex:
-                errors.append(f"Row {row_num}: Unexpected error: {str(ex)}")
+        try:
+            importer = ClientImport(client_model, mode)
+            plan = importer.plan(importer.read_workbook(temp_file.name))
+        finally:
+            # Clean up temp file
+            os.unlink(temp_file.name)
 
-        # Clean up temp file
-        os.unlink(temp_file.name)
+        imported_count = updated_count = 0
+        if not dry_run:
+            imported_count, updated_count = importer.apply(plan)
 
+        errors = [f"Row {entry['row']}: {entry['error']}" for entry in plan if entry['action'] == 'error']
+        duplicates = [{key: entry[key] for key in ('row', 'gstin', 'client_code', 'first_row') if key in entry}
+                      for entry in plan if entry['action'] == 'duplicate']
         return jsonify({
             'success': True,
+            'mode': mode,
+            'dry_run': dry_run,
+            'summary': importer.summarize(plan),
+            'rows': importer.preview(plan),
             'imported_count': imported_count,
-            'errors': errors
+            'updated_count': updated_count,
+            'errors': errors,
+            'duplicates': duplicates
         })
 
     except Exception as e:
         return jsonify({'success': False, 'error': f"Import failed: {str(e)}"})
 
 
+@app.route('/api/export_returns')
+def export_returns():
+    """Export return status for a period or a whole financial year
+    
+    Query parameters: financial_year or period, optional repeated
+    return_type, and format=csv for a single streamed CSV instead of the
+    one-sheet-per-return-type workbook.
+    """
+    try:
+        financial_year = request.args.get('financial_year')
+        period = request.args.get('period')
+        if not financial_year and not period:
+            return jsonify({'success': False, 'error': 'financial_year or period is required'})
+        
+        report = ReturnStatusReport()
+        plan = report.plan(financial_year, period, request.args.getlist('return_type'))
+        if not plan:
+            return jsonify({'success': False, 'error': 'No returns match the selection'})
+        
+        filename = f'gst_return_status_{period or financial_year}_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+        if request.args.get('format') == 'csv':
+            return Response(
+                stream_with_context(report.iter_csv(plan)),
+                mimetype='text/csv',
+                headers={'Content-Disposition': f'attachment; filename={filename}.csv'}
+            )
+        
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
+        temp_file.close()
+        report.write_xlsx(temp_file.name, plan)
+        
+        return send_file(temp_file.name,
+                        as_attachment=True,
+                        download_name=f'{filename}.xlsx',
+                        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/archive', methods=['GET'])
+def get_archive_status():
+    """API endpoint listing archived and archivable financial years"""
+    try:
+        archive = get_archive()
+        return jsonify({
+            'success': True,
+            'archived': archive.archived_financial_years(),
+            'archivable': archive.archivable_financial_years()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/archive', methods=['POST'])
+def archive_financial_year():
+    """API endpoint moving a closed financial year's return data to the archive"""
+    try:
+        financial_year = request.json.get('financial_year')
+        if not financial_year:
+            return jsonify({'success': False, 'error': 'financial_year is required'})
+        
+        archived_rows = get_archive().archive_financial_year(financial_year)
+        return jsonify({
+            'success': True,
+            'message': f'Archived {archived_rows} return rows of {financial_year}',
+            'archived_rows': archived_rows
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/backup', methods=['GET'])
+def list_backups():
+    """API endpoint listing backup files"""
+    try:
+        return jsonify({'success': True, 'data': BackupManager().list_backups()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/backup', methods=['POST'])
+def take_backup():
+    """API endpoint taking a snapshot or incremental backup (restore is command-line only)"""
+    try:
+        kind = (request.json or {}).get('kind', INCREMENTAL)
+        if kind not in (SNAPSHOT, INCREMENTAL):
+            return jsonify({'success': False, 'error': f'kind must be {SNAPSHOT} or {INCREMENTAL}'})
+        
+        manager = BackupManager()
+        name = manager.snapshot() if kind == SNAPSHOT else manager.incremental()
+        if name is None:
+            return jsonify({'success': True, 'message': 'No changes since the last backup', 'file': None})
+        return jsonify({'success': True, 'message': f'Backup written: {name}', 'file': name})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
 @app.route('/api/download_template')
 def download_template():
     """Download Excel template for client import"""
@@ -451,7 +883,7 @@ def download_template():
         
         # Define headers
         headers = [
-            'Client Code (Auto Generated)', 'Client Name*', 'Date of Registration* (YYYY-MM-DD)', 
+            'Client Code (existing clients only)', 'Client Name*', 'Date of Registration* (YYYY-MM-DD)', 
             'Effective Date of Cancellation (YYYY-MM-DD)', 'GSTIN*', 'Taxpayer Type*', 
             'GST Portal User ID*', 'GST Portal Password*', 'EWAY Bill User ID', 
             'EWAY Bill Password', 'Client Email ID*', 'Mobile No*', 'Email Password'
@@ -474,7 +906,7 @@ def download_template():
         
         # Add sample data
         sample_data = [
-            ['', 'ABC Industries Ltd', '2024-04-01', '', '27AAAAA0000A1Z5', 'Monthly', 
+            ['', 'ABC Industries Ltd', '2024-04-01', '', '27AAAAA0000A1Z2', 'Monthly', 
              'abc@gst.gov.in', 'password123', 'abc@ewaybill.nic.in', 'ewaypass123', 
              'abc@company.com', '9876543210', 'emailpass123']
         ]
@@ -489,9 +921,10 @@ def download_template():
             "1. Fields marked with * are mandatory",
             "2. Date format should be YYYY-MM-DD (e.g., 2024-04-01)",
             "3. Taxpayer Type should be one of: Monthly, Quarterly, Composition",
-            "4. GSTIN should be 15 characters",
-            "5. Do not modify the Client Code column - it will be auto-generated",
-            "6. Remove this instruction section before importing"
+            "4. GSTIN must be a valid 15-character GSTIN (state code, PAN, entity number, Z, check character)",
+            "5. Client Code is optional. Leave it empty for new clients; their code is generated on import",
+            "6. Existing clients: with 'Skip' their rows are left out. With 'Update' a filled-in Client Code selects the client to update; rows without one are matched by GSTIN",
+            "7. Remove this instruction section before importing"
         ]
         
         start_row = len(sample_data) + 4
@@ -524,4 +957,4 @@ def download_template():
         return jsonify({'success': False, 'error': str(e)})
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
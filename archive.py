@@ -0,0 +1,315 @@
+import os
+import sqlite3
+import pyodbc
+from datetime import date, datetime
+from functools import lru_cache
+from database import DatabaseConnection, compact_database
+from config import Config
+from periods import get_calendar, financial_year_start, FY_MONTHS, month_label
+from tenants import current_tenant, tenant_paths
+
+ARCHIVE_COLUMNS = ('ReturnID', 'ClientCode', 'ReturnType', 'Period', 'DateOfFiling',
+                   'Status', 'ARN', 'Remarks', 'RowVersion')
+
+ARCHIVE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS GSTReturnData (
+        ReturnID INTEGER PRIMARY KEY,
+        ClientCode INTEGER NOT NULL,
+        ReturnType TEXT NOT NULL,
+        Period TEXT NOT NULL,
+        DateOfFiling TEXT,
+        Status TEXT NOT NULL,
+        ARN TEXT,
+        Remarks TEXT,
+        RowVersion INTEGER NOT NULL
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_return_key ON GSTReturnData (ClientCode, ReturnType, Period)",
+    "CREATE INDEX IF NOT EXISTS idx_return_period ON GSTReturnData (ReturnType, Period, DateOfFiling)"
+]
+
+
+class ArchivedPeriodError(ValueError):
+    """Raised when writing to a period whose financial year has been archived"""
+
+
+def _fingerprint(row):
+    """(row count, sum of RowVersion, sum of ReturnID) of a year's rows; changes with any write to them"""
+    return tuple(int(value or 0) for value in row)
+
+
+def _to_text(value):
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+def _to_date(value):
+    return date.fromisoformat(value) if value else None
+
+
+def financial_year_periods(financial_year):
+    """Every period label stored for a financial year (months, quarter ends and the year)"""
+    start_year = int(financial_year[:4])
+    months = [month_label(start_year if m >= 4 else start_year + 1, m) for m in FY_MONTHS]
+    return months + [financial_year]
+
+
+class ReturnArchive:
+    """Closed financial years of GSTReturnData moved out of Access into one SQLite file each
+
+    Reads for an archived period are served from its file, so callers see
+    the same rows before and after archiving; writes to it are refused.
+    Years are archived by the CLI while the app runs, so a year not yet
+    known to be archived is looked up on disk again on every check.
+    """
+
+    def __init__(self, folder=None):
+        self.folder = folder or tenant_paths().archive_folder
+        self.db = DatabaseConnection()
+        os.makedirs(self.folder, exist_ok=True)
+        self._archived = set()  # years confirmed archived; an archive is never undone
+        self._scan()
+
+    def _scan(self):
+        for name in os.listdir(self.folder):
+            if name.startswith('returns_') and name.endswith('.sqlite'):
+                self._is_archived_year(name[len('returns_'):-len('.sqlite')])
+        return self._archived
+
+    def _is_archived_year(self, financial_year):
+        # The file appears before the live rows are removed; until the
+        # pending marker is gone the year is still read from Access
+        if financial_year in self._archived:
+            return True
+        if os.path.exists(self.path_for(financial_year)) and not os.path.exists(self.pending_path(financial_year)):
+            self._archived.add(financial_year)
+            return True
+        return False
+
+    def path_for(self, financial_year):
+        return os.path.join(self.folder, f'returns_{financial_year}.sqlite')
+
+    def pending_path(self, financial_year):
+        """Marker present while a financial year is being archived (by this or another process)"""
+        return os.path.join(self.folder, f'returns_{financial_year}.pending')
+
+    def archived_financial_years(self):
+        return sorted(self._scan())
+
+    def financial_year_of(self, period):
+        return get_calendar().financial_year_of(period)
+
+    def is_archived(self, period):
+        financial_year = self.financial_year_of(period)
+        return bool(financial_year) and self._is_archived_year(financial_year)
+
+    def check_writable(self, period):
+        if self.is_archived(period):
+            raise ArchivedPeriodError(
+                f'{period} belongs to archived financial year {self.financial_year_of(period)} and is read-only')
+        financial_year = self.financial_year_of(period)
+        if financial_year and os.path.exists(self.pending_path(financial_year)):
+            raise ArchivedPeriodError(f'{period} is read-only while financial year {financial_year} is being archived')
+
+    def _connect(self, financial_year):
+        return sqlite3.connect(self.path_for(financial_year))
+
+    # Read-through -------------------------------------------------------
+
+    def get_rows(self, where, params, period):
+        """Archived rows (ARCHIVE_COLUMNS order, dates as date) matching a condition"""
+        connection = self._connect(self.financial_year_of(period))
+        try:
+            rows = connection.execute(
+                f"SELECT {', '.join(ARCHIVE_COLUMNS)} FROM GSTReturnData WHERE {where}", params
+            ).fetchall()
+        finally:
+            connection.close()
+        return [row[:4] + (_to_date(row[4]),) + row[5:] for row in rows]
+
+    def filing_counts(self, return_types, periods):
+        """(ReturnType, Period, DateOfFiling, COUNT) for filed returns in archived periods"""
+        by_year = {}
+        for period in periods:
+            if self.is_archived(period):
+                by_year.setdefault(self.financial_year_of(period), []).append(period)
+
+        results = []
+        for financial_year, year_periods in by_year.items():
+            connection = self._connect(financial_year)
+            try:
+                rows = connection.execute(f"""
+                    SELECT ReturnType, Period, DateOfFiling, COUNT(*)
+                    FROM GSTReturnData
+                    WHERE ReturnType IN ({', '.join('?' * len(return_types))})
+                      AND Period IN ({', '.join('?' * len(year_periods))})
+                      AND (ARN IS NOT NULL OR DateOfFiling IS NOT NULL)
+                    GROUP BY ReturnType, Period, DateOfFiling
+                """, list(return_types) + year_periods).fetchall()
+            finally:
+                connection.close()
+            results.extend((rt, period, _to_date(filed_on), count) for rt, period, filed_on, count in rows)
+        return results
+
+    def status_counts(self, return_types, periods):
+        """(ReturnType, Period, Status, COUNT) for stored rows in archived periods"""
+        by_year = {}
+        for period in periods:
+            if self.is_archived(period):
+                by_year.setdefault(self.financial_year_of(period), []).append(period)
+
+        results = []
+        for financial_year, year_periods in by_year.items():
+            connection = self._connect(financial_year)
+            try:
+                results.extend(connection.execute(f"""
+                    SELECT ReturnType, Period, Status, COUNT(*)
+                    FROM GSTReturnData
+                    WHERE ReturnType IN ({', '.join('?' * len(return_types))})
+                      AND Period IN ({', '.join('?' * len(year_periods))})
+                    GROUP BY ReturnType, Period, Status
+                """, list(return_types) + year_periods).fetchall())
+            finally:
+                connection.close()
+        return results
+
+    def delete_client(self, client_code):
+        """Remove a deleted client's history from every archive file"""
+        for financial_year in self.archived_financial_years():
+            connection = self._connect(financial_year)
+            try:
+                connection.execute("DELETE FROM GSTReturnData WHERE ClientCode = ?", (client_code,))
+                connection.commit()
+            finally:
+                connection.close()
+
+    # Maintenance --------------------------------------------------------
+
+    def archivable_financial_years(self, today=None):
+        """Financial years with live rows that are older than ARCHIVE_KEEP_YEARS"""
+        cutoff = financial_year_start(today or date.today()) - Config.ARCHIVE_KEEP_YEARS + 1
+        self.db.connect()
+        rows = self.db.fetch_all("SELECT DISTINCT Period FROM GSTReturnData")
+        self.db.disconnect()
+
+        years = {self.financial_year_of(row[0]) for row in rows}
+        return sorted(fy for fy in years
+                      if fy and int(fy[:4]) < cutoff and not self._is_archived_year(fy))
+
+    def archive_financial_year(self, financial_year):
+        """Move a closed financial year's rows to its archive file; returns the row count"""
+        if self._is_archived_year(financial_year):
+            raise ValueError(f'{financial_year} is already archived')
+        if financial_year not in self.archivable_financial_years():
+            raise ValueError(f'{financial_year} is not a closed financial year with data to archive')
+
+        # The year is read-only from here on; writes already in flight are
+        # caught by the fingerprint check before anything is deleted
+        pending_path = self.pending_path(financial_year)
+        open(pending_path, 'w').close()
+        try:
+            return self._archive(financial_year)
+        finally:
+            os.remove(pending_path)
+
+    def _archive(self, financial_year):
+        periods = financial_year_periods(financial_year)
+        placeholders = ', '.join('?' * len(periods))
+        fingerprint_query = f"""
+            SELECT COUNT(*), SUM(RowVersion), SUM(ReturnID) FROM GSTReturnData WHERE Period IN ({placeholders})
+        """
+        path = self.path_for(financial_year)
+        temp_path = path + '.tmp'
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+        # Copy into a fresh file first; nothing is removed from Access yet
+        connection = sqlite3.connect(temp_path)
+        try:
+            for statement in ARCHIVE_SCHEMA:
+                connection.execute(statement)
+            self.db.connect()
+            rows = self.db.iter_rows(
+                f"SELECT {', '.join(ARCHIVE_COLUMNS)} FROM GSTReturnData WHERE Period IN ({placeholders})",
+                periods, Config.EXPORT_BATCH_SIZE)
+            connection.executemany(
+                f"INSERT INTO GSTReturnData ({', '.join(ARCHIVE_COLUMNS)}) VALUES ({', '.join('?' * len(ARCHIVE_COLUMNS))})",
+                (tuple(_to_text(value) for value in row) for row in rows))
+            connection.commit()
+            copied = _fingerprint(connection.execute(fingerprint_query, periods).fetchone())
+            connection.execute("VACUUM")
+        finally:
+            connection.close()
+            self.db.disconnect()
+
+        os.replace(temp_path, path)
+
+        # Any write that landed during the copy (an insert, or an update that
+        # bumped a RowVersion) changes the fingerprint and aborts the archive
+        changed = failed = False
+        self.db.connect()
+        try:
+            cursor = self.db.connection.cursor()
+            live = _fingerprint(cursor.execute(fingerprint_query, periods).fetchone())
+            if live != copied:
+                changed = True
+            elif cursor.execute(f"DELETE FROM GSTReturnData WHERE Period IN ({placeholders})",
+                                periods).rowcount != copied[0]:
+                changed = True
+            if changed:
+                self.db.connection.rollback()
+            else:
+                self.db.connection.commit()
+            cursor.close()
+        except pyodbc.Error as e:
+            print(f"Transaction error: {e}")
+            failed = True
+            try:
+                self.db.connection.rollback()
+            except:
+                pass
+        finally:
+            self.db.disconnect()
+
+        if changed or failed:
+            os.remove(path)
+            if changed:
+                raise RuntimeError(f'{financial_year} changed while archiving; nothing was removed, please retry')
+            raise RuntimeError(f'Could not remove archived rows of {financial_year} from the database')
+
+        self._archived.add(financial_year)
+        print(f"Archived {copied[0]} return rows of {financial_year} to {path}")
+        return copied[0]
+
+
+def get_archive():
+    """Shared archive of the current tenant"""
+    return _tenant_archive(current_tenant())
+
+
+@lru_cache(maxsize=None)
+def _tenant_archive(tenant):
+    return ReturnArchive()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='GST return archive maintenance')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='show archived and archivable financial years')
+    archive_parser = commands.add_parser('archive', help='move a closed financial year to its archive file')
+    archive_parser.add_argument('financial_year', help="e.g. 2023-24")
+    commands.add_parser('compact', help='compact the Access database (stop the app first)')
+    args = parser.parse_args()
+
+    archive = get_archive()
+    if args.command == 'list':
+        print('Archived:  ', ', '.join(archive.archived_financial_years()) or '-')
+        print('Archivable:', ', '.join(archive.archivable_financial_years()) or '-')
+    elif args.command == 'archive':
+        archive.archive_financial_year(args.financial_year)
+    elif args.command == 'compact':
+        compact_database()
@@ -0,0 +1,397 @@
+import gzip
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+from datetime import date, datetime
+from database import DatabaseConnection
+from config import Config
+from changefeed import ChangeFeed, ChangeCursor, ENTITY_CLIENT, ENTITY_RETURN
+from records import CLIENT_COLUMNS, RETURN_COLUMNS
+from archive import get_archive
+from tenants import tenant_paths
+
+# Backed-up tables: name -> (columns, key columns)
+BACKUP_TABLES = {
+    'ClientMaster': (tuple(CLIENT_COLUMNS.values()), ('ClientCode',)),
+    'ClientCredentials': (('ClientCode', 'GSTPortalPassword', 'EWAYBillPassword', 'EmailPassword', 'UpdatedAt'),
+                          ('ClientCode',)),
+    'GSTReturnData': (tuple(RETURN_COLUMNS.values()), ('ClientCode', 'ReturnType', 'Period'))
+}
+DATE_COLUMNS = {'DateOfRegistration', 'EffectiveDateOfCancellation', 'DateOfFiling'}
+DATETIME_COLUMNS = {'UpdatedAt'}
+
+SNAPSHOT = 'snapshot'
+INCREMENTAL = 'incremental'
+
+# <kind>_<YYYYmmdd_HHMMSS>_seq<base seq>-<seq>.sqlite.gz, so listing needs no unpacking
+BACKUP_NAME = re.compile(r'(snapshot|incremental)_(\d{8}_\d{6})_seq(\d+)-(\d+)\.sqlite\.gz')
+
+# Rows per IN (...) lookup when re-reading changed rows for an incremental
+_LOOKUP_CHUNK = 200
+
+
+def _to_text(value):
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _from_text(column, value):
+    if value is None:
+        return None
+    if column in DATE_COLUMNS:
+        return date.fromisoformat(value[:10])
+    if column in DATETIME_COLUMNS:
+        return datetime.fromisoformat(value)
+    return value
+
+
+def _chunks(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _create_schema(connection):
+    connection.execute("CREATE TABLE backup_info (kind TEXT, base_seq INTEGER, seq INTEGER, created_at TEXT)")
+    for table, (columns, keys) in BACKUP_TABLES.items():
+        connection.execute(f"CREATE TABLE {table} ({', '.join(columns)}, PRIMARY KEY ({', '.join(keys)}))")
+    connection.execute("CREATE TABLE deleted_clients (ClientCode PRIMARY KEY)")
+    connection.execute("CREATE TABLE deleted_returns (ClientCode, ReturnType, Period, "
+                       "PRIMARY KEY (ClientCode, ReturnType, Period))")
+
+
+class BackupManager:
+    """Online snapshots and change-sequence incrementals of the tracking database
+
+    A snapshot copies every backed-up table into a gzipped SQLite file and
+    records the ChangeLog position read *before* the copy, below any change
+    that may still be uncommitted. Writes landing during the copy are
+    therefore also picked up by the next incremental, which re-reads every
+    row touched since that position. Restoring the
+    latest snapshot plus its incrementals in order gives a consistent book.
+    """
+
+    def __init__(self, folder=None):
+        self.folder = folder or tenant_paths().backup_folder
+        self.db = DatabaseConnection()
+        self.changes = ChangeFeed()
+        os.makedirs(self.folder, exist_ok=True)
+
+    # Catalogue ----------------------------------------------------------
+
+    def list_backups(self):
+        """Backup files with their metadata, oldest first"""
+        backups = []
+        for name in os.listdir(self.folder):
+            if not name.endswith('.sqlite.gz'):
+                continue
+            match = BACKUP_NAME.fullmatch(name)
+            if match:
+                kind, stamp, base_seq, seq = match.groups()
+                info = {'kind': kind, 'base_seq': int(base_seq), 'seq': int(seq),
+                        'created_at': datetime.strptime(stamp, '%Y%m%d_%H%M%S').isoformat(' ')}
+            else:
+                info = self._read_info(name)  # written before base_seq was part of the name
+            backups.append({'file': name, **info, 'size': os.path.getsize(os.path.join(self.folder, name))})
+        return sorted(backups, key=lambda backup: (backup['seq'], backup['kind'] != SNAPSHOT, backup['created_at']))
+
+    def chain(self, until=None):
+        """Latest snapshot (at or before `until`) followed by the incrementals continuing it"""
+        backups = self.list_backups()
+        if until:
+            position = next((i for i, backup in enumerate(backups) if backup['file'] == until), None)
+            if position is None:
+                raise ValueError(f'Unknown backup file: {until}')
+            backups = backups[:position + 1]
+
+        snapshots = [i for i, backup in enumerate(backups) if backup['kind'] == SNAPSHOT]
+        if not snapshots:
+            return []
+        chain = [backups[snapshots[-1]]]
+        for backup in backups[snapshots[-1] + 1:]:
+            if backup['kind'] == INCREMENTAL and backup['base_seq'] == chain[-1]['seq']:
+                chain.append(backup)
+        return chain
+
+    # Taking backups -----------------------------------------------------
+
+    def snapshot(self):
+        """Full copy of every backed-up table; returns the file name"""
+        seq = self.changes.safe_seq()
+        connection, temp_path = self._create(SNAPSHOT, seq, seq)
+        try:
+            self.db.connect()
+            for table, (columns, _) in BACKUP_TABLES.items():
+                rows = self.db.iter_rows(f"SELECT {', '.join(columns)} FROM {table}",
+                                         batch_size=Config.EXPORT_BATCH_SIZE)
+                self._insert(connection, table, columns, rows)
+            connection.commit()
+        finally:
+            self.db.disconnect()
+            connection.close()
+        return self._store(temp_path, SNAPSHOT, seq, seq)
+
+    def incremental(self):
+        """Rows changed since the end of the current chain; returns the file name, or None"""
+        chain = self.chain()
+        if not chain:
+            raise ValueError('Take a snapshot before an incremental backup')
+        base_seq = chain[-1]['seq']
+
+        # Ends below any gap left by a writer still committing, so the next incremental reads it
+        cursor = ChangeCursor(self.changes, position=base_seq)
+        changes = cursor.poll()
+        if not changes:
+            return None
+
+        client_codes = {c['client_code'] for c in changes if c['entity'] == ENTITY_CLIENT and c['client_code']}
+        return_keys = {(c['client_code'], c['return_type'], c['period'])
+                       for c in changes if c['entity'] == ENTITY_RETURN}
+
+        connection, temp_path = self._create(INCREMENTAL, base_seq, cursor.position)
+        try:
+            self.db.connect()
+            self._copy_clients(connection, client_codes)
+            self._copy_returns(connection, return_keys)
+            connection.commit()
+        finally:
+            self.db.disconnect()
+            connection.close()
+        return self._store(temp_path, INCREMENTAL, base_seq, cursor.position)
+
+    def _copy_clients(self, connection, client_codes):
+        found = set()
+        for table in ('ClientMaster', 'ClientCredentials'):
+            columns, _ = BACKUP_TABLES[table]
+            for chunk in _chunks(client_codes, _LOOKUP_CHUNK):
+                rows = self.db.fetch_all(
+                    f"SELECT {', '.join(columns)} FROM {table} WHERE ClientCode IN ({', '.join('?' * len(chunk))})",
+                    chunk)
+                self._insert(connection, table, columns, rows)
+                if table == 'ClientMaster':
+                    found.update(row[0] for row in rows)
+        connection.executemany("INSERT INTO deleted_clients VALUES (?)",
+                               [(code,) for code in client_codes - found])
+
+    def _copy_returns(self, connection, return_keys):
+        columns, _ = BACKUP_TABLES['GSTReturnData']
+        by_selection = {}
+        for client_code, return_type, period in return_keys:
+            by_selection.setdefault((return_type, period), set()).add(client_code)
+
+        for (return_type, period), codes in by_selection.items():
+            found = set()
+            for chunk in _chunks(codes, _LOOKUP_CHUNK):
+                rows = self.db.fetch_all(f"""
+                    SELECT {', '.join(columns)} FROM GSTReturnData
+                    WHERE ReturnType = ? AND Period = ? AND ClientCode IN ({', '.join('?' * len(chunk))})
+                """, [return_type, period] + chunk)
+                self._insert(connection, 'GSTReturnData', columns, rows)
+                found.update(row[1] for row in rows)
+            connection.executemany("INSERT INTO deleted_returns VALUES (?, ?, ?)",
+                                   [(code, return_type, period) for code in codes - found])
+
+    # Restoring ----------------------------------------------------------
+
+    def materialize(self, until=None):
+        """Apply a backup chain into a temporary SQLite file; returns (path, chain)"""
+        chain = self.chain(until)
+        if not chain:
+            raise ValueError('No snapshot to restore from')
+
+        handle, path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(handle)
+        with gzip.open(os.path.join(self.folder, chain[0]['file']), 'rb') as source, open(path, 'wb') as target:
+            shutil.copyfileobj(source, target)
+
+        target = sqlite3.connect(path)
+        try:
+            for backup in chain[1:]:
+                incremental_path = self._unpack(backup['file'])
+                target.execute("ATTACH DATABASE ? AS incremental", (incremental_path,))
+                self._apply_incremental(target)
+                target.commit()
+                target.execute("DETACH DATABASE incremental")
+                os.remove(incremental_path)
+        finally:
+            target.close()
+        return path, chain
+
+    def _apply_incremental(self, target):
+        deleted = "SELECT ClientCode FROM incremental.deleted_clients"
+        for table in BACKUP_TABLES:
+            target.execute(f"DELETE FROM {table} WHERE ClientCode IN ({deleted})")
+        target.execute("""
+            DELETE FROM GSTReturnData WHERE EXISTS (
+                SELECT 1 FROM incremental.deleted_returns AS d
+                WHERE d.ClientCode = GSTReturnData.ClientCode
+                  AND d.ReturnType = GSTReturnData.ReturnType
+                  AND d.Period = GSTReturnData.Period)
+        """)
+        for table in BACKUP_TABLES:
+            target.execute(f"INSERT OR REPLACE INTO {table} SELECT * FROM incremental.{table}")
+
+    def restore(self, until=None):
+        """Replace the live tables with the backup chain's contents in one transaction"""
+        path, chain = self.materialize(until)
+        source = sqlite3.connect(path)
+        self.db.connect()
+        try:
+            cursor = self.db.connection.cursor()
+            cursor.fast_executemany = True
+            # Children first, then parents
+            for table in ('GSTReturnData', 'ClientCredentials', 'ClientMaster'):
+                cursor.execute(f"DELETE FROM {table}")
+            counts = {}
+            archive = get_archive()
+            for table, (columns, _) in BACKUP_TABLES.items():
+                rows = source.execute(f"SELECT {', '.join(columns)} FROM {table}")
+                counts[table] = 0
+                while True:
+                    batch = rows.fetchmany(Config.EXPORT_BATCH_SIZE)
+                    if not batch:
+                        break
+                    if table == 'GSTReturnData':
+                        # Years archived since the backup stay in their archive files
+                        period = columns.index('Period')
+                        batch = [row for row in batch if not archive.is_archived(row[period])]
+                    cursor.executemany(
+                        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                        [tuple(_from_text(column, value) for column, value in zip(columns, row)) for row in batch])
+                    counts[table] += len(batch)
+            self.db.connection.commit()
+            cursor.close()
+        except Exception:
+            try:
+                self.db.connection.rollback()
+            except:
+                pass
+            raise
+        finally:
+            self.db.disconnect()
+            source.close()
+            os.remove(path)
+
+        # Everything changed at once: consumers of the feed reload in full
+        self.changes.record(ENTITY_CLIENT, 'restore', payload={'backup': chain[-1]['file'], 'rows': counts})
+        print(f"Restored {chain[-1]['file']}: " + ', '.join(f"{table} {count}" for table, count in counts.items()))
+        return counts
+
+    def verify(self, until=None):
+        """Compare the chain's contents with the live tables by row count and checksum"""
+        path, chain = self.materialize(until)
+        source = sqlite3.connect(path)
+        self.db.connect()
+        report = {}
+        archive = get_archive()
+        try:
+            for table, (columns, _) in BACKUP_TABLES.items():
+                backup_rows = source.execute(f"SELECT {', '.join(columns)} FROM {table}")
+                if table == 'GSTReturnData':
+                    period = columns.index('Period')
+                    backup_rows = (row for row in backup_rows if not archive.is_archived(row[period]))
+                live_rows = self.db.iter_rows(f"SELECT {', '.join(columns)} FROM {table}",
+                                              batch_size=Config.EXPORT_BATCH_SIZE)
+                backup_count, backup_digest = self._digest(backup_rows)
+                live_count, live_digest = self._digest(tuple(_to_text(value) for value in row) for row in live_rows)
+                report[table] = {
+                    'backup_rows': backup_count,
+                    'live_rows': live_count,
+                    'match': backup_count == live_count and backup_digest == live_digest
+                }
+        finally:
+            self.db.disconnect()
+            source.close()
+            os.remove(path)
+        return {'backup': chain[-1]['file'], 'tables': report,
+                'match': all(table['match'] for table in report.values())}
+
+    @staticmethod
+    def _digest(rows):
+        """Order-independent checksum: XOR of per-row SHA-256 digests"""
+        count, digest = 0, 0
+        for row in rows:
+            count += 1
+            digest ^= int.from_bytes(hashlib.sha256(repr(tuple(row)).encode()).digest(), 'big')
+        return count, digest
+
+    # Files --------------------------------------------------------------
+
+    def _create(self, kind, base_seq, seq):
+        handle, temp_path = tempfile.mkstemp(suffix='.sqlite', dir=self.folder)
+        os.close(handle)
+        connection = sqlite3.connect(temp_path)
+        _create_schema(connection)
+        connection.execute("INSERT INTO backup_info VALUES (?, ?, ?, ?)",
+                           (kind, base_seq, seq, datetime.now().isoformat(' ', 'seconds')))
+        return connection, temp_path
+
+    @staticmethod
+    def _insert(connection, table, columns, rows):
+        connection.executemany(
+            f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            (tuple(_to_text(value) for value in row) for row in rows))
+
+    def _store(self, temp_path, kind, base_seq, seq):
+        name = f"{kind}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_seq{base_seq}-{seq}.sqlite.gz"
+        with open(temp_path, 'rb') as source, gzip.open(os.path.join(self.folder, name), 'wb') as target:
+            shutil.copyfileobj(source, target)
+        os.remove(temp_path)
+        print(f"Backup written: {name}")
+        return name
+
+    def _unpack(self, name):
+        handle, path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(handle)
+        with gzip.open(os.path.join(self.folder, name), 'rb') as source, open(path, 'wb') as target:
+            shutil.copyfileobj(source, target)
+        return path
+
+    def _read_info(self, name):
+        path = self._unpack(name)
+        connection = sqlite3.connect(path)
+        try:
+            kind, base_seq, seq, created_at = connection.execute(
+                "SELECT kind, base_seq, seq, created_at FROM backup_info").fetchone()
+        finally:
+            connection.close()
+            os.remove(path)
+        return {'kind': kind, 'base_seq': base_seq, 'seq': seq, 'created_at': created_at}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='GST tracking database backup and restore')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='show backup files')
+    commands.add_parser('snapshot', help='take a full snapshot')
+    commands.add_parser('incremental', help='back up rows changed since the last backup')
+    for command in ('restore', 'verify'):
+        command_parser = commands.add_parser(command, help=f'{command} the latest backup chain')
+        command_parser.add_argument('until', nargs='?', help='stop the chain at this backup file')
+    args = parser.parse_args()
+
+    manager = BackupManager()
+    if args.command == 'list':
+        for backup in manager.list_backups():
+            print(f"{backup['file']}  {backup['kind']:<11} seq {backup['base_seq']}->{backup['seq']}  {backup['size'] // 1024} KB")
+    elif args.command == 'snapshot':
+        manager.snapshot()
+    elif args.command == 'incremental':
+        if manager.incremental() is None:
+            print('No changes since the last backup')
+    elif args.command == 'restore':
+        manager.restore(args.until)
+    elif args.command == 'verify':
+        result = manager.verify(args.until)
+        for table, outcome in result['tables'].items():
+            print(f"{table:<18} backup {outcome['backup_rows']:>8}  live {outcome['live_rows']:>8}  "
+                  f"{'OK' if outcome['match'] else 'MISMATCH'}")
+        print('Backup matches the live database' if result['match'] else 'Backup differs from the live database')
@@ -0,0 +1,168 @@
+import json
+from datetime import datetime, date, timedelta
+from database import DatabaseConnection
+from config import Config
+
+ENTITY_CLIENT = 'client'
+ENTITY_RETURN = 'return'
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    return str(value)
+
+
+class ChangeFeed:
+    """Append-only log of writes, ordered by the ChangeLog.ChangeSeq counter"""
+
+    def __init__(self):
+        self.db = DatabaseConnection()
+
+    def change_statement(self, entity, action, client_code=None, return_type=None,
+                         period=None, payload=None):
+        """(query, params) appending one change; run it in the writer's transaction"""
+        query = """
+            INSERT INTO ChangeLog (
+                ChangedAt, Entity, Action, ClientCode, ReturnType, Period, Payload
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        """
+        params = (
+            datetime.now(),
+            entity,
+            action,
+            client_code,
+            return_type,
+            period,
+            json.dumps(payload, default=_json_default) if payload is not None else None
+        )
+        return query, params
+
+    def record(self, entity, action, client_code=None, return_type=None, period=None, payload=None):
+        """Append a change outside of any other write"""
+        self.db.connect()
+        query, params = self.change_statement(entity, action, client_code, return_type, period, payload)
+        result = self.db.execute_non_query(query, params)
+        self.db.disconnect()
+        return result
+
+    def latest_seq(self):
+        self.db.connect()
+        result = self.db.fetch_one("SELECT MAX(ChangeSeq) FROM ChangeLog")
+        self.db.disconnect()
+        return result[0] if result and result[0] else 0
+
+    def get_changes(self, since, limit=500):
+        """Changes with ChangeSeq > since, oldest first"""
+        return self._changes(f"SELECT TOP {int(limit)}", "ChangeSeq > ?", (since,))
+
+    def get_changes_between(self, first, last):
+        """Changes with first <= ChangeSeq <= last, oldest first"""
+        return self._changes("SELECT", "ChangeSeq BETWEEN ? AND ?", (first, last))
+
+    def seq_before(self, changed_at):
+        """Highest ChangeSeq written before `changed_at` (0 if none)"""
+        self.db.connect()
+        result = self.db.fetch_one("SELECT MAX(ChangeSeq) FROM ChangeLog WHERE ChangedAt < ?", (changed_at,))
+        self.db.disconnect()
+        return result[0] if result and result[0] else 0
+
+    def safe_seq(self):
+        """Position below every change that may still be uncommitted"""
+        cursor = ChangeCursor(self)
+        cursor.poll()
+        return cursor.position
+
+    def _changes(self, select, where, params):
+        self.db.connect()
+        query = f"""
+            {select} ChangeSeq, ChangedAt, Entity, Action,
+                   ClientCode, ReturnType, Period, Payload
+            FROM ChangeLog
+            WHERE {where}
+            ORDER BY ChangeSeq
+        """
+        rows = self.db.fetch_all(query, params)
+        self.db.disconnect()
+
+        changes = []
+        for row in rows:
+            changes.append({
+                'seq': row[0],
+                'changed_at': row[1].strftime('%Y-%m-%d %H:%M:%S') if row[1] else None,
+                'entity': row[2],
+                'action': row[3],
+                'client_code': row[4],
+                'return_type': row[5],
+                'period': row[6],
+                'payload': json.loads(row[7]) if row[7] else None
+            })
+        return changes
+
+
+class ChangeCursor:
+    """Tracks a consumer's position in the feed and hands it new changes
+
+    A ChangeSeq is taken when its row is inserted but is only visible once
+    the writer commits, and writers commit in any order. Seqs missing below
+    the highest one read are kept as gaps and re-read on every poll until
+    their change shows up, or until they are CHANGE_GAP_SECONDS older than
+    the change after them (the write was rolled back). `position` is below
+    every open gap: consumers that store their place store it, and may see
+    a few changes again when they resume from it.
+    """
+
+    def __init__(self, feed, batch_size=1000, position=None):
+        self.feed = feed
+        self.batch_size = batch_size
+        self.seq = position  # highest seq read
+        self.gaps = []  # (first missing seq, last missing seq, written before)
+
+    @property
+    def position(self):
+        return self.gaps[0][0] - 1 if self.gaps else self.seq
+
+    def poll(self):
+        """Changes since the last poll; the first poll only records the position"""
+        if self.seq is None:
+            # Changes written before the cursor existed may still be uncommitted
+            self.seq = self.feed.seq_before(datetime.now() - timedelta(seconds=Config.CHANGE_GAP_SECONDS))
+            self._read()
+            return []
+        return self._read()
+
+    def _read(self):
+        changes = self._fill_gaps()
+        while True:
+            batch = self.feed.get_changes(self.seq, self.batch_size)
+            if not batch:
+                break
+            self._note_gaps(self.seq, batch)
+            changes.extend(batch)
+            self.seq = batch[-1]['seq']
+            if len(batch) < self.batch_size:
+                break
+
+        expired = datetime.now() - timedelta(seconds=Config.CHANGE_GAP_SECONDS)
+        self.gaps = [gap for gap in self.gaps if gap[2] >= expired]
+        return changes
+
+    def _note_gaps(self, seq, batch):
+        for change in batch:
+            if change['seq'] > seq + 1:
+                written = datetime.strptime(change['changed_at'], '%Y-%m-%d %H:%M:%S')
+                self.gaps.append((seq + 1, change['seq'] - 1, written))
+            seq = change['seq']
+
+    def _fill_gaps(self):
+        filled, gaps = [], []
+        for first, last, written in self.gaps:
+            found = self.feed.get_changes_between(first, last)
+            filled.extend(found)
+            # What is still missing of the gap stays open
+            for change in found + [{'seq': last + 1}]:
+                if change['seq'] > first:
+                    gaps.append((first, change['seq'] - 1, written))
+                first = change['seq'] + 1
+        self.gaps = gaps
+        return filled
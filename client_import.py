@@ -0,0 +1,232 @@
+from datetime import datetime, date
+import openpyxl
+from gstin import normalize_gstin, validate_gstin
+from credentials import CREDENTIAL_FIELDS
+
+# Template columns in order; column A is the (auto-generated) Client Code
+IMPORT_COLUMNS = (
+    'client_code', 'client_name', 'date_of_registration', 'effective_date_of_cancellation',
+    'gstin', 'taxpayer_type', 'gst_portal_userid', 'gst_portal_password', 'eway_bill_userid',
+    'eway_bill_password', 'client_email_id', 'mobile_no', 'email_password'
+)
+
+REQUIRED_FIELDS = (
+    'client_name', 'date_of_registration', 'gstin',
+    'taxpayer_type', 'gst_portal_userid', 'gst_portal_password',
+    'client_email_id', 'mobile_no'
+)
+
+# ClientMaster fields compared when a row matches an existing client
+DIFF_FIELDS = (
+    'client_name', 'date_of_registration', 'effective_date_of_cancellation', 'gstin',
+    'taxpayer_type', 'gst_portal_userid', 'eway_bill_userid', 'client_email_id', 'mobile_no'
+)
+DATE_FIELDS = ('date_of_registration', 'effective_date_of_cancellation')
+DATE_LABELS = {
+    'date_of_registration': 'Date of Registration',
+    'effective_date_of_cancellation': 'Effective Date of Cancellation'
+}
+
+MODE_INSERT = 'insert'   # add new clients, skip GSTINs already in the book
+MODE_UPSERT = 'upsert'   # also update clients matched by Client Code or GSTIN
+
+# Planned row actions
+INSERT, UPDATE, UNCHANGED, DUPLICATE, ERROR = 'insert', 'update', 'unchanged', 'duplicate', 'error'
+
+_MASKED = '********'
+
+
+def _clean(value):
+    if isinstance(value, str):
+        value = value.strip()
+    return None if value == '' else value
+
+
+def _comparable(field, value):
+    """Value as compared in the diff: dates as date, GSTIN normalized, everything else trimmed"""
+    value = _clean(value)
+    if value is None:
+        return None
+    if field in DATE_FIELDS:
+        return value.date() if isinstance(value, datetime) else value
+    if field == 'gstin':
+        return normalize_gstin(value)
+    return str(value) if not isinstance(value, str) else value
+
+
+def _display(value):
+    return value.strftime('%Y-%m-%d') if isinstance(value, date) else value
+
+
+def parse_row(row):
+    """(client_data, error) for one sheet row"""
+    values = dict(zip(IMPORT_COLUMNS, tuple(row) + (None,) * (len(IMPORT_COLUMNS) - len(row))))
+    client_data = {field: _clean(value) for field, value in values.items()}
+    if client_data['taxpayer_type'] is not None:
+        client_data['taxpayer_type'] = str(client_data['taxpayer_type']).strip()
+    if client_data['mobile_no'] is not None:
+        mobile_no = client_data['mobile_no']
+        if isinstance(mobile_no, float) and mobile_no.is_integer():
+            mobile_no = int(mobile_no)  # numeric Excel cell
+        client_data['mobile_no'] = str(mobile_no).strip()
+
+    missing_fields = [field for field in REQUIRED_FIELDS if not client_data.get(field)]
+    if missing_fields:
+        return None, f"Missing required fields: {', '.join(missing_fields)}"
+
+    # Convert dates (Excel can return date objects or strings)
+    for field in DATE_FIELDS:
+        if isinstance(client_data[field], str):
+            try:
+                client_data[field] = datetime.strptime(client_data[field], '%Y-%m-%d').date()
+            except ValueError:
+                return None, f"Invalid date format for '{DATE_LABELS[field]}'"
+
+    if client_data['client_code'] is not None:
+        try:
+            client_data['client_code'] = int(client_data['client_code'])
+        except (TypeError, ValueError):
+            return None, f"Invalid Client Code '{client_data['client_code']}'"
+
+    client_data['gstin'] = normalize_gstin(client_data['gstin'])
+    return client_data, validate_gstin(client_data['gstin'])
+
+
+class ClientImport:
+    """Plan a client master import against one bulk read of ClientMaster, then apply it
+
+    Rows are matched to existing clients by Client Code or GSTIN (upsert
+    mode only) and compared field by field in memory. The plan doubles as
+    the dry-run preview; applying it creates the new clients and writes
+    only the changed ones, in a single batched transaction.
+    """
+
+    def __init__(self, client_model, mode=MODE_INSERT):
+        if mode not in (MODE_INSERT, MODE_UPSERT):
+            raise ValueError(f'Unknown import mode: {mode}')
+        self.clients = client_model
+        self.mode = mode
+
+    @staticmethod
+    def read_workbook(path):
+        """(row number, values) for every non-empty data row of the first sheet"""
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            return [(row_num, row) for row_num, row in
+                    enumerate(wb.active.iter_rows(min_row=2, values_only=True), start=2) if any(row)]
+        finally:
+            wb.close()
+
+    def plan(self, rows):
+        """One entry per row: {'row', 'action', 'client_code', 'gstin', 'changes' | 'error' | ...}
+
+        Entries keep the parsed row under '_data' for apply(); preview()
+        drops it.
+        """
+        existing = self.clients.get_all_clients()
+        by_code = {client.client_code: client for client in existing}
+        by_gstin = {normalize_gstin(client.gstin): client for client in existing}
+        stored_credentials = (self.clients.vault.get_all_credentials(purpose='import')
+                              if self.mode == MODE_UPSERT else {})
+
+        first_rows = {}
+        plan = []
+        for row_num, row in rows:
+            entry = {'row': row_num}
+            plan.append(entry)
+            client_data, error = parse_row(row)
+            if error:
+                entry.update({'action': ERROR, 'error': error})
+                continue
+            gstin = client_data['gstin']
+            entry['gstin'] = gstin
+
+            holder = by_gstin.get(gstin)
+            current = None
+            if self.mode == MODE_UPSERT:
+                if client_data['client_code'] is not None:
+                    current = by_code.get(client_data['client_code'])
+                    if current is None:
+                        entry.update({'action': ERROR, 'error': f"Client Code {client_data['client_code']} not found"})
+                        continue
+                    if holder and holder.client_code != current.client_code:
+                        entry.update({'action': ERROR, 'error':
+                                      f'GSTIN {gstin} already belongs to client {holder.client_code}'})
+                        continue
+                current = current or holder
+            elif holder:
+                entry.update({'action': DUPLICATE, 'client_code': holder.client_code})
+                continue
+
+            # A client (or a new GSTIN) may only appear once per file
+            keys = [('gstin', gstin)] + ([('client', current.client_code)] if current else [])
+            first_row = next((first_rows[key] for key in keys if key in first_rows), None)
+            if first_row:
+                entry.update({'action': DUPLICATE, 'first_row': first_row})
+                continue
+            first_rows.update((key, row_num) for key in keys)
+
+            if current is None:
+                entry.update({'action': INSERT, '_data': client_data})
+                continue
+
+            changes = self._diff(current, client_data, stored_credentials.get(current.client_code, {}))
+            entry.update({'client_code': current.client_code, 'changes': changes})
+            if changes:
+                client_data['row_version'] = current.row_version
+                entry.update({'action': UPDATE, '_data': client_data})
+            else:
+                entry['action'] = UNCHANGED
+        return plan
+
+    @staticmethod
+    def _diff(current, client_data, credentials):
+        changes = {}
+        for field in DIFF_FIELDS:
+            old = _comparable(field, getattr(current, field))
+            new = _comparable(field, client_data.get(field))
+            if old != new:
+                changes[field] = {'from': _display(old), 'to': _display(new)}
+        # Passwords are only replaced when given, and never echoed back
+        for field in CREDENTIAL_FIELDS:
+            if client_data.get(field) and str(client_data[field]) != credentials.get(field):
+                changes[field] = {'from': _MASKED if credentials.get(field) else None, 'to': _MASKED}
+        return changes
+
+    @staticmethod
+    def summarize(plan):
+        summary = {action: 0 for action in (INSERT, UPDATE, UNCHANGED, DUPLICATE, ERROR)}
+        for entry in plan:
+            summary[entry['action']] += 1
+        return summary
+
+    @staticmethod
+    def preview(plan):
+        """Plan entries worth showing (unchanged rows omitted), without the parsed row data"""
+        return [{key: value for key, value in entry.items() if key != '_data'}
+                for entry in plan if entry['action'] != UNCHANGED]
+
+    def apply(self, plan):
+        """Create the planned inserts and write the planned updates; returns (created, updated)"""
+        created = 0
+        for entry in plan:
+            if entry['action'] != INSERT:
+                continue
+            if self.clients.create_client(entry['_data']):
+                created += 1
+            else:
+                entry.update({'action': ERROR, 'error': 'Failed to create client (DB error)'})
+
+        updates = [entry for entry in plan if entry['action'] == UPDATE]
+        results = self.clients.update_clients(
+            [(entry['client_code'], entry['_data']) for entry in updates]) if updates else {}
+        updated = 0
+        for entry in updates:
+            result = results.get(entry['client_code'])
+            if result is True:
+                updated += 1
+            elif result:
+                entry.update({'action': ERROR, 'error': 'Client was changed by someone else during the import'})
+            else:
+                entry.update({'action': ERROR, 'error': 'Failed to update client (DB error)'})
+        return created, updated
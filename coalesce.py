@@ -0,0 +1,91 @@
+import threading
+import time
+
+
+class _Call:
+    """One in-flight computation and the callers waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Share one computation between concurrent identical calls, and keep its result for a short TTL
+
+    The first caller for a key computes; callers arriving while it runs
+    wait for and share its result (or its exception). A successful result
+    is then served from cache for `ttl` seconds. Shared results must be
+    treated as read-only.
+
+    Keys are tuples whose first item is their scope (the tenant, in this
+    app). invalidate(scope) drops that scope's cached results and bumps its
+    generation: a computation that started before the invalidation still
+    answers the callers already waiting on it, but its result is not cached
+    and later callers start a fresh one.
+    """
+
+    def __init__(self, ttl=0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._cache = {}  # key -> (expires at, result)
+        self._generations = {}  # scope -> invalidation count
+        self._counts = {'computed': 0, 'coalesced': 0, 'cached': 0}
+
+    def do(self, key, compute):
+        scope = key[0]
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and cached[0] > time.monotonic():
+                self._counts['cached'] += 1
+                return cached[1]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                generation = self._generations.get(scope, 0)
+            else:
+                self._counts['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = compute()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                self._counts['computed'] += 1
+                current = self._generations.get(scope, 0) == generation
+                if call.error is None and self.ttl and current:
+                    now = time.monotonic()
+                    self._cache = {k: v for k, v in self._cache.items() if v[0] > now}
+                    self._cache[key] = (now + self.ttl, call.result)
+            call.done.set()
+        return call.result
+
+    def invalidate(self, scope):
+        """Forget `scope`'s results, including any still being computed"""
+        with self._lock:
+            self._generations[scope] = self._generations.get(scope, 0) + 1
+            self._cache = {key: value for key, value in self._cache.items() if key[0] != scope}
+            self._calls = {key: call for key, call in self._calls.items() if key[0] != scope}
+
+    def metrics(self):
+        """Call counts and the share of calls answered without computing"""
+        with self._lock:
+            counts = dict(self._counts)
+            counts['in_flight'] = len(self._calls)
+        requests = counts['computed'] + counts['coalesced'] + counts['cached']
+        counts['requests'] = requests
+        counts['coalescing_ratio'] = round((counts['coalesced'] + counts['cached']) / requests, 3) if requests else 0.0
+        return counts
@@ -7,55 +7,136 @@ class Config:
     UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     
+    # Fernet key for the client credential vault; generated into
+    # CREDENTIAL_KEY_FILE on first run when not set in the environment
+    CREDENTIAL_KEY = os.environ.get('CREDENTIAL_KEY')
+    CREDENTIAL_KEY_FILE = os.path.join(os.path.dirname(__file__), 'database', 'credential.key')
+    CREDENTIAL_CACHE_SECONDS = 60
+    
     # GST Return Configuration
     GST_RETURNS = {
         'GSTR-1': {
             'frequency': 'Monthly',
             'due_date': 11,
-            'applicable_taxpayer': 'Monthly'
+            'applicable_taxpayer': 'Monthly',
+            'late_fee_per_day': 50,
+            'late_fee_cap': 10000
         },
         'GSTR-3B': {
             'frequency': 'Monthly',
             'due_date': 20,
-            'applicable_taxpayer': 'Monthly'
+            'applicable_taxpayer': 'Monthly',
+            'late_fee_per_day': 50,
+            'late_fee_cap': 10000
         },
         'IFF': {
             'frequency': 'Monthly',
             'due_date': 13,
-            'applicable_taxpayer': 'Quarterly'
+            'applicable_taxpayer': 'Quarterly',
+            'late_fee_per_day': 0,
+            'late_fee_cap': 0
         },
         'PMT-06': {
             'frequency': 'Monthly',
             'due_date': 25,
-            'applicable_taxpayer': 'Quarterly'
+            'applicable_taxpayer': 'Quarterly',
+            'late_fee_per_day': 0,
+            'late_fee_cap': 0
         },
         'GSTR-3B (Q)': {
             'frequency': 'Quarterly',
             'due_date': 22,
-            'applicable_taxpayer': 'Quarterly'
+            'applicable_taxpayer': 'Quarterly',
+            'late_fee_per_day': 50,
+            'late_fee_cap': 10000
         },
         'GSTR-9': {
             'frequency': 'Annually',
             'due_date': '31-12',
-            'applicable_taxpayer': 'Monthly/Quarterly'
+            'applicable_taxpayer': 'Monthly/Quarterly',
+            'late_fee_per_day': 200,
+            'late_fee_cap': None
         },
         'GSTR-9C': {
             'frequency': 'Annually',
             'due_date': '31-12',
-            'applicable_taxpayer': 'Monthly'
+            'applicable_taxpayer': 'Monthly',
+            'late_fee_per_day': 0,
+            'late_fee_cap': 0
         },
         'CMP-08': {
             'frequency': 'Quarterly',
             'due_date': 18,
-            'applicable_taxpayer': 'Composition'
+            'applicable_taxpayer': 'Composition',
+            'late_fee_per_day': 50,
+            'late_fee_cap': 2000
         },
         'GSTR-4': {
             'frequency': 'Annually',
             'due_date': '30-06',
-            'applicable_taxpayer': 'Composition'
+            'applicable_taxpayer': 'Composition',
+            'late_fee_per_day': 50,
+            'late_fee_cap': 2000
         }
     }
     
+    # Live return-grid updates (Server-Sent Events)
+    SSE_QUEUE_SIZE = 100  # pending updates per subscriber before it must resync
+    SSE_HEARTBEAT_SECONDS = 15
+    
+    # Returns falling due within this many days are flagged as 'due soon'
+    DUE_SOON_DAYS = 7
+    
+    # /api/return_dashboard: identical concurrent requests share one
+    # computation, whose result is reused for DASHBOARD_CACHE_SECONDS; each
+    # client may make DASHBOARD_RATE_BURST calls at once, refilled at
+    # DASHBOARD_RATE_PER_SECOND
+    DASHBOARD_CACHE_SECONDS = 5
+    DASHBOARD_RATE_PER_SECOND = 2
+    DASHBOARD_RATE_BURST = 10
+    
+    # Request profiling: a request is sampled at random for PROFILE_SAMPLE_RATE
+    # of requests and, only when PROFILE_ON_REQUEST=1 is set, when it sends an
+    # X-Profile: 1 header or ?profile=1 (off by default, since any client could
+    # otherwise slow its own requests down with sampling).
+    # Collapsed-stack files go to PROFILE_FOLDER (newest PROFILE_KEEP kept)
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE') or 0)
+    PROFILE_ON_REQUEST = os.environ.get('PROFILE_ON_REQUEST') == '1'
+    PROFILE_INTERVAL_SECONDS = 0.005
+    PROFILE_FOLDER = os.path.join(os.path.dirname(__file__), 'profiles')
+    PROFILE_KEEP = 200
+    
+    # ChangeLog sequence numbers are taken at insert but become visible at
+    # commit, so a lower one can appear after a higher one was read. Change
+    # cursors re-read such gaps until they fill or are this old (the write
+    # was rolled back); keep it above the longest write transaction
+    CHANGE_GAP_SECONDS = 600
+    
+    # Rows fetched per round-trip when streaming report exports
+    EXPORT_BATCH_SIZE = 1000
+    
+    # Closed financial years move to one SQLite file each in ARCHIVE_FOLDER;
+    # the current year and the ARCHIVE_KEEP_YEARS - 1 before it stay live
+    ARCHIVE_FOLDER = os.path.join(os.path.dirname(__file__), 'database', 'archive')
+    ARCHIVE_KEEP_YEARS = 2
+    
+    # Gzipped SQLite snapshots and incrementals written by backup.py
+    BACKUP_FOLDER = os.path.join(os.path.dirname(__file__), 'database', 'backups')
+    
+    # One Access file per firm. The default tenant uses the paths above;
+    # every other tenant in GST_TENANTS (comma-separated IDs) gets its own
+    # database, archive, backups and credential key under
+    # TENANT_FOLDER/<tenant>. CREDENTIAL_KEY applies to the default tenant
+    # only. Command-line tools work on the tenant named in GST_TENANT.
+    DEFAULT_TENANT = 'default'
+    TENANTS = [tenant.strip() for tenant in os.environ.get('GST_TENANTS', '').split(',') if tenant.strip()]
+    TENANT_FOLDER = os.path.join(os.path.dirname(__file__), 'database', 'tenants')
+    
+    # Pooled Access connections per tenant; idle ones are closed after DB_POOL_IDLE_SECONDS
+    DB_POOL_SIZE = 10
+    DB_POOL_TIMEOUT_SECONDS = 30
+    DB_POOL_IDLE_SECONDS = 300
+    
     TAXPAYER_TYPES = ['Monthly', 'Quarterly', 'Composition']
     RETURN_STATUS = ['Data Received', 'Saved', 'Payment Issued', 'Submitted', 'Filed']
     QUARTERS = ['Apr-Jun', 'Jul-Sep', 'Oct-Dec', 'Jan-Mar']
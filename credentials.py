@@ -0,0 +1,199 @@
+import os
+import threading
+import time
+from datetime import datetime
+from cryptography.fernet import Fernet, InvalidToken
+from database import DatabaseConnection, column_exists
+from config import Config
+from tenants import current_tenant, tenant_paths
+
+# API field name -> ClientCredentials column
+CREDENTIAL_FIELDS = {
+    'gst_portal_password': 'GSTPortalPassword',
+    'eway_bill_password': 'EWAYBillPassword',
+    'email_password': 'EmailPassword'
+}
+
+
+def load_credential_key():
+    """Vault key of the current tenant from the environment, or from its key file (created on first use)"""
+    if Config.CREDENTIAL_KEY and current_tenant() == Config.DEFAULT_TENANT:
+        return Config.CREDENTIAL_KEY.encode()
+
+    key_file_path = tenant_paths().credential_key_file
+    if os.path.exists(key_file_path):
+        with open(key_file_path, 'rb') as key_file:
+            return key_file.read().strip()
+
+    key = Fernet.generate_key()
+    os.makedirs(os.path.dirname(key_file_path), exist_ok=True)
+    with open(key_file_path, 'wb') as key_file:
+        key_file.write(key)
+    return key
+
+
+class CredentialVault:
+    """Encrypted per-client passwords with audited, cached decryption"""
+
+    def __init__(self, key=None, cache_seconds=None):
+        self.db = DatabaseConnection()
+        self._fernet = Fernet(key or load_credential_key())
+        self.cache_seconds = Config.CREDENTIAL_CACHE_SECONDS if cache_seconds is None else cache_seconds
+        self._cache = {}
+        self._generations = {}  # client_code -> bumped on every invalidation
+        self._lock = threading.Lock()
+
+    def encrypt(self, value):
+        if value is None or value == '':
+            return None
+        return self._fernet.encrypt(str(value).encode()).decode()
+
+    def decrypt(self, token):
+        if not token:
+            return None
+        try:
+            return self._fernet.decrypt(token.encode()).decode()
+        except InvalidToken:
+            print("Credential decryption failed: wrong key or corrupted value")
+            return None
+
+    def insert_statement(self, credentials):
+        """Callable for DatabaseConnection.execute_transaction storing a new client's credentials"""
+        encrypted = tuple(self.encrypt(credentials.get(field)) for field in CREDENTIAL_FIELDS)
+
+        def statement(client_code):
+            query = """
+                INSERT INTO ClientCredentials (
+                    ClientCode, GSTPortalPassword, EWAYBillPassword, EmailPassword, UpdatedAt
+                ) VALUES (?, ?, ?, ?, ?)
+            """
+            return query, (client_code,) + encrypted + (datetime.now(),)
+        return statement
+
+    def update_statements(self, client_code, credentials):
+        """Statements replacing only the credentials present in `credentials`
+
+        The caller invalidates the client's cached credentials once the
+        transaction has committed.
+        """
+        provided = {field: value for field, value in credentials.items()
+                    if field in CREDENTIAL_FIELDS and value}
+        if not provided:
+            return []
+
+        assignments = ', '.join(f"[{CREDENTIAL_FIELDS[field]}] = ?" for field in provided)
+        params = tuple(self.encrypt(value) for value in provided.values())
+        columns = ', '.join(CREDENTIAL_FIELDS[field] for field in provided)
+        placeholders = ', '.join('?' * len(provided))
+        return [
+            # Clients created before the vault existed may have no row yet
+            (f"""
+                INSERT INTO ClientCredentials (ClientCode, {columns}, UpdatedAt)
+                SELECT ?, {placeholders}, ? FROM ClientMaster
+                WHERE ClientCode = ? AND ClientCode NOT IN (SELECT ClientCode FROM ClientCredentials)
+            """, (client_code,) + params + (datetime.now(), client_code)),
+            (f"UPDATE ClientCredentials SET {assignments}, [UpdatedAt] = ? WHERE [ClientCode] = ?",
+             params + (datetime.now(), client_code))
+        ]
+
+    def delete_statement(self, client_code):
+        return "DELETE FROM ClientCredentials WHERE ClientCode = ?", (client_code,)
+
+    def invalidate(self, client_code=None):
+        with self._lock:
+            if client_code is None:
+                self._cache.clear()
+                self._generations[None] = self._generations.get(None, 0) + 1
+            else:
+                self._cache.pop(client_code, None)
+                self._generations[client_code] = self._generations.get(client_code, 0) + 1
+
+    def get_credentials(self, client_code, accessed_by=None, purpose='view'):
+        """Decrypted credentials for one client; every call is audited"""
+        self._audit(client_code, accessed_by, purpose)
+
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(client_code)
+            if cached and cached[0] > now:
+                return dict(cached[1])
+            generation = (self._generations.get(None, 0), self._generations.get(client_code, 0))
+
+        self.db.connect()
+        row = self.db.fetch_one("""
+            SELECT GSTPortalPassword, EWAYBillPassword, EmailPassword
+            FROM ClientCredentials
+            WHERE ClientCode = ?
+        """, (client_code,))
+        self.db.disconnect()
+
+        credentials = {field: self.decrypt(row[i]) if row else None
+                       for i, field in enumerate(CREDENTIAL_FIELDS)}
+        with self._lock:
+            # Not cached if a write committed while we read: the row may predate it
+            if generation == (self._generations.get(None, 0), self._generations.get(client_code, 0)):
+                self._cache[client_code] = (now + self.cache_seconds, credentials)
+        return dict(credentials)
+
+    def get_all_credentials(self, accessed_by=None, purpose='export'):
+        """Decrypted credentials for every client, keyed by ClientCode (audited once)"""
+        self._audit(None, accessed_by, purpose)
+
+        self.db.connect()
+        rows = self.db.fetch_all("""
+            SELECT ClientCode, GSTPortalPassword, EWAYBillPassword, EmailPassword
+            FROM ClientCredentials
+        """)
+        self.db.disconnect()
+
+        return {row[0]: {field: self.decrypt(row[i + 1]) for i, field in enumerate(CREDENTIAL_FIELDS)}
+                for row in rows}
+
+    def _audit(self, client_code, accessed_by, purpose):
+        self.db.connect()
+        self.db.execute_non_query("""
+            INSERT INTO CredentialAccessLog (ClientCode, AccessedAt, AccessedBy, Purpose)
+            VALUES (?, ?, ?, ?)
+        """, (client_code, datetime.now(), accessed_by, purpose))
+        self.db.disconnect()
+
+    def migrate_plaintext(self):
+        """Move passwords still stored in ClientMaster into the vault and drop those columns"""
+        self.db.connect()
+        try:
+            cursor = self.db.connection.cursor()
+            if not column_exists(cursor, 'ClientMaster', 'GSTPortalPassword'):
+                cursor.close()
+                return 0
+
+            rows = cursor.execute("""
+                SELECT ClientCode, GSTPortalPassword, EWAYBillPassword, EmailPassword
+                FROM ClientMaster
+                WHERE ClientCode NOT IN (SELECT ClientCode FROM ClientCredentials)
+            """).fetchall()
+            cursor.fast_executemany = True
+            if rows:
+                cursor.executemany("""
+                    INSERT INTO ClientCredentials (
+                        ClientCode, GSTPortalPassword, EWAYBillPassword, EmailPassword, UpdatedAt
+                    ) VALUES (?, ?, ?, ?, ?)
+                """, [(row[0], self.encrypt(row[1]), self.encrypt(row[2]), self.encrypt(row[3]), datetime.now())
+                      for row in rows])
+            self.db.connection.commit()
+
+            # Only once every password is safely in the vault
+            for column in CREDENTIAL_FIELDS.values():
+                cursor.execute(f"ALTER TABLE ClientMaster DROP COLUMN {column}")
+            self.db.connection.commit()
+            cursor.close()
+            print(f"Moved credentials for {len(rows)} clients into the vault")
+            return len(rows)
+        except Exception as e:
+            print(f"Credential migration error: {e}")
+            try:
+                self.db.connection.rollback()
+            except:
+                pass
+            return 0
+        finally:
+            self.db.disconnect()
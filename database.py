@@ -5,31 +5,130 @@ from config import Config
 # Improved database.py
 import pyodbc
 import os
+import threading
+import time
 from config import Config
+from tenants import current_tenant, tenant_paths
+
+def connection_string(database_path):
+    return f"DRIVER={{Microsoft Access Driver (*.mdb, *.accdb)}};DBQ={database_path};"
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection frees up within DB_POOL_TIMEOUT_SECONDS"""
+
+class ConnectionPool:
+    """Bounded pool of open connections to one tenant's Access file
+    
+    Opening an Access connection costs far more than the queries most
+    requests run, so connections are handed back here instead of being
+    closed. At most `size` are out at once; idle ones are reused newest
+    first and closed once unused for `idle_seconds`.
+    """
+    
+    def __init__(self, database_path, size=None, timeout=None, idle_seconds=None):
+        self.connection_string = connection_string(database_path)
+        self.size = size or Config.DB_POOL_SIZE
+        self.timeout = Config.DB_POOL_TIMEOUT_SECONDS if timeout is None else timeout
+        self.idle_seconds = Config.DB_POOL_IDLE_SECONDS if idle_seconds is None else idle_seconds
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._idle = []  # (returned at, connection), oldest first
+        self._in_use = 0
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"No database connection free after {self.timeout}s")
+        try:
+            with self._lock:
+                self._in_use += 1
+                self._close_expired()
+                if self._idle:
+                    return self._idle.pop()[1]
+            return pyodbc.connect(self.connection_string)
+        except BaseException:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+            raise
+    
+    def release(self, connection):
+        try:
+            connection.rollback()  # never hand over an open transaction
+            with self._lock:
+                self._idle.append((time.monotonic(), connection))
+        except pyodbc.Error:
+            self._close(connection)  # broken connection, open a fresh one next time
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+    
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for _, connection in idle:
+            self._close(connection)
+    
+    def stats(self):
+        with self._lock:
+            return {'size': self.size, 'in_use': self._in_use, 'idle': len(self._idle)}
+    
+    def _close_expired(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        while self._idle and self._idle[0][0] < cutoff:
+            self._close(self._idle.pop(0)[1])
+    
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except pyodbc.Error:
+            pass  # Connection may already be closed
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(tenant=None):
+    """Connection pool of `tenant` (default: the current one)"""
+    tenant = tenant or current_tenant()
+    pool = _pools.get(tenant)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(tenant, ConnectionPool(tenant_paths(tenant).database))
+    return pool
 
 class DatabaseConnection:
-    def __init__(self):
-        self.connection_string = f"DRIVER={{Microsoft Access Driver (*.mdb, *.accdb)}};DBQ={Config.DATABASE_PATH};"
-        self.connection = None
+    """Connection to the database of the tenant current when it was created
+    
+    connect() borrows a pooled connection and disconnect() returns it. The
+    borrowed connection is kept per thread, so one instance can be shared
+    by concurrent requests.
+    """
+    
+    def __init__(self, tenant=None):
+        self.tenant = tenant or current_tenant()
+        self.pool = get_pool(self.tenant)
+        self._local = threading.local()
+    
+    @property
+    def connection(self):
+        return getattr(self._local, 'connection', None)
     
     def connect(self):
         if self.connection is None:
             try:
-                self.connection = pyodbc.connect(self.connection_string)
+                self._local.connection = self.pool.acquire()
                 return self.connection
-            except pyodbc.Error as e:
+            except (pyodbc.Error, PoolTimeout) as e:
                 print(f"Database connection error: {e}")
                 return None
         return self.connection
     
     def disconnect(self):
-        if self.connection:
-            try:
-                self.connection.close()
-            except pyodbc.Error:
-                pass  # Connection may already be closed
-            finally:
-                self.connection = None
+        connection = self.connection
+        if connection:
+            self._local.connection = None
+            self.pool.release(connection)
     
     def execute_non_query(self, query, params=None):
         if not self.connect():
@@ -64,6 +163,52 @@ class DatabaseConnection:
             print(f"Unexpected error: {e}")
             return False
 
+    def execute_transaction(self, statements):
+        """Execute (query, params) statements in one transaction.
+        
+        The first statement is the primary write: if it matches no rows the
+        transaction is rolled back. A statement may also be a callable that
+        receives the AutoNumber value generated by the first statement and
+        returns (query, params), for rows keyed on a freshly inserted ID.
+        Returns the list of affected row counts, or None on failure.
+        """
+        if not self.connect():
+            return None
+            
+        try:
+            cursor = self.connection.cursor()
+            row_counts = []
+            identity = None
+            for statement in statements:
+                if callable(statement):
+                    if identity is None:
+                        identity = cursor.execute("SELECT @@IDENTITY").fetchone()[0]
+                    statement = statement(identity)
+                query, params = statement
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                row_counts.append(cursor.rowcount)
+                
+                if len(row_counts) == 1 and row_counts[0] == 0:
+                    print(f"Warning: transaction write affected 0 rows")
+                    self.connection.rollback()
+                    cursor.close()
+                    return None
+            
+            self.connection.commit()
+            cursor.close()
+            return row_counts
+            
+        except pyodbc.Error as e:
+            print(f"Transaction error: {e}")
+            try:
+                self.connection.rollback()
+            except:
+                pass
+            return None
+
     def fetch_one(self, query, params=None):
         if not self.connect():
             return None
@@ -101,6 +246,38 @@ class DatabaseConnection:
         except pyodbc.Error as e:
             print(f"Fetch all error: {e}")
             return []
+    
+    def iter_rows(self, query, params=None, batch_size=1000):
+        """Yield rows in batches of batch_size instead of materialising the result"""
+        if not self.connect():
+            return
+            
+        cursor = self.connection.cursor()
+        try:
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        except pyodbc.Error as e:
+            print(f"Fetch rows error: {e}")
+        finally:
+            cursor.close()
+
+def table_exists(cursor, table_name):
+    """Check whether a table is present in the database"""
+    return any(row.table_name.lower() == table_name.lower()
+               for row in cursor.tables(tableType='TABLE'))
+
+def column_exists(cursor, table_name, column_name):
+    """Check whether a column is present on a table"""
+    return any(row.column_name.lower() == column_name.lower()
+               for row in cursor.columns(table=table_name))
 
 def create_database_tables():
     """Create database tables if they don't exist"""
@@ -110,10 +287,9 @@ def create_database_tables():
         print("Could not connect to database")
         return False
     
-    try:
-        # Create Client Master table - FIXED SYNTAX
-        cursor = db.connection.cursor()
-        cursor.execute("""
+    tables = {
+        # Client Master table
+        'ClientMaster': """
             CREATE TABLE ClientMaster (
                 ClientCode COUNTER PRIMARY KEY,
                 ClientName TEXT(255) NOT NULL,
@@ -122,17 +298,14 @@ def create_database_tables():
                 GSTIN TEXT(15) NOT NULL,
                 TaxpayerType TEXT(50) NOT NULL,
                 GSTPortalUserID TEXT(100) NOT NULL,
-                GSTPortalPassword TEXT(100) NOT NULL,
                 EWAYBillUserID TEXT(100),
-                EWAYBillPassword TEXT(100),
                 ClientEmailID TEXT(100) NOT NULL,
                 MobileNo TEXT(15) NOT NULL,
-                EmailPassword TEXT(100)
+                RowVersion LONG NOT NULL
             )
-        """)
-        
-        # Create GST Return Data table - FIXED SYNTAX
-        cursor.execute("""
+        """,
+        # GST Return Data table
+        'GSTReturnData': """
             CREATE TABLE GSTReturnData (
                 ReturnID COUNTER PRIMARY KEY,
                 ClientCode LONG NOT NULL,
@@ -141,13 +314,114 @@ def create_database_tables():
                 DateOfFiling DATE,
                 Status TEXT(50) NOT NULL,
                 ARN TEXT(100),
-                Remarks TEXT(255)
+                Remarks TEXT(255),
+                RowVersion LONG NOT NULL
+            )
+        """,
+        # Append-only change log; ChangeSeq is the feed position
+        'ChangeLog': """
+            CREATE TABLE ChangeLog (
+                ChangeSeq COUNTER PRIMARY KEY,
+                ChangedAt DATETIME NOT NULL,
+                Entity TEXT(20) NOT NULL,
+                Action TEXT(20) NOT NULL,
+                ClientCode LONG,
+                ReturnType TEXT(50),
+                Period TEXT(50),
+                Payload MEMO
+            )
+        """,
+        # Encrypted portal/e-mail passwords, kept out of ClientMaster
+        'ClientCredentials': """
+            CREATE TABLE ClientCredentials (
+                ClientCode LONG PRIMARY KEY,
+                GSTPortalPassword MEMO,
+                EWAYBillPassword MEMO,
+                EmailPassword MEMO,
+                UpdatedAt DATETIME NOT NULL
+            )
+        """,
+        # Audit trail of every credential decryption
+        'CredentialAccessLog': """
+            CREATE TABLE CredentialAccessLog (
+                AccessID COUNTER PRIMARY KEY,
+                ClientCode LONG,
+                AccessedAt DATETIME NOT NULL,
+                AccessedBy TEXT(100),
+                Purpose TEXT(50)
+            )
+        """,
+        # Append-only status transitions; statuses are RETURN_STATUS positions
+        # and the period is its calendar ordinal (see history.py)
+        'ReturnStatusHistory': """
+            CREATE TABLE ReturnStatusHistory (
+                HistoryID COUNTER PRIMARY KEY,
+                ClientCode LONG NOT NULL,
+                ReturnType TEXT(20) NOT NULL,
+                PeriodOrdinal LONG NOT NULL,
+                FromStatus BYTE,
+                ToStatus BYTE NOT NULL,
+                ChangedAt DATETIME NOT NULL
+            )
+        """,
+        # Analytics rollups kept current by throughput.py
+        'FilingRollup': """
+            CREATE TABLE FilingRollup (
+                ReturnType TEXT(20) NOT NULL,
+                PeriodOrdinal LONG NOT NULL,
+                FiledOn DATE,
+                FiledCount LONG NOT NULL
+            )
+        """,
+        'StatusRollup': """
+            CREATE TABLE StatusRollup (
+                ReturnType TEXT(20) NOT NULL,
+                PeriodOrdinal LONG NOT NULL,
+                StatusCode BYTE NOT NULL,
+                ReturnCount LONG NOT NULL
+            )
+        """,
+        'ActivityRollup': """
+            CREATE TABLE ActivityRollup (
+                ActivityDate DATE NOT NULL,
+                ReturnType TEXT(20) NOT NULL,
+                ToStatus BYTE NOT NULL,
+                TransitionCount LONG NOT NULL
+            )
+        """,
+        # Source position each rollup has been refreshed up to
+        'RollupState': """
+            CREATE TABLE RollupState (
+                RollupName TEXT(50) PRIMARY KEY,
+                LastPosition LONG NOT NULL
             )
-        """)
+        """
+    }
+    
+    # Columns added after the first release: (table, column, type, fill value)
+    added_columns = [
+        ('ClientMaster', 'RowVersion', 'LONG', 1),
+        ('GSTReturnData', 'RowVersion', 'LONG', 1)
+    ]
+    
+    try:
+        cursor = db.connection.cursor()
+        created = []
+        for table_name, ddl in tables.items():
+            if not table_exists(cursor, table_name):
+                cursor.execute(ddl)
+                created.append(table_name)
+        
+        for table_name, column_name, column_type, fill_value in added_columns:
+            if not column_exists(cursor, table_name, column_name):
+                cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}")
+                cursor.execute(f"UPDATE {table_name} SET {column_name} = ?", (fill_value,))
+                created.append(f"{table_name}.{column_name}")
         
         db.connection.commit()
         cursor.close()
-        print("Database tables created successfully")
+        if created:
+            print(f"Database schema updated: {', '.join(created)}")
         return True
         
     except pyodbc.Error as e:
@@ -155,3 +429,103 @@ def create_database_tables():
         return False
     finally:
         db.disconnect()
+
+def create_database_indexes():
+    """Create lookup indexes used by the period and due-date queries"""
+    db = DatabaseConnection()
+    
+    if not db.connect():
+        print("Could not connect to database")
+        return False
+    
+    indexes = [
+        "CREATE INDEX idx_return_period ON GSTReturnData (ReturnType, Period, DateOfFiling)",
+        "CREATE INDEX idx_return_client ON GSTReturnData (ClientCode)",
+        # One row per client/return/period; concurrent first saves collide here
+        "CREATE UNIQUE INDEX idx_return_key ON GSTReturnData (ClientCode, ReturnType, Period)",
+        "CREATE INDEX idx_client_type_reg ON ClientMaster (TaxpayerType, DateOfRegistration)",
+        "CREATE INDEX idx_client_cancel ON ClientMaster (EffectiveDateOfCancellation)",
+        # One client per GSTIN; not created while older duplicates remain
+        "CREATE UNIQUE INDEX idx_client_gstin ON ClientMaster (GSTIN)",
+        "CREATE INDEX idx_history_row ON ReturnStatusHistory (ClientCode, ReturnType, PeriodOrdinal)",
+        "CREATE INDEX idx_history_status ON ReturnStatusHistory (ReturnType, ToStatus, ChangedAt)",
+        "CREATE INDEX idx_filing_rollup ON FilingRollup (ReturnType, PeriodOrdinal)",
+        "CREATE INDEX idx_status_rollup ON StatusRollup (ReturnType, PeriodOrdinal)",
+        "CREATE UNIQUE INDEX idx_activity_rollup ON ActivityRollup (ActivityDate, ReturnType, ToStatus)",
+        # Where a new change cursor starts looking for uncommitted changes
+        "CREATE INDEX idx_changelog_time ON ChangeLog (ChangedAt)"
+    ]
+    
+    try:
+        cursor = db.connection.cursor()
+        for ddl in indexes:
+            try:
+                cursor.execute(ddl)
+            except pyodbc.Error:
+                pass  # Index already exists
+        db.connection.commit()
+        
+        duplicates = cursor.execute("""
+            SELECT GSTIN, COUNT(*) FROM ClientMaster GROUP BY GSTIN HAVING COUNT(*) > 1
+        """).fetchall()
+        if duplicates:
+            print(f"Unique GSTIN index not created; duplicate GSTINs: {', '.join(row[0] for row in duplicates)}")
+        cursor.close()
+        return True
+    finally:
+        db.disconnect()
+
+def create_database_file():
+    """Create an empty Access file for the current tenant if it has none yet (Windows only)"""
+    import ctypes
+    
+    path = tenant_paths().database
+    if os.path.exists(path):
+        return True
+    if not hasattr(ctypes, 'windll'):
+        print(f"Creating {path} needs the Windows Access ODBC driver")
+        return False
+    
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    attributes = f'CREATE_DB="{path}" General\0'
+    ODBC_ADD_DSN = 1
+    if not ctypes.windll.ODBCCP32.SQLConfigDataSourceW(
+            None, ODBC_ADD_DSN, "Microsoft Access Driver (*.mdb, *.accdb)", attributes):
+        print(f"Could not create database {path}")
+        return False
+    print(f"Created database {path}")
+    return True
+
+def compact_database():
+    """Compact and repair the Access file through the ODBC driver (Windows only)
+    
+    Access never gives space back on its own, so the file keeps its size
+    after rows are archived or deleted. Run with the app stopped: the file
+    must not be open while it is rewritten. The previous file is kept as
+    gst_tracking.accdb.bak.
+    """
+    import ctypes
+    
+    if not hasattr(ctypes, 'windll'):
+        print("Database compaction needs the Windows Access ODBC driver")
+        return False
+    
+    source = tenant_paths().database
+    get_pool().close_all()
+    target = source + '.compact'
+    backup = source + '.bak'
+    if os.path.exists(target):
+        os.remove(target)
+    
+    size_before = os.path.getsize(source)
+    attributes = f'COMPACT_DB="{source}" "{target}" General\0'
+    ODBC_ADD_DSN = 1
+    if not ctypes.windll.ODBCCP32.SQLConfigDataSourceW(
+            None, ODBC_ADD_DSN, "Microsoft Access Driver (*.mdb, *.accdb)", attributes):
+        print("Database compaction failed (is the database still open?)")
+        return False
+    
+    os.replace(source, backup)
+    os.replace(target, source)
+    print(f"Database compacted: {size_before // 1024} KB -> {os.path.getsize(source) // 1024} KB")
+    return True
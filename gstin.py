@@ -0,0 +1,49 @@
+import re
+
+# State/UT code (first two GSTIN digits) -> name
+STATE_CODES = {
+    '01': 'Jammu and Kashmir', '02': 'Himachal Pradesh', '03': 'Punjab', '04': 'Chandigarh',
+    '05': 'Uttarakhand', '06': 'Haryana', '07': 'Delhi', '08': 'Rajasthan',
+    '09': 'Uttar Pradesh', '10': 'Bihar', '11': 'Sikkim', '12': 'Arunachal Pradesh',
+    '13': 'Nagaland', '14': 'Manipur', '15': 'Mizoram', '16': 'Tripura',
+    '17': 'Meghalaya', '18': 'Assam', '19': 'West Bengal', '20': 'Jharkhand',
+    '21': 'Odisha', '22': 'Chhattisgarh', '23': 'Madhya Pradesh', '24': 'Gujarat',
+    '25': 'Daman and Diu', '26': 'Dadra and Nagar Haveli and Daman and Diu', '27': 'Maharashtra',
+    '28': 'Andhra Pradesh (before reorganisation)', '29': 'Karnataka', '30': 'Goa',
+    '31': 'Lakshadweep', '32': 'Kerala', '33': 'Tamil Nadu', '34': 'Puducherry',
+    '35': 'Andaman and Nicobar Islands', '36': 'Telangana', '37': 'Andhra Pradesh',
+    '38': 'Ladakh', '97': 'Other Territory', '99': 'Centre Jurisdiction'
+}
+
+# State code, PAN, entity number, 'Z', check character (same pattern as the client form)
+GSTIN_PATTERN = re.compile(r'[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z][1-9A-Z]Z[0-9A-Z]')
+
+_CHARACTERS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def normalize_gstin(value):
+    """GSTIN as stored: trimmed and upper case ('' for empty values)"""
+    return str(value).strip().upper() if value else ''
+
+
+def gstin_check_character(first_fourteen):
+    """Check character for the first 14 GSTIN characters (base-36 weighted sum)"""
+    total = 0
+    for position, character in enumerate(first_fourteen):
+        product = _CHARACTERS.index(character) * (2 if position % 2 else 1)
+        total += product // 36 + product % 36
+    return _CHARACTERS[(36 - total % 36) % 36]
+
+
+def validate_gstin(value):
+    """Error message for an invalid GSTIN, or None when it is valid"""
+    gstin = normalize_gstin(value)
+    if len(gstin) != 15:
+        return f'GSTIN {gstin or "(empty)"} must be 15 characters'
+    if not GSTIN_PATTERN.fullmatch(gstin):
+        return f'GSTIN {gstin} does not follow the state code + PAN + entity + Z + check format'
+    if gstin[:2] not in STATE_CODES:
+        return f'GSTIN {gstin} has an unknown state code {gstin[:2]}'
+    if gstin_check_character(gstin[:14]) != gstin[14]:
+        return f'GSTIN {gstin} has an invalid check character'
+    return None
@@ -0,0 +1,123 @@
+import statistics
+from datetime import datetime
+from database import DatabaseConnection
+from config import Config
+from periods import get_calendar, month_ordinal
+
+# Status <-> the small integer stored in ReturnStatusHistory (its RETURN_STATUS position)
+STATUS_CODES = {status: code for code, status in enumerate(Config.RETURN_STATUS)}
+FILED_STATUS = Config.RETURN_STATUS[-1]
+
+HISTORY_INSERT = """
+    INSERT INTO ReturnStatusHistory (
+        ClientCode, ReturnType, PeriodOrdinal, FromStatus, ToStatus, ChangedAt
+    ) VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+def financial_year_ordinals(financial_year):
+    """(first month ordinal, last month ordinal, annual ordinal) of a financial year"""
+    start_year = int(financial_year[:4])
+    return month_ordinal(start_year, 4), month_ordinal(start_year + 1, 3), start_year
+
+
+class StatusHistory:
+    """Append-only status transitions of return rows
+
+    One row per change of Status, written in the same transaction as the
+    return row itself. Status is stored as its RETURN_STATUS position and
+    the period as its calendar ordinal, so a transition costs a few bytes
+    and period ranges are plain integer comparisons.
+    """
+
+    def __init__(self):
+        self.db = DatabaseConnection()
+
+    def transition_statement(self, client_code, return_type, period, from_status, to_status, changed_at=None):
+        """(query, params) recording a status change, or None when the status is unchanged"""
+        if from_status == to_status:
+            return None
+        params = (
+            client_code,
+            return_type,
+            get_calendar().ordinal(period),
+            STATUS_CODES.get(from_status),
+            STATUS_CODES[to_status],
+            changed_at or datetime.now()
+        )
+        return HISTORY_INSERT, params
+
+    def get_history(self, client_code, return_type, period):
+        """Transitions of one return row, oldest first"""
+        self.db.connect()
+        rows = self.db.fetch_all("""
+            SELECT FromStatus, ToStatus, ChangedAt
+            FROM ReturnStatusHistory
+            WHERE ClientCode = ? AND ReturnType = ? AND PeriodOrdinal = ?
+            ORDER BY HistoryID
+        """, (client_code, return_type, get_calendar().ordinal(period)))
+        self.db.disconnect()
+
+        return [{
+            'from_status': Config.RETURN_STATUS[row[0]] if row[0] is not None else None,
+            'to_status': Config.RETURN_STATUS[row[1]],
+            'changed_at': row[2].strftime('%Y-%m-%d %H:%M:%S') if row[2] else None
+        } for row in rows]
+
+    def cycle_times(self, from_status=None, to_status=FILED_STATUS, financial_year=None, return_types=None):
+        """Days each return row took from first reaching `from_status` to first reaching `to_status`
+
+        "Reaching" a status also counts skipping past it, so a row first
+        saved as 'Saved' has reached 'Data Received' at that moment.
+        Returns {return_type: {'count', 'median_days', 'mean_days', 'p90_days'}}.
+        """
+        from_code = STATUS_CODES[from_status or Config.RETURN_STATUS[0]]
+        to_code = STATUS_CODES[to_status]
+        if to_code <= from_code:
+            raise ValueError(f'{to_status} does not come after {from_status}')
+
+        conditions, params = ["ToStatus >= ?"], [from_code]
+        if financial_year:
+            first, last, annual = financial_year_ordinals(financial_year)
+            conditions.append("(PeriodOrdinal BETWEEN ? AND ? OR PeriodOrdinal = ?)")
+            params += [first, last, annual]
+        if return_types:
+            conditions.append(f"ReturnType IN ({', '.join('?' * len(return_types))})")
+            params += list(return_types)
+
+        # First time each row reached each status; a row has at most len(RETURN_STATUS) of these
+        query = f"""
+            SELECT ReturnType, ClientCode, PeriodOrdinal, ToStatus, MIN(ChangedAt)
+            FROM ReturnStatusHistory
+            WHERE {' AND '.join(conditions)}
+            GROUP BY ReturnType, ClientCode, PeriodOrdinal, ToStatus
+            ORDER BY ReturnType, ClientCode, PeriodOrdinal
+        """
+        durations = {}
+        self.db.connect()
+        try:
+            key, started, finished = None, None, None
+            for return_type, client_code, ordinal, code, reached_at in self.db.iter_rows(
+                    query, params, Config.EXPORT_BATCH_SIZE):
+                if (return_type, client_code, ordinal) != key:
+                    self._add_duration(durations, key, started, finished)
+                    key, started, finished = (return_type, client_code, ordinal), None, None
+                started = min(started, reached_at) if started else reached_at
+                if code >= to_code:
+                    finished = min(finished, reached_at) if finished else reached_at
+            self._add_duration(durations, key, started, finished)
+        finally:
+            self.db.disconnect()
+
+        return {return_type: {
+            'count': len(days),
+            'median_days': round(statistics.median(days), 1),
+            'mean_days': round(statistics.fmean(days), 1),
+            'p90_days': round(statistics.quantiles(days, n=10, method='inclusive')[-1], 1) if len(days) > 1 else round(days[0], 1)
+        } for return_type, days in sorted(durations.items())}
+
+    @staticmethod
+    def _add_duration(durations, key, started, finished):
+        if key is None or not finished:
+            return
+        durations.setdefault(key[0], []).append((finished - started).total_seconds() / 86400)
@@ -1,11 +1,68 @@
 from datetime import datetime, date
-from dateutil.relativedelta import relativedelta
+import pyodbc
 from database import DatabaseConnection
 from config import Config
+from periods import get_calendar, quarter_end_month
+from changefeed import ChangeFeed, ENTITY_CLIENT, ENTITY_RETURN
+from credentials import CredentialVault
+from archive import get_archive
+from history import StatusHistory, STATUS_CODES
+from gstin import normalize_gstin
+from records import (client_projection, return_projection, CLIENT_ALL,
+                     CLIENT_APPLICABILITY, RETURN_ALL)
+
+class RowVersionConflict(Exception):
+    """Raised when a row was changed by someone else since the caller read it"""
+    
+    def __init__(self, current):
+        super().__init__('Record was modified by another user')
+        self.current = current  # Row as currently stored, or None if deleted
+
+def return_data_unchanged(existing, return_data):
+    """True when saving return_data over the stored row (None if absent) would change nothing"""
+    if existing is None:
+        # A default "Data Received" row with nothing filled in is not worth inserting
+        return ((return_data.get('status') or Config.RETURN_STATUS[0]) == Config.RETURN_STATUS[0]
+                and not any(return_data.get(field) for field in ('date_of_filing', 'arn', 'remarks')))
+    
+    stored_filing = existing.date_of_filing
+    if isinstance(stored_filing, datetime):
+        stored_filing = stored_filing.date()
+    return (stored_filing == (return_data.get('date_of_filing') or None)
+            and existing.status == return_data.get('status')
+            and (existing.arn or None) == (return_data.get('arn') or None)
+            and (existing.remarks or None) == (return_data.get('remarks') or None))
+
+# Taxpayer types each 'applicable_taxpayer' setting covers (None = everyone)
+APPLICABLE_TAXPAYER_TYPES = {
+    'Monthly': ('Monthly',),
+    'Quarterly': ('Quarterly',),
+    'Composition': ('Composition',),
+    'Monthly/Quarterly': ('Monthly', 'Quarterly')
+}
+
+def taxpayer_applies(applicable_taxpayer, taxpayer_type):
+    """Python counterpart of get_taxpayer_condition for rows already fetched"""
+    allowed = APPLICABLE_TAXPAYER_TYPES.get(applicable_taxpayer)
+    return allowed is None or taxpayer_type in allowed
+
+def get_taxpayer_condition(applicable_taxpayer):
+    """SQL condition on TaxpayerType for a return's 'applicable_taxpayer' setting"""
+    if applicable_taxpayer == 'Monthly':
+        return "TaxpayerType = 'Monthly'"
+    elif applicable_taxpayer == 'Quarterly':
+        return "TaxpayerType = 'Quarterly'"
+    elif applicable_taxpayer == 'Composition':
+        return "TaxpayerType = 'Composition'"
+    elif applicable_taxpayer == 'Monthly/Quarterly':
+        return "TaxpayerType IN ('Monthly', 'Quarterly')"
+    return "1=1"
 
 class Client:
     def __init__(self):
         self.db = DatabaseConnection()
+        self.changes = ChangeFeed()
+        self.vault = CredentialVault()
     
     def get_next_client_code(self):
         """Generate next client code"""
@@ -18,15 +75,15 @@ class Client:
         return 1
     
     def create_client(self, client_data):
-        """Create new client"""
+        """Create new client; passwords go to the credential vault"""
         self.db.connect()
         
         query = """
             INSERT INTO ClientMaster (
                 ClientName, DateOfRegistration, EffectiveDateOfCancellation,
-                GSTIN, TaxpayerType, GSTPortalUserID, GSTPortalPassword,
-                EWAYBillUserID, EWAYBillPassword, ClientEmailID, MobileNo, EmailPassword
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                GSTIN, TaxpayerType, GSTPortalUserID, EWAYBillUserID,
+                ClientEmailID, MobileNo, RowVersion
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
         """
         
         params = (
@@ -36,58 +93,55 @@ class Client:
             client_data['gstin'],
             client_data['taxpayer_type'],
             client_data['gst_portal_userid'],
-            client_data['gst_portal_password'],
             client_data.get('eway_bill_userid'),
-            client_data.get('eway_bill_password'),
             client_data['client_email_id'],
-            client_data['mobile_no'],
-            client_data.get('email_password')
+            client_data['mobile_no']
         )
         
-        result = self.db.execute_non_query(query, params)
+        payload = {'client_name': client_data['client_name'], 'gstin': client_data['gstin']}
+        result = self.db.execute_transaction([
+            (query, params),
+            self.vault.insert_statement(client_data),
+            lambda client_code: self.changes.change_statement(
+                ENTITY_CLIENT, 'insert', client_code=client_code, payload=payload)
+        ]) is not None
         self.db.disconnect()
         return result
     
-    def get_all_clients(self):
-        """Get all clients"""
+    def get_all_clients(self, fields=CLIENT_ALL):
+        """Get all clients as records holding only the requested fields"""
+        projection = client_projection(fields)
         self.db.connect()
-        query = """
-            SELECT ClientCode, ClientName, DateOfRegistration, EffectiveDateOfCancellation,
-                   GSTIN, TaxpayerType, GSTPortalUserID, GSTPortalPassword,
-                   EWAYBillUserID, EWAYBillPassword, ClientEmailID, MobileNo, EmailPassword
-            FROM ClientMaster
-            ORDER BY ClientName
-        """
-        result = self.db.fetch_all(query)
+        rows = self.db.fetch_all(projection.select(order_by='ClientName'))
         self.db.disconnect()
-        return result
+        return projection.rows(rows)
     
-    def get_client_by_code(self, client_code):
-        """Get client by code"""
+    def get_client_by_code(self, client_code, fields=CLIENT_ALL):
+        """Get client by code as a record, or None"""
+        projection = client_projection(fields)
         self.db.connect()
-        query = """
-            SELECT ClientCode, ClientName, DateOfRegistration, EffectiveDateOfCancellation,
-                   GSTIN, TaxpayerType, GSTPortalUserID, GSTPortalPassword,
-                   EWAYBillUserID, EWAYBillPassword, ClientEmailID, MobileNo, EmailPassword
-            FROM ClientMaster
-            WHERE ClientCode = ?
-        """
-        result = self.db.fetch_one(query, (client_code,))
+        row = self.db.fetch_one(projection.select(where='ClientCode = ?'), (client_code,))
         self.db.disconnect()
-        return result
+        return projection.row(row)
     
-    # In models.py - Client class - update_client method
-    def update_client(self, client_code, client_data):
-        """Update client"""
+    def get_client_by_gstin(self, gstin, fields=CLIENT_ALL):
+        """Get the client holding a GSTIN as a record, or None"""
+        projection = client_projection(fields)
         self.db.connect()
+        row = self.db.fetch_one(projection.select(where='GSTIN = ?'), (normalize_gstin(gstin),))
+        self.db.disconnect()
+        return projection.row(row)
+    
+    def _update_statements(self, client_code, client_data):
+        """Statements updating one client: the (version-guarded) row, its credentials and its change"""
+        expected_version = client_data.get('row_version')
         
         # Fixed query with square brackets around field names
         query = """
             UPDATE ClientMaster SET
                 [ClientName] = ?, [DateOfRegistration] = ?, [EffectiveDateOfCancellation] = ?,
-                [GSTIN] = ?, [TaxpayerType] = ?, [GSTPortalUserID] = ?, [GSTPortalPassword] = ?,
-                [EWAYBillUserID] = ?, [EWAYBillPassword] = ?, [ClientEmailID] = ?, [MobileNo] = ?,
-                [EmailPassword] = ?
+                [GSTIN] = ?, [TaxpayerType] = ?, [GSTPortalUserID] = ?, [EWAYBillUserID] = ?,
+                [ClientEmailID] = ?, [MobileNo] = ?, [RowVersion] = [RowVersion] + 1
             WHERE [ClientCode] = ?
         """
         
@@ -98,69 +152,139 @@ class Client:
             client_data['gstin'],
             client_data['taxpayer_type'],
             client_data['gst_portal_userid'],
-            client_data['gst_portal_password'],
             client_data.get('eway_bill_userid'),
-            client_data.get('eway_bill_password'),
             client_data['client_email_id'],
             client_data['mobile_no'],
-            client_data.get('email_password'),
             client_code
         )
+        if expected_version is not None:
+            query += " AND [RowVersion] = ?"
+            params += (int(expected_version),)
+        
+        change = self.changes.change_statement(
+            ENTITY_CLIENT, 'update', client_code=client_code,
+            payload={'client_name': client_data['client_name'], 'gstin': client_data['gstin']}
+        )
+        return [(query, params)] + self.vault.update_statements(client_code, client_data) + [change]
+    
+    def update_client(self, client_code, client_data):
+        """Update client
         
-        result = self.db.execute_non_query(query, params)
+        When client_data carries the 'row_version' the caller read, the update
+        only applies if the row is still at that version; otherwise
+        RowVersionConflict is raised with the current row. Passwords left
+        empty keep their stored value.
+        """
+        expected_version = client_data.get('row_version')
+        statements = self._update_statements(client_code, client_data)
+        self.db.connect()
+        result = self.db.execute_transaction(statements) is not None
         self.db.disconnect()
+        if result:
+            self.vault.invalidate(client_code)
+        
+        if not result and expected_version is not None:
+            current = self.get_client_by_code(client_code)
+            if current is None or current.row_version != int(expected_version):
+                raise RowVersionConflict(current)
         return result
+    
+    def update_clients(self, updates):
+        """Apply many (client_code, client_data) updates in a single transaction
+        
+        Each row is guarded by its own 'row_version', so a client changed by
+        someone else meanwhile is skipped without undoing the rest; the
+        change log rows are appended in one batch before the commit.
+        Returns {client_code: True, RowVersionConflict, or False}.
+        """
+        results = {}
+        changes = []
+        self.db.connect()
+        try:
+            cursor = self.db.connection.cursor()
+            for client_code, client_data in updates:
+                (query, params), *credentials, change = self._update_statements(client_code, client_data)
+                try:
+                    cursor.execute(query, params)
+                    applied = cursor.rowcount != 0
+                except pyodbc.IntegrityError:
+                    applied = False  # e.g. GSTIN taken by another client
+                if not applied:
+                    results[client_code] = None
+                    continue
+                for credential_query, credential_params in credentials:
+                    cursor.execute(credential_query, credential_params)
+                changes.append(change)
+                results[client_code] = True
+            
+            if changes:
+                cursor.fast_executemany = True
+                cursor.executemany(changes[0][0], [params for _, params in changes])
+            self.db.connection.commit()
+            cursor.close()
+        except pyodbc.Error as e:
+            print(f"Transaction error: {e}")
+            try:
+                self.db.connection.rollback()
+            except:
+                pass
+            return {client_code: False for client_code, _ in updates}
+        finally:
+            self.db.disconnect()
+        
+        for client_code, client_data in updates:
+            if results[client_code]:
+                self.vault.invalidate(client_code)
+            if results[client_code] is None:
+                current = self.get_client_by_code(client_code)
+                expected_version = client_data.get('row_version')
+                if expected_version is not None and (current is None or current.row_version != int(expected_version)):
+                    results[client_code] = RowVersionConflict(current)
+                else:
+                    results[client_code] = False
+        return results
 
     
     def delete_client(self, client_code):
         """Delete client"""
         self.db.connect()
         
-        # First delete related return data
-        self.db.execute_non_query("DELETE FROM GSTReturnData WHERE ClientCode = ?", (client_code,))
-        
-        # Then delete client
-        result = self.db.execute_non_query("DELETE FROM ClientMaster WHERE ClientCode = ?", (client_code,))
+        # Delete the client together with its return data
+        result = self.db.execute_transaction([
+            ("DELETE FROM ClientMaster WHERE ClientCode = ?", (client_code,)),
+            ("DELETE FROM GSTReturnData WHERE ClientCode = ?", (client_code,)),
+            self.vault.delete_statement(client_code),
+            self.changes.change_statement(ENTITY_CLIENT, 'delete', client_code=client_code)
+        ]) is not None
         self.db.disconnect()
+        if result:
+            self.vault.invalidate(client_code)
+            get_archive().delete_client(client_code)
         return result
 
+# Marks "stored row not read yet" (None already means "no stored row")
+_UNREAD = object()
+
 class GSTReturn:
     def __init__(self):
         self.db = DatabaseConnection()
+        self.changes = ChangeFeed()
+        self.history = StatusHistory()
     
-    def get_applicable_clients(self, return_type, period):
+    def get_applicable_clients(self, return_type, period, fields=CLIENT_ALL):
         """Get clients applicable for specific return type and period"""
-        self.db.connect()
-        
         # Get return configuration
         return_config = Config.GST_RETURNS.get(return_type)
         if not return_config:
             return []
         
-        applicable_taxpayer = return_config['applicable_taxpayer']
-        
-        # Build query based on taxpayer type
-        if applicable_taxpayer == 'Monthly':
-            taxpayer_condition = "TaxpayerType = 'Monthly'"
-        elif applicable_taxpayer == 'Quarterly':
-            taxpayer_condition = "TaxpayerType = 'Quarterly'"
-        elif applicable_taxpayer == 'Composition':
-            taxpayer_condition = "TaxpayerType = 'Composition'"
-        elif applicable_taxpayer == 'Monthly/Quarterly':
-            taxpayer_condition = "TaxpayerType IN ('Monthly', 'Quarterly')"
-        else:
-            taxpayer_condition = "1=1"
-        
-        query = f"""
-            SELECT ClientCode, ClientName, GSTIN, TaxpayerType, 
-                   DateOfRegistration, EffectiveDateOfCancellation
-            FROM ClientMaster
-            WHERE {taxpayer_condition}
-            ORDER BY ClientName
-        """
+        taxpayer_condition = get_taxpayer_condition(return_config['applicable_taxpayer'])
+        projection = client_projection(tuple(fields) + CLIENT_APPLICABILITY)
         
-        clients = self.db.fetch_all(query)
+        self.db.connect()
+        rows = self.db.fetch_all(projection.select(where=taxpayer_condition, order_by='ClientName'))
         self.db.disconnect()
+        clients = projection.rows(rows)
         
         # Filter clients based on registration and cancellation dates
         filtered_clients = []
@@ -172,8 +296,8 @@ class GSTReturn:
     
     def is_client_applicable(self, client, return_type, period):
         """Check if client is applicable for specific return and period"""
-        registration_date = client[4]  # DateOfRegistration
-        cancellation_date = client[5]  # EffectiveDateOfCancellation
+        registration_date = client.date_of_registration
+        cancellation_date = client.effective_date_of_cancellation
         
         # Calculate first and last return periods
         first_period = self.calculate_first_return_period(registration_date, return_type)
@@ -190,184 +314,338 @@ class GSTReturn:
     
     def calculate_first_return_period(self, registration_date, return_type):
         """Calculate first return period based on registration date and return type"""
-        if not registration_date:
-            return None
-        
-        reg_date = registration_date if isinstance(registration_date, date) else datetime.strptime(registration_date, '%Y-%m-%d').date()
-        
-        if return_type in ['GSTR-1', 'GSTR-3B']:
-            return reg_date.strftime('%b-%Y')
-        elif return_type in ['IFF', 'PMT-06']:
-            return reg_date.strftime('%b-%Y')
-        elif return_type == 'GSTR-3B (Q)':
-            # Get quarter end month
-            quarter_end = self.get_quarter_end_month(reg_date)
-            return quarter_end.strftime('%b-%Y')
-        elif return_type in ['GSTR-9', 'GSTR-9C']:
-            # Financial year starting from April
-            if reg_date.month >= 4:
-                return f"{reg_date.year}-{str(reg_date.year + 1)[-2:]}"
-            else:
-                return f"{reg_date.year - 1}-{str(reg_date.year)[-2:]}"
-        elif return_type == 'CMP-08':
-            quarter_end = self.get_quarter_end_month(reg_date)
-            return quarter_end.strftime('%b-%Y')
-        elif return_type == 'GSTR-4':
-            if reg_date.month >= 4:
-                return f"{reg_date.year}-{str(reg_date.year + 1)[-2:]}"
-            else:
-                return f"{reg_date.year - 1}-{str(reg_date.year)[-2:]}"
-        
-        return None
+        return get_calendar().first_return_period(registration_date, return_type)
     
     def calculate_last_return_period(self, cancellation_date, return_type):
         """Calculate last return period based on cancellation date and return type"""
-        if not cancellation_date:
-            return None
-        
-        cancel_date = cancellation_date if isinstance(cancellation_date, date) else datetime.strptime(cancellation_date, '%Y-%m-%d').date()
-        
-        if return_type in ['GSTR-1', 'GSTR-3B']:
-            return cancel_date.strftime('%b-%Y')
-        elif return_type == 'IFF':
-            # IFF for one month after cancellation
-                # next_month = cancel_date + relativedelta(months=1)
-                # return next_month.strftime('%b-%Y')
-            quarter_end = self.get_quarter_end_month(cancel_date)
-            return quarter_end.strftime('%b-%Y')
-        elif return_type == 'PMT-06':
-            return cancel_date.strftime('%b-%Y')
-        elif return_type == 'GSTR-3B (Q)':
-            quarter_end = self.get_quarter_end_month(cancel_date)
-            return quarter_end.strftime('%b-%Y')
-        elif return_type in ['GSTR-9', 'GSTR-9C']:
-            if cancel_date.month >= 4:
-                return f"{cancel_date.year}-{str(cancel_date.year + 1)[-2:]}"
-            else:
-                return f"{cancel_date.year - 1}-{str(cancel_date.year)[-2:]}"
-        elif return_type == 'CMP-08':
-            quarter_end = self.get_quarter_end_month(cancel_date)
-            return quarter_end.strftime('%b-%Y')
-        elif return_type == 'GSTR-4':
-            if cancel_date.month >= 4:
-                return f"{cancel_date.year}-{str(cancel_date.year + 1)[-2:]}"
-            else:
-                return f"{cancel_date.year - 1}-{str(cancel_date.year)[-2:]}"
-        
-        return None
+        return get_calendar().last_return_period(cancellation_date, return_type)
     
     def get_quarter_end_month(self, date_obj):
         """Get quarter end month for a given date"""
-        month = date_obj.month
-        if month <= 3:
-            return date_obj.replace(month=3)
-        elif month <= 6:
-            return date_obj.replace(month=6)
-        elif month <= 9:
-            return date_obj.replace(month=9)
-        else:
-            return date_obj.replace(month=12)
+        return date_obj.replace(month=quarter_end_month(date_obj.month))
     
     def compare_periods(self, period1, period2):
-        if not period1 or not period2:
-            return 0
-        try:
-            if '-' in period1 and len(period1.split('-')[1]) == 2:
-                year1 = int(period1.split('-')[0])
-                year2 = int(period2.split('-')[0])
-                return (year1 > year2) - (year1 < year2)
-            else:
-                date1 = datetime.strptime(period1, '%b-%Y')
-                date2 = datetime.strptime(period2, '%b-%Y')
-                return (date1 > date2) - (date1 < date2)
-        except Exception as ex:
-            print(f"[debug] compare_periods error: '{period1}' vs '{period2}': {ex}")
-            return -1  # Exclude if parsing fails
+        return get_calendar().compare(period1, period2)
     
-    def get_return_data(self, client_code, return_type, period):
-        """Get return data for specific client, return type and period"""
-        self.db.connect()
-        
-        query = """
-            SELECT ReturnID, ClientCode, ReturnType, Period, DateOfFiling, 
-                   Status, ARN, Remarks
-            FROM GSTReturnData
-            WHERE ClientCode = ? AND ReturnType = ? AND Period = ?
-        """
-        
-        result = self.db.fetch_one(query, (client_code, return_type, period))
-        self.db.disconnect()
-        return result
+    def _archived_records(self, projection, where, params, period):
+        """Records of an archived period, read from its archive file"""
+        archived = return_projection(RETURN_ALL).rows(get_archive().get_rows(where, params, period))
+        return [projection.record._make(getattr(record, field) for field in projection.fields)
+                for record in archived]
     
-    def save_return_data(self, return_data):
-        """Save or update return data"""
-        self.db.connect()
+    def get_return_data(self, client_code, return_type, period, fields=RETURN_ALL):
+        """Get return data for specific client, return type and period as a record, or None"""
+        projection = return_projection(fields)
+        if get_archive().is_archived(period):
+            records = self._archived_records(projection, 'ClientCode = ? AND ReturnType = ? AND Period = ?',
+                                             (client_code, return_type, period), period)
+            return records[0] if records else None
         
-        # Check if record exists
-        existing = self.get_return_data(
-            return_data['client_code'],
-            return_data['return_type'],
-            return_data['period']
+        self.db.connect()
+        row = self.db.fetch_one(
+            projection.select(where='ClientCode = ? AND ReturnType = ? AND Period = ?'),
+            (client_code, return_type, period)
         )
+        self.db.disconnect()
+        return projection.row(row)
+    
+    def get_period_return_data(self, return_type, period, fields=RETURN_ALL):
+        """All stored return rows of a return type and period, keyed by ClientCode (one read)"""
+        projection = return_projection(('client_code',) + tuple(fields))
+        if get_archive().is_archived(period):
+            records = self._archived_records(projection, 'ReturnType = ? AND Period = ?',
+                                             (return_type, period), period)
+            return {record.client_code: record for record in records}
         
+        self.db.connect()
+        rows = self.db.fetch_all(projection.select(where='ReturnType = ? AND Period = ?'),
+                                 (return_type, period))
+        self.db.disconnect()
+        return {record.client_code: record for record in projection.rows(rows)}
+    
+    def _write_statements(self, return_data, existing, current_version):
+        """Statements saving one return row: the guarded upsert, its change and any status transition"""
+        key = (return_data['client_code'], return_data['return_type'], return_data['period'])
         if existing:
-            # Update existing record
+            # Update existing record, guarded by the version just read
             query = """
                 UPDATE GSTReturnData SET
-                    [DateOfFiling] = ?, [Status] = ?, [ARN] = ?, [Remarks] = ?
+                    [DateOfFiling] = ?, [Status] = ?, [ARN] = ?, [Remarks] = ?,
+                    [RowVersion] = ?
                 WHERE [ClientCode] = ? AND [ReturnType] = ? AND [Period] = ?
+                  AND ([RowVersion] = ? OR [RowVersion] IS NULL)
             """
             params = (
                 return_data.get('date_of_filing'),
                 return_data['status'],
                 return_data.get('arn'),
                 return_data.get('remarks'),
-                return_data['client_code'],
-                return_data['return_type'],
-                return_data['period']
+                current_version + 1,
+                *key,
+                current_version
             )
         else:
-            # Insert new record
+            # Insert new record; the unique key index rejects a concurrent insert
             query = """
                 INSERT INTO GSTReturnData (
-                    ClientCode, ReturnType, Period, DateOfFiling, Status, ARN, Remarks
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ClientCode, ReturnType, Period, DateOfFiling, Status, ARN, Remarks, RowVersion
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """
             params = (
-                return_data['client_code'],
-                return_data['return_type'],
-                return_data['period'],
+                *key,
                 return_data.get('date_of_filing'),
                 return_data['status'],
                 return_data.get('arn'),
-                return_data.get('remarks')
+                return_data.get('remarks'),
+                current_version + 1
             )
         
-        result = self.db.execute_non_query(query, params)
-        self.db.disconnect()
-        return result
+        change = self.changes.change_statement(
+            ENTITY_RETURN, 'update' if existing else 'insert',
+            client_code=return_data['client_code'],
+            return_type=return_data['return_type'],
+            period=return_data['period'],
+            payload={
+                'date_of_filing': return_data.get('date_of_filing'),
+                'status': return_data['status'],
+                'arn': return_data.get('arn'),
+                'remarks': return_data.get('remarks'),
+                'row_version': current_version + 1
+            }
+        )
+        transition = self.history.transition_statement(
+            *key, existing.status if existing else None, return_data['status'])
+        return [(query, params), change] + ([transition] if transition else [])
     
-    def get_return_dashboard_data(self, return_type, period):
-        """Get dashboard data for specific return type and period"""
-        applicable_clients = self.get_applicable_clients(return_type, period)
-        total_clients = len(applicable_clients)
+    def save_return_data(self, return_data, existing=_UNREAD):
+        """Save or update return data
+        
+        Returns the new row version, or False on failure. When return_data
+        carries the 'row_version' the caller read (0 for a row not yet
+        stored), the write only applies if the row is still at that version;
+        otherwise RowVersionConflict is raised with the current row.
+        Callers that already read the stored row pass it as `existing`.
+        """
+        expected_version = return_data.get('row_version')
+        if expected_version is not None:
+            expected_version = int(expected_version)
+        key = (return_data['client_code'], return_data['return_type'], return_data['period'])
+        get_archive().check_writable(return_data['period'])
         
-        # Get filed returns count
+        # Check if record exists
+        if existing is _UNREAD:
+            existing = self.get_return_data(*key)
+        current_version = (existing.row_version or 0) if existing else 0
+        if expected_version is not None and expected_version != current_version:
+            raise RowVersionConflict(existing)
+        
+        statements = self._write_statements(return_data, existing, current_version)
         self.db.connect()
-        query = """
-            SELECT COUNT(*) as FiledCount
-            FROM GSTReturnData
-            WHERE ReturnType = ? AND Period = ? AND (ARN IS NOT NULL OR DateOfFiling IS NOT NULL)
+        result = self.db.execute_transaction(statements) is not None
+        self.db.disconnect()
+        
+        if not result:
+            # Lost the race to another writer between our read and write
+            current = self.get_return_data(*key)
+            if expected_version is not None and current is not None and (current.row_version or 0) != current_version:
+                raise RowVersionConflict(current)
+            return False
+        return current_version + 1
+    
+    def save_return_rows(self, return_type, period, rows, stored):
+        """Save many rows of one return type and period in a single transaction
+        
+        `stored` is get_period_return_data() for the period. Each row gets its
+        own guarded upsert, so a row another user changed meanwhile is skipped
+        without undoing the rest; the change log and status history rows of
+        everything saved are then appended in batches before the one commit.
+        Returns {client_code: new row version, RowVersionConflict, or False}.
         """
-        result = self.db.fetch_one(query, (return_type, period))
-        filed_count = result[0] if result else 0
+        get_archive().check_writable(period)
+        results = {}
+        expected = {}
+        appended = {}
         
-        self.db.disconnect()
+        self.db.connect()
+        try:
+            cursor = self.db.connection.cursor()
+            for return_data in rows:
+                client_code = return_data['client_code']
+                existing = stored.get(client_code)
+                current_version = (existing.row_version or 0) if existing else 0
+                expected_version = return_data.get('row_version')
+                if expected_version is not None:
+                    expected[client_code] = int(expected_version)
+                    if int(expected_version) != current_version:
+                        results[client_code] = RowVersionConflict(existing)
+                        continue
+                
+                upsert, *logged = self._write_statements(
+                    dict(return_data, return_type=return_type, period=period), existing, current_version)
+                try:
+                    cursor.execute(*upsert)
+                    applied = cursor.rowcount != 0
+                except pyodbc.IntegrityError:
+                    applied = False
+                if not applied:
+                    # Lost the race to another writer; resolved after the commit
+                    results[client_code] = None
+                    continue
+                
+                results[client_code] = current_version + 1
+                for query, params in logged:
+                    appended.setdefault(query, []).append(params)
+            
+            cursor.fast_executemany = True
+            for query, params in appended.items():
+                cursor.executemany(query, params)
+            self.db.connection.commit()
+            cursor.close()
+        except pyodbc.Error as e:
+            print(f"Transaction error: {e}")
+            try:
+                self.db.connection.rollback()
+            except:
+                pass
+            return {return_data['client_code']: False for return_data in rows}
+        finally:
+            self.db.disconnect()
+        
+        lost = [client_code for client_code, result in results.items() if result is None]
+        if lost:
+            current = self.get_period_return_data(return_type, period)
+            for client_code in lost:
+                row = current.get(client_code)
+                stored_version = (stored[client_code].row_version or 0) if client_code in stored else 0
+                if client_code in expected and row is not None and (row.row_version or 0) != stored_version:
+                    results[client_code] = RowVersionConflict(row)
+                else:
+                    results[client_code] = False
+        return results
+    
+    def transition_status(self, return_type, period, from_status, to_status, remarks=None, client_codes=None):
+        """Move every applicable client at `from_status` to `to_status` in one set-based transaction
+        
+        Stored rows are moved with one UPDATE per RowVersion they are at; when
+        moving from the first status, applicable clients with no stored row yet
+        (implicitly at that status) are added with one INSERT ... SELECT.
+        Status history and change log rows are written the same way, so each
+        change payload carries the row_version its row now has. `remarks`, when given,
+        replaces the remarks of every moved row; `client_codes` narrows the
+        selection. Returns {'updated': n, 'inserted': n}.
+        """
+        return_config = Config.GST_RETURNS.get(return_type)
+        if not return_config:
+            raise ValueError(f'Unknown return type: {return_type}')
+        if from_status not in STATUS_CODES or to_status not in STATUS_CODES:
+            raise ValueError('Statuses must be one of: ' + ', '.join(Config.RETURN_STATUS))
+        if STATUS_CODES[to_status] <= STATUS_CODES[from_status]:
+            raise ValueError(f'Cannot move returns back from {from_status} to {to_status}')
+        if to_status == Config.RETURN_STATUS[-1]:
+            raise ValueError(f'{to_status} needs an ARN and date of filing for each return; save those rows individually')
+        get_archive().check_writable(period)
+        window = get_calendar().applicability_window(return_type, period)
+        if window is None:
+            raise ValueError(f'Unknown period: {period}')
+        
+        # Applicable clients, as in OverdueTracker._load
+        applicable = f"""
+            SELECT ClientCode FROM ClientMaster
+            WHERE {get_taxpayer_condition(return_config['applicable_taxpayer'])}
+              AND DateOfRegistration <= ?
+              AND (EffectiveDateOfCancellation IS NULL OR EffectiveDateOfCancellation >= ?)
+        """
+        selection, selection_params = '', []
+        if client_codes:
+            selection = f" AND ClientCode IN ({', '.join('?' * len(client_codes))})"
+            selection_params = [int(code) for code in client_codes]
+        
+        stored_where = f"""
+            ReturnType = ? AND Period = ? AND Status = ?
+              AND ClientCode IN ({applicable}){selection}
+        """
+        stored_params = [return_type, period, from_status, *window, *selection_params]
+        missing_where = f"""
+            ClientCode IN ({applicable}){selection}
+              AND ClientCode NOT IN (SELECT ClientCode FROM GSTReturnData WHERE ReturnType = ? AND Period = ?)
+        """
+        missing_params = [*window, *selection_params, return_type, period]
+        
+        now = datetime.now()
+        ordinal = get_calendar().ordinal(period)
+        
+        def change_payload(row_version):
+            # Same ChangedAt and Payload values change_statement would write for each row
+            payload = {'status': to_status, 'row_version': row_version}
+            if remarks:
+                payload['remarks'] = remarks
+            changed_at, _, _, _, _, _, payload_json = self.changes.change_statement(
+                ENTITY_RETURN, 'update', payload=payload)[1]
+            return changed_at, payload_json
+        
+        def move_stored(row_version):
+            # Rows at one RowVersion share their new version, so their change rows share one payload
+            where = stored_where + " AND RowVersion = ?"
+            params = stored_params + [row_version]
+            changed_at, payload_json = change_payload(row_version + 1)
+            # History and change rows are selected before the rows they describe move
+            return [
+                (f"""
+                    INSERT INTO ReturnStatusHistory (ClientCode, ReturnType, PeriodOrdinal, FromStatus, ToStatus, ChangedAt)
+                    SELECT ClientCode, ReturnType, ?, ?, ?, ? FROM GSTReturnData WHERE {where}
+                """, [ordinal, STATUS_CODES[from_status], STATUS_CODES[to_status], now] + params),
+                (f"""
+                    INSERT INTO ChangeLog (ChangedAt, Entity, Action, ClientCode, ReturnType, Period, Payload)
+                    SELECT ?, ?, ?, ClientCode, ReturnType, Period, ? FROM GSTReturnData WHERE {where}
+                """, [changed_at, ENTITY_RETURN, 'update', payload_json] + params),
+                (f"""
+                    UPDATE GSTReturnData SET [Status] = ?, {'[Remarks] = ?, ' if remarks else ''}[RowVersion] = [RowVersion] + 1
+                    WHERE {where}
+                """, [to_status] + ([remarks] if remarks else []) + params)
+            ]
+        
+        inserts = []
+        if from_status == Config.RETURN_STATUS[0]:
+            changed_at, payload_json = change_payload(1)
+            inserts = [
+                (f"""
+                    INSERT INTO ReturnStatusHistory (ClientCode, ReturnType, PeriodOrdinal, FromStatus, ToStatus, ChangedAt)
+                    SELECT ClientCode, ?, ?, NULL, ?, ? FROM ClientMaster WHERE {missing_where}
+                """, [return_type, ordinal, STATUS_CODES[to_status], now] + missing_params),
+                (f"""
+                    INSERT INTO ChangeLog (ChangedAt, Entity, Action, ClientCode, ReturnType, Period, Payload)
+                    SELECT ?, ?, ?, ClientCode, ?, ?, ? FROM ClientMaster WHERE {missing_where}
+                """, [changed_at, ENTITY_RETURN, 'insert', return_type, period, payload_json] + missing_params),
+                (f"""
+                    INSERT INTO GSTReturnData (ClientCode, ReturnType, Period, Status, Remarks, RowVersion)
+                    SELECT ClientCode, ?, ?, ?, {'?' if remarks else 'NULL'}, 1 FROM ClientMaster WHERE {missing_where}
+                """, [return_type, period, to_status] + ([remarks] if remarks else []) + missing_params)
+            ]
         
-        pending_count = total_clients - filed_count
+        self.db.connect()
+        try:
+            cursor = self.db.connection.cursor()
+            # The versions being moved are read in the same transaction as the moves
+            cursor.execute(f"SELECT DISTINCT RowVersion FROM GSTReturnData WHERE {stored_where}", stored_params)
+            versions = [row[0] for row in cursor.fetchall()]
+            updated = inserted = 0
+            for row_version in versions:
+                for query, params in move_stored(row_version):
+                    cursor.execute(query, params)
+                updated += cursor.rowcount
+            for query, params in inserts:
+                cursor.execute(query, params)
+                inserted = cursor.rowcount
+            self.db.connection.commit()
+            cursor.close()
+        except pyodbc.Error as e:
+            print(f"Transaction error: {e}")
+            try:
+                self.db.connection.rollback()
+            except:
+                pass
+            return None
+        finally:
+            self.db.disconnect()
         
-        return {
-            'total_clients': total_clients,
-            'filed_returns': filed_count,
-            'pending_returns': pending_count
-        }
+        return {'updated': updated, 'inserted': inserted}
@@ -0,0 +1,241 @@
+import threading
+from datetime import date, datetime, timedelta
+from database import DatabaseConnection
+from config import Config
+from changefeed import ChangeCursor, ENTITY_RETURN
+from models import get_taxpayer_condition
+from periods import get_calendar, financial_year_label, financial_year_start
+from archive import get_archive
+
+
+def current_financial_year(today=None):
+    return financial_year_label(financial_year_start(today or date.today()))
+
+
+def late_fee(return_type, days_late):
+    """Late fee for filing a return days_late days after its due date"""
+    return_config = Config.GST_RETURNS.get(return_type, {})
+    if days_late <= 0:
+        return 0
+    fee = days_late * return_config.get('late_fee_per_day', 0)
+    cap = return_config.get('late_fee_cap')
+    return min(fee, cap) if cap is not None else fee
+
+
+class OverdueTracker:
+    """Due-date status for every (return type, period) obligation in the book
+
+    Counts are cached per obligation and kept current from the change feed:
+    a saved return invalidates only its own (return type, period), while a
+    client master change invalidates everything. The tracker is shared by
+    request threads; every invalidation bumps a generation, and counts whose
+    key was invalidated while they were loading are not cached.
+    """
+
+    def __init__(self, feed=None):
+        self.db = DatabaseConnection()
+        self._cache = {}
+        self._generation = 0    # bumped by invalidate-all
+        self._generations = {}  # (return type, period) -> bumped by its own invalidation
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._cursor = ChangeCursor(feed) if feed else None
+
+    def invalidate(self, return_type=None, period=None):
+        with self._lock:
+            if return_type is None and period is None:
+                self._cache.clear()
+                self._generation += 1
+            else:
+                key = (return_type, period)
+                self._cache.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+    def _stamp(self, key):
+        return self._generation, self._generations.get(key, 0)
+
+    def sync(self):
+        """Apply changes written since the last sync"""
+        if not self._cursor:
+            return
+        with self._sync_lock:
+            for change in self._cursor.poll():
+                if change['entity'] == ENTITY_RETURN:
+                    self.invalidate(change['return_type'], change['period'])
+                else:
+                    self.invalidate()
+
+    def _lookup(self, obligations):
+        """Counts of (return_type, period, due_date) obligations: cached ones plus one load of the rest"""
+        self.sync()
+        with self._lock:
+            found = {(o[0], o[1]): self._cache[(o[0], o[1])] for o in obligations if (o[0], o[1]) in self._cache}
+        missing = [o for o in obligations if (o[0], o[1]) not in found]
+        if missing:
+            found.update(self._load(missing))
+        return found
+
+    def get_counts(self, return_type, period):
+        """Applicable/filed/pending counts for one return type and period"""
+        key = (return_type, period)
+        due = get_calendar().due_date(return_type, period)
+        counts = self._lookup([(return_type, period, due)]).get(key, {'applicable': 0, 'filed': 0})
+        return {
+            'total_clients': counts['applicable'],
+            'filed_returns': counts['filed'],
+            'pending_returns': max(counts['applicable'] - counts['filed'], 0)
+        }
+
+    def get_obligation_counts(self, obligations):
+        """Applicable/filed counts for many (return_type, period, due_date) obligations, loading misses in one pass"""
+        found = self._lookup(obligations)
+        return {(return_type, period): found.get((return_type, period), {'applicable': 0, 'filed': 0})
+                for return_type, period, _ in obligations}
+
+    def get_obligations(self, financial_year, return_types=None):
+        """(return_type, period, due_date) for every obligation in a financial year"""
+        calendar = get_calendar()
+        obligations = []
+        for return_type, return_config in Config.GST_RETURNS.items():
+            if return_types and return_type not in return_types:
+                continue
+            for period in calendar.periods_in_financial_year(return_config['frequency'], financial_year):
+                due = calendar.due_date(return_type, period)
+                if due:
+                    obligations.append((return_type, period, due))
+        return obligations
+
+    def get_overdue(self, financial_year, as_of=None, within_days=None, return_types=None):
+        """Overdue, due-soon and late-filed counts with late-fee projection"""
+        as_of = as_of or date.today()
+        within_days = Config.DUE_SOON_DAYS if within_days is None else within_days
+        horizon = as_of + timedelta(days=within_days)
+
+        obligations = [o for o in self.get_obligations(financial_year, return_types) if o[2] <= horizon]
+        found = self._lookup(obligations)
+
+        results = []
+        summary = {
+            'overdue': 0, 'due_soon': 0, 'filed_late': 0,
+            'late_fee_accrued': 0, 'late_fee_projected': 0
+        }
+        for return_type, period, due in obligations:
+            counts = found.get((return_type, period))
+            if counts is None:
+                continue
+            result = self._evaluate(return_type, period, due, counts, as_of, within_days)
+            results.append(result)
+            if result['state'] == 'overdue':
+                summary['overdue'] += result['pending']
+            elif result['state'] == 'due_soon':
+                summary['due_soon'] += result['pending']
+            summary['filed_late'] += result['filed_late']
+            summary['late_fee_accrued'] += result['late_fee_accrued']
+            summary['late_fee_projected'] += result['late_fee_projected']
+
+        return {
+            'financial_year': financial_year,
+            'as_of': as_of.strftime('%Y-%m-%d'),
+            'within_days': within_days,
+            'summary': summary,
+            'obligations': results
+        }
+
+    def _load(self, obligations):
+        """Fetch applicable and filed counts for obligations missing from the cache; returns them"""
+        calendar = get_calendar()
+        counts = {}
+        with self._lock:
+            stamps = {(o[0], o[1]): self._stamp((o[0], o[1])) for o in obligations}
+
+        self.db.connect()
+        try:
+            for return_type, period, due in obligations:
+                window = calendar.applicability_window(return_type, period)
+                if window is None:
+                    continue
+                registered_by, cancelled_from = window
+                taxpayer_condition = get_taxpayer_condition(
+                    Config.GST_RETURNS[return_type]['applicable_taxpayer'])
+                query = f"""
+                    SELECT COUNT(*)
+                    FROM ClientMaster
+                    WHERE {taxpayer_condition}
+                      AND DateOfRegistration <= ?
+                      AND (EffectiveDateOfCancellation IS NULL OR EffectiveDateOfCancellation >= ?)
+                """
+                result = self.db.fetch_one(query, (registered_by, cancelled_from))
+                counts[(return_type, period)] = {
+                    'due_date': due,
+                    'applicable': result[0] if result else 0,
+                    'filed': 0,
+                    'filed_late': 0,
+                    'late_fee_accrued': 0
+                }
+
+            # One grouped pass over the whole selection; the DB collapses
+            # filings to (type, period, date) so Python sees dates, not rows.
+            return_types = sorted({key[0] for key in counts})
+            periods = sorted({key[1] for key in counts})
+            if return_types and periods:
+                query = f"""
+                    SELECT ReturnType, Period, DateOfFiling, COUNT(*)
+                    FROM GSTReturnData
+                    WHERE ReturnType IN ({', '.join('?' * len(return_types))})
+                      AND Period IN ({', '.join('?' * len(periods))})
+                      AND (ARN IS NOT NULL OR DateOfFiling IS NOT NULL)
+                    GROUP BY ReturnType, Period, DateOfFiling
+                """
+                grouped = self.db.fetch_all(query, return_types + periods)
+                grouped += get_archive().filing_counts(return_types, periods)
+                for return_type, period, filed_on, filed in grouped:
+                    entry = counts.get((return_type, period))
+                    if entry is None:
+                        continue
+                    entry['filed'] += filed
+                    if filed_on is None or entry['due_date'] is None:
+                        continue
+                    if isinstance(filed_on, datetime):
+                        filed_on = filed_on.date()
+                    days_late = (filed_on - entry['due_date']).days
+                    if days_late > 0:
+                        entry['filed_late'] += filed
+                        entry['late_fee_accrued'] += filed * late_fee(return_type, days_late)
+        finally:
+            self.db.disconnect()
+
+        with self._lock:
+            # Counts of a key invalidated meanwhile may predate the write that invalidated it
+            self._cache.update((key, entry) for key, entry in counts.items() if self._stamp(key) == stamps[key])
+        return counts
+
+    def _evaluate(self, return_type, period, due, counts, as_of, within_days):
+        pending = max(counts['applicable'] - counts['filed'], 0)
+        days_to_due = (due - as_of).days
+        days_overdue = 0
+        projected = 0
+
+        if pending and days_to_due < 0:
+            state = 'overdue'
+            days_overdue = -days_to_due
+            projected = pending * late_fee(return_type, days_overdue)
+        elif pending and days_to_due <= within_days:
+            state = 'due_soon'
+        elif pending:
+            state = 'upcoming'
+        else:
+            state = 'complete'
+
+        return {
+            'return_type': return_type,
+            'period': period,
+            'due_date': due.strftime('%Y-%m-%d'),
+            'state': state,
+            'applicable': counts['applicable'],
+            'filed': counts['filed'],
+            'pending': pending,
+            'filed_late': counts['filed_late'],
+            'days_overdue': days_overdue,
+            'late_fee_accrued': counts['late_fee_accrued'],
+            'late_fee_projected': projected
+        }
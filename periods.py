@@ -0,0 +1,278 @@
+import calendar as _calendar
+from datetime import datetime, date
+from functools import lru_cache
+from types import MappingProxyType
+from config import Config
+
+# Period labels used throughout the app:
+#   monthly   - "Apr-2024"
+#   quarterly - last month of the quarter, e.g. "Jun-2024" for Apr-Jun
+#   annual    - financial year, e.g. "2024-25"
+
+MONTH_SHORT_MAP = MappingProxyType({
+    "January": "Jan", "February": "Feb", "March": "Mar",
+    "April": "Apr", "May": "May", "June": "Jun",
+    "July": "Jul", "August": "Aug", "September": "Sep",
+    "October": "Oct", "November": "Nov", "December": "Dec",
+    # Also include 3-letter codes for idempotency
+    "Jan": "Jan", "Feb": "Feb", "Mar": "Mar", "Apr": "Apr", "May": "May",
+    "Jun": "Jun", "Jul": "Jul", "Aug": "Aug", "Sep": "Sep", "Oct": "Oct", "Nov": "Nov", "Dec": "Dec"
+})
+
+MONTH_NUMBERS = MappingProxyType({name: number for number, name in enumerate(Config.MONTHS, 1)})
+
+# Financial year order: Apr..Mar
+FY_MONTHS = (4, 5, 6, 7, 8, 9, 10, 11, 12, 1, 2, 3)
+
+
+def month_ordinal(year, month):
+    """Integer ordinal for a calendar month (consecutive months differ by 1)"""
+    return year * 12 + (month - 1)
+
+
+def month_label(year, month):
+    return f"{Config.MONTHS[month - 1]}-{year}"
+
+
+def period_from_ordinal(ordinal):
+    """Inverse of PeriodCalendar.ordinal (annual periods are ordinals of their start year)"""
+    if ordinal < 10000:
+        return financial_year_label(ordinal)
+    return month_label(ordinal // 12, ordinal % 12 + 1)
+
+
+def financial_year_label(start_year):
+    return f"{start_year}-{str(start_year + 1)[-2:]}"
+
+
+def financial_year_start(date_obj):
+    """Start year of the financial year (Apr-Mar) containing date_obj"""
+    return date_obj.year if date_obj.month >= 4 else date_obj.year - 1
+
+
+def quarter_end_month(month):
+    return ((month - 1) // 3 + 1) * 3
+
+
+def is_annual_period(period):
+    return '-' in period and len(period.split('-')[1]) == 2
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+@lru_cache(maxsize=4096)
+def _parse_ordinal(period):
+    """Parse a period label that is outside the precomputed calendar"""
+    if is_annual_period(period):
+        return int(period.split('-')[0])
+    parsed = datetime.strptime(period, '%b-%Y')
+    return month_ordinal(parsed.year, parsed.month)
+
+
+def _clamped_date(year, month, day):
+    return date(year, month, min(day, _calendar.monthrange(year, month)[1]))
+
+
+def _compute_due_date(return_config, period):
+    """Due date for a period from the GST_RETURNS 'due_date' setting"""
+    due = return_config.get('due_date')
+    if due is None:
+        return None
+
+    if return_config['frequency'] == 'Annually':
+        # 'DD-MM' falling after the end of the financial year
+        day, month = (int(part) for part in str(due).split('-'))
+        fy_start = int(period.split('-')[0])
+        year = fy_start + 1 if month >= 4 else fy_start + 2
+        return _clamped_date(year, month, day)
+
+    # Monthly and quarterly returns fall due in the month after the period
+    ordinal = _parse_ordinal(period) + 1
+    return _clamped_date(ordinal // 12, ordinal % 12 + 1, int(due))
+
+
+class PeriodCalendar:
+    """Immutable lookup tables for every period in a range of financial years"""
+
+    def __init__(self, financial_years, gst_returns):
+        months = {}
+        fy_starts = {}
+        fy_of_period = {}
+        month_in_fy = {}
+
+        for fy in financial_years:
+            start = int(fy.split('-')[0])
+            fy_starts[fy] = start
+            fy_of_period[fy] = fy
+            for month in FY_MONTHS:
+                year = start if month >= 4 else start + 1
+                label = month_label(year, month)
+                months[label] = month_ordinal(year, month)
+                fy_of_period[label] = fy
+                month_in_fy[(fy, Config.MONTHS[month - 1])] = label
+
+        due_dates = {}
+        for return_type, return_config in gst_returns.items():
+            frequency = return_config['frequency']
+            if frequency == 'Annually':
+                periods = fy_starts
+            elif frequency == 'Quarterly':
+                periods = [p for p, o in months.items() if (o % 12 + 1) % 3 == 0]
+            else:
+                periods = months
+            for period in periods:
+                due_dates[(return_type, period)] = _compute_due_date(return_config, period)
+
+        self.financial_years = tuple(financial_years)
+        self._gst_returns = gst_returns
+        self._months = MappingProxyType(months)
+        self._fy_starts = MappingProxyType(fy_starts)
+        self._fy_of_period = MappingProxyType(fy_of_period)
+        self._month_in_fy = MappingProxyType(month_in_fy)
+        self._due_dates = MappingProxyType(due_dates)
+
+    def ordinal(self, period):
+        """Ordinal for a month/quarter label or financial-year label, None if unparseable"""
+        if not period:
+            return None
+        ordinal = self._months.get(period)
+        if ordinal is None:
+            ordinal = self._fy_starts.get(period)
+        if ordinal is None:
+            try:
+                ordinal = _parse_ordinal(period)
+            except (ValueError, IndexError):
+                return None
+        return ordinal
+
+    def compare(self, period1, period2):
+        """-1, 0 or 1 as period1 comes before, with or after period2; 0 when either is empty"""
+        if not period1 or not period2:
+            return 0
+        ordinal1 = self.ordinal(period1)
+        ordinal2 = self.ordinal(period2)
+        for period, ordinal in ((period1, ordinal1), (period2, ordinal2)):
+            if ordinal is None:
+                raise ValueError(f'Unknown period: {period}')
+        return (ordinal1 > ordinal2) - (ordinal1 < ordinal2)
+
+    def financial_year_of(self, period):
+        fy = self._fy_of_period.get(period)
+        if fy is None:
+            ordinal = self.ordinal(period)
+            if ordinal is None:
+                return None
+            if is_annual_period(period):
+                return financial_year_label(ordinal)
+            fy = financial_year_label(financial_year_start(date(ordinal // 12, ordinal % 12 + 1, 1)))
+        return fy
+
+    def month_period(self, month, financial_year):
+        """'Apr' + '2024-25' -> 'Apr-2024'; 'Jan' + '2024-25' -> 'Jan-2025'"""
+        month_short = MONTH_SHORT_MAP.get(month, month)
+        label = self._month_in_fy.get((financial_year, month_short))
+        if label is None:
+            start = int(financial_year.split('-')[0])
+            year = start + 1 if month_short in ('Jan', 'Feb', 'Mar') else start
+            label = f"{month_short}-{year}"
+        return label
+
+    def quarter_period(self, quarter, financial_year):
+        """'Apr-Jun' + '2024-25' -> 'Jun-2024'"""
+        return self.month_period(quarter[-3:], financial_year)
+
+    def period_for(self, frequency, financial_year, month=None, quarter=None):
+        """Period label for a dashboard selection, None for an unknown frequency"""
+        if frequency == 'Monthly':
+            return self.month_period(month, financial_year)
+        if frequency == 'Quarterly':
+            return self.quarter_period(quarter, financial_year)
+        if frequency == 'Annually':
+            return financial_year
+        return None
+
+    def periods_in_financial_year(self, frequency, financial_year):
+        """All period labels of the given frequency within a financial year"""
+        if frequency == 'Annually':
+            return [financial_year]
+        labels = [self.month_period(Config.MONTHS[m - 1], financial_year) for m in FY_MONTHS]
+        if frequency == 'Quarterly':
+            return labels[2::3]
+        return labels
+
+    def due_date(self, return_type, period):
+        due = self._due_dates.get((return_type, period))
+        if due is None:
+            return_config = self._gst_returns.get(return_type)
+            if not return_config or self.ordinal(period) is None:
+                return None
+            due = _compute_due_date(return_config, period)
+        return due
+
+    def period_bounds(self, period):
+        """First and last calendar day covered by a period label"""
+        ordinal = self.ordinal(period)
+        if ordinal is None:
+            return None
+        if is_annual_period(period):
+            return date(ordinal, 4, 1), date(ordinal + 1, 3, 31)
+        year, month = ordinal // 12, ordinal % 12 + 1
+        return date(year, month, 1), _clamped_date(year, month, 31)
+
+    def applicability_window(self, return_type, period):
+        """(registered_on_or_before, cancelled_on_or_after) dates for a period
+
+        A client owes the return for `period` when DateOfRegistration is on or
+        before the first date and EffectiveDateOfCancellation is empty or on or
+        after the second. This is the date-range form of is_client_applicable
+        and lets the filter run against indexed date columns.
+        """
+        bounds = self.period_bounds(period)
+        if bounds is None:
+            return None
+        first_day, last_day = bounds
+        if return_type in ('IFF', 'GSTR-3B (Q)', 'CMP-08') and not is_annual_period(period):
+            # Cancellation keeps these alive until the end of its quarter
+            first_day = date(first_day.year, quarter_end_month(first_day.month) - 2, 1)
+        return last_day, first_day
+
+    def first_return_period(self, registration_date, return_type):
+        """First return period based on registration date and return type"""
+        if not registration_date:
+            return None
+        reg_date = _to_date(registration_date)
+        return _boundary_period(return_type, reg_date.year, reg_date.month, False)
+
+    def last_return_period(self, cancellation_date, return_type):
+        """Last return period based on cancellation date and return type"""
+        if not cancellation_date:
+            return None
+        cancel_date = _to_date(cancellation_date)
+        return _boundary_period(return_type, cancel_date.year, cancel_date.month, True)
+
+
+@lru_cache(maxsize=4096)
+def _boundary_period(return_type, year, month, is_last):
+    """First (registration) or last (cancellation) period containing year/month"""
+    if return_type in ('GSTR-1', 'GSTR-3B', 'PMT-06'):
+        return month_label(year, month)
+    if return_type == 'IFF':
+        # IFF runs until the end of the quarter of cancellation
+        return month_label(year, quarter_end_month(month) if is_last else month)
+    if return_type in ('GSTR-3B (Q)', 'CMP-08'):
+        return month_label(year, quarter_end_month(month))
+    if return_type in ('GSTR-9', 'GSTR-9C', 'GSTR-4'):
+        return financial_year_label(year if month >= 4 else year - 1)
+    return None
+
+
+@lru_cache(maxsize=None)
+def get_calendar():
+    """Shared calendar covering Config.get_financial_years()"""
+    return PeriodCalendar(Config.get_financial_years(), Config.GST_RETURNS)
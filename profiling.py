@@ -0,0 +1,105 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from config import Config
+
+PROFILE_SUFFIX = '.collapsed'
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval from a background thread
+
+    Stacks are counted in collapsed form (root first, frames joined by
+    ';'), which flamegraph.pl, speedscope and similar tools read directly.
+    The profiled thread runs untouched between samples.
+    """
+
+    def __init__(self, thread_id=None, interval=None):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval or Config.PROFILE_INTERVAL_SECONDS
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self.started = None
+        self.duration = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling; returns the collapsed-stack counts"""
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        return self.samples
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return  # profiled thread is gone
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+
+class ProfileStore:
+    """Collapsed-stack profiles on disk, newest `keep` kept"""
+
+    def __init__(self, folder=None, keep=None):
+        self.folder = folder or Config.PROFILE_FOLDER
+        self.keep = keep or Config.PROFILE_KEEP
+        self._lock = threading.Lock()
+        os.makedirs(self.folder, exist_ok=True)
+
+    def save(self, endpoint, method, sampler):
+        """Write one request's samples; returns the file name"""
+        label = re.sub(r'[^A-Za-z0-9]+', '-', endpoint or 'unknown').strip('-')
+        name = (f"{datetime.now():%Y%m%d-%H%M%S-%f}_{method}_{label}_"
+                f"{round(sampler.duration * 1000)}ms{PROFILE_SUFFIX}")
+        with open(os.path.join(self.folder, name), 'w') as profile_file:
+            for stack, count in sampler.samples.most_common():
+                profile_file.write(f"{stack} {count}\n")
+        self._prune()
+        return name
+
+    def list_profiles(self):
+        """Profile files with their request details, newest first"""
+        profiles = []
+        for name in sorted(self._names(), reverse=True):
+            stamp, method, endpoint, duration = name[:-len(PROFILE_SUFFIX)].split('_', 3)
+            profiles.append({
+                'file': name,
+                'recorded_at': datetime.strptime(stamp, '%Y%m%d-%H%M%S-%f').strftime('%Y-%m-%d %H:%M:%S'),
+                'method': method,
+                'endpoint': endpoint,
+                'duration_ms': int(duration[:-len('ms')]),
+                'size': os.path.getsize(os.path.join(self.folder, name))
+            })
+        return profiles
+
+    def path_for(self, name):
+        """Path of a stored profile, or None for names that are not one"""
+        if name != os.path.basename(name) or name not in self._names():
+            return None
+        return os.path.join(self.folder, name)
+
+    def _names(self):
+        return [name for name in os.listdir(self.folder) if name.endswith(PROFILE_SUFFIX)]
+
+    def _prune(self):
+        with self._lock:
+            for name in sorted(self._names())[:-self.keep]:
+                try:
+                    os.remove(os.path.join(self.folder, name))
+                except OSError:
+                    pass  # removed by a concurrent prune
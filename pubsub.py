@@ -0,0 +1,84 @@
+import queue
+import threading
+
+# Sentinel delivered to a subscriber whose queue overflowed; it must re-fetch
+RESYNC = object()
+
+
+class Subscription:
+    """One subscriber's bounded queue on a broker channel"""
+
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._overflowed = threading.Event()
+
+    def offer(self, message):
+        """Queue a message without blocking the publisher"""
+        if self._overflowed.is_set():
+            return False
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except queue.Full:
+            # Slow consumer: drop its backlog and tell it to resync instead
+            # of holding up the writer or growing without bound.
+            self._overflowed.set()
+            self._drain()
+            return False
+
+    def get(self, timeout=None):
+        """Next message, RESYNC after an overflow, or None on timeout"""
+        if self._overflowed.is_set():
+            self._overflowed.clear()
+            return RESYNC
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def _drain(self):
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+
+class Broker:
+    """In-process publish/subscribe keyed by channel"""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._channels = {}
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.queue_size)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def publish(self, channel, message):
+        """Deliver a message to every subscriber of a channel; returns delivered count"""
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        return sum(1 for subscription in subscribers if subscription.offer(message))
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._channels.get(channel, ()))
+            return sum(len(subscribers) for subscribers in self._channels.values())
@@ -0,0 +1,39 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """Token bucket per client: `burst` calls at once, refilled at `rate` calls per second"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._buckets = {}  # client -> (tokens, updated at)
+        self._counts = {'allowed': 0, 'limited': 0}
+
+    def check(self, client):
+        """None when the call may proceed, otherwise the seconds until it would"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                self._buckets[client] = (tokens - 1, now)
+                self._counts['allowed'] += 1
+                self._prune(now)
+                return None
+            self._buckets[client] = (tokens, now)
+            self._counts['limited'] += 1
+            return (1 - tokens) / self.rate
+
+    def _prune(self, now):
+        # Buckets that have refilled completely are indistinguishable from new ones
+        if len(self._buckets) > 1000:
+            full_after = self.burst / self.rate
+            self._buckets = {client: bucket for client, bucket in self._buckets.items()
+                             if now - bucket[1] < full_after}
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._counts, clients=len(self._buckets))
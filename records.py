@@ -0,0 +1,104 @@
+from collections import namedtuple
+from functools import lru_cache
+
+# Record field -> ClientMaster column, in table order
+CLIENT_COLUMNS = {
+    'client_code': 'ClientCode',
+    'client_name': 'ClientName',
+    'date_of_registration': 'DateOfRegistration',
+    'effective_date_of_cancellation': 'EffectiveDateOfCancellation',
+    'gstin': 'GSTIN',
+    'taxpayer_type': 'TaxpayerType',
+    'gst_portal_userid': 'GSTPortalUserID',
+    'eway_bill_userid': 'EWAYBillUserID',
+    'client_email_id': 'ClientEmailID',
+    'mobile_no': 'MobileNo',
+    'row_version': 'RowVersion'
+}
+
+# Record field -> GSTReturnData column, in table order
+RETURN_COLUMNS = {
+    'return_id': 'ReturnID',
+    'client_code': 'ClientCode',
+    'return_type': 'ReturnType',
+    'period': 'Period',
+    'date_of_filing': 'DateOfFiling',
+    'status': 'Status',
+    'arn': 'ARN',
+    'remarks': 'Remarks',
+    'row_version': 'RowVersion'
+}
+
+# Client projections used by the screens
+CLIENT_ALL = tuple(CLIENT_COLUMNS)
+CLIENT_LIST = ('client_code', 'client_name', 'gstin', 'taxpayer_type',
+               'date_of_registration', 'client_email_id', 'mobile_no')
+CLIENT_SUMMARY = ('client_code', 'client_name', 'gstin')
+# Fields is_client_applicable needs on top of whatever the caller renders
+CLIENT_APPLICABILITY = ('date_of_registration', 'effective_date_of_cancellation')
+
+RETURN_ALL = tuple(RETURN_COLUMNS)
+# Editable fields of the return details grid
+RETURN_GRID = ('date_of_filing', 'status', 'arn', 'remarks', 'row_version')
+
+
+class Projection:
+    """A fixed column list of one table and the namedtuple its rows map to"""
+
+    def __init__(self, table, columns, fields, record_name):
+        unknown = [field for field in fields if field not in columns]
+        if unknown:
+            raise ValueError(f"Unknown {table} fields: {', '.join(unknown)}")
+        self.table = table
+        self.fields = fields
+        self.column_names = tuple(columns[field] for field in fields)
+        self.columns = ', '.join(self.column_names)
+        self.record = namedtuple(record_name, fields)
+
+    def select(self, where=None, order_by=None):
+        query = f"SELECT {self.columns} FROM {self.table}"
+        if where:
+            query += f" WHERE {where}"
+        if order_by:
+            query += f" ORDER BY {order_by}"
+        return query
+
+    def row(self, row):
+        return self.record._make(row) if row else None
+
+    def rows(self, rows):
+        make = self.record._make
+        return [make(row) for row in rows]
+
+
+def _unique_fields(fields):
+    return tuple(dict.fromkeys(fields))
+
+
+@lru_cache(maxsize=None)
+def _client_projection(fields):
+    return Projection('ClientMaster', CLIENT_COLUMNS, fields, 'ClientRecord')
+
+
+@lru_cache(maxsize=None)
+def _return_projection(fields):
+    return Projection('GSTReturnData', RETURN_COLUMNS, fields, 'ReturnRecord')
+
+
+def client_projection(fields=CLIENT_ALL):
+    """Projection over ClientMaster; built once per distinct field list"""
+    return _client_projection(_unique_fields(fields))
+
+
+def return_projection(fields=RETURN_ALL):
+    """Projection over GSTReturnData; built once per distinct field list"""
+    return _return_projection(_unique_fields(fields))
+
+
+def format_record(record):
+    """JSON-ready dict of a record, with dates as YYYY-MM-DD"""
+    data = record._asdict()
+    for field, value in data.items():
+        if hasattr(value, 'strftime'):
+            data[field] = value.strftime('%Y-%m-%d')
+    return data
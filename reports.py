@@ -0,0 +1,177 @@
+import csv
+import io
+from datetime import date, datetime
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
+from database import DatabaseConnection
+from config import Config
+from models import GSTReturn, taxpayer_applies
+from periods import get_calendar
+from archive import get_archive
+from records import client_projection, CLIENT_SUMMARY, CLIENT_APPLICABILITY
+
+REPORT_HEADERS = [
+    'Client Code', 'Client Name', 'GSTIN', 'Taxpayer Type', 'Period', 'Due Date',
+    'Status', 'Date of Filing', 'ARN', 'Remarks', 'Overdue', 'Days Overdue'
+]
+
+_REPORT_CLIENT_FIELDS = CLIENT_SUMMARY + ('taxpayer_type',) + CLIENT_APPLICABILITY
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _format_date(value):
+    return value.strftime('%Y-%m-%d') if value else None
+
+
+class ReturnStatusReport:
+    """Return status of every applicable client for a period or a whole FY
+
+    All clients and their stored returns for the selection come from one
+    joined query that is read in batches; rows are produced per client as
+    the cursor advances, so memory stays flat regardless of book size.
+    """
+
+    def __init__(self):
+        self.db = DatabaseConnection()
+        self.returns = GSTReturn()
+
+    def plan(self, financial_year=None, period=None, return_types=None):
+        """{return_type: [periods]} covered by the selection"""
+        calendar = get_calendar()
+        if period:
+            financial_year = calendar.financial_year_of(period)
+        if not financial_year:
+            return {}
+
+        plan = {}
+        for return_type, return_config in Config.GST_RETURNS.items():
+            if return_types and return_type not in return_types:
+                continue
+            periods = calendar.periods_in_financial_year(return_config['frequency'], financial_year)
+            if period:
+                periods = [p for p in periods if p == period]
+            if periods:
+                plan[return_type] = periods
+        return plan
+
+    def rows(self, plan, as_of=None):
+        """Yield (return_type, values) in REPORT_HEADERS order for every obligation in the plan"""
+        if not plan:
+            return
+        as_of = as_of or date.today()
+        calendar = get_calendar()
+        projection = client_projection(_REPORT_CLIENT_FIELDS)
+        return_types = list(plan)
+        periods = sorted({p for rt_periods in plan.values() for p in rt_periods})
+        due_dates = {(rt, p): calendar.due_date(rt, p) for rt, rt_periods in plan.items() for p in rt_periods}
+
+        client_columns = ', '.join(f"c.{column}" for column in projection.column_names)
+        query = f"""
+            SELECT {client_columns},
+                   r.ReturnType, r.Period, r.DateOfFiling, r.Status, r.ARN, r.Remarks
+            FROM ClientMaster AS c
+            LEFT JOIN (
+                SELECT ClientCode, ReturnType, Period, DateOfFiling, Status, ARN, Remarks
+                FROM GSTReturnData
+                WHERE ReturnType IN ({', '.join('?' * len(return_types))})
+                  AND Period IN ({', '.join('?' * len(periods))})
+            ) AS r ON c.ClientCode = r.ClientCode
+            ORDER BY c.ClientName, c.ClientCode
+        """
+        width = len(projection.fields)
+        archived = self._archived_rows(return_types, periods)
+
+        self.db.connect()
+        try:
+            client, stored = None, {}
+            for row in self.db.iter_rows(query, return_types + periods, Config.EXPORT_BATCH_SIZE):
+                if client is None or row[0] != client.client_code:
+                    if client is not None:
+                        yield from self._client_rows(client, stored, plan, due_dates, as_of)
+                    client, stored = projection.row(row[:width]), archived.pop(row[0], {})
+                if row[width] is not None:
+                    stored[(row[width], row[width + 1])] = row[width + 2:]
+            if client is not None:
+                yield from self._client_rows(client, stored, plan, due_dates, as_of)
+        finally:
+            self.db.disconnect()
+
+    def _archived_rows(self, return_types, periods):
+        """{client_code: {(return_type, period): values}} for periods served from the archive"""
+        archive = get_archive()
+        archived = {}
+        for period in periods:
+            if not archive.is_archived(period):
+                continue
+            where = f"Period = ? AND ReturnType IN ({', '.join('?' * len(return_types))})"
+            for row in archive.get_rows(where, [period] + return_types, period):
+                archived.setdefault(row[1], {})[(row[2], row[3])] = row[4:8]
+        return archived
+
+    def _client_rows(self, client, stored, plan, due_dates, as_of):
+        for return_type, periods in plan.items():
+            if not taxpayer_applies(Config.GST_RETURNS[return_type]['applicable_taxpayer'],
+                                    client.taxpayer_type):
+                continue
+            for period in periods:
+                if not self.returns.is_client_applicable(client, return_type, period):
+                    continue
+                date_of_filing, status, arn, remarks = stored.get(
+                    (return_type, period), (None, Config.RETURN_STATUS[0], None, None))
+                date_of_filing = _as_date(date_of_filing)
+                due = due_dates[(return_type, period)]
+                days_overdue = 0
+                if due and not (arn or date_of_filing):
+                    days_overdue = max((as_of - due).days, 0)
+                yield return_type, [
+                    client.client_code, client.client_name, client.gstin, client.taxpayer_type,
+                    period, _format_date(due), status, _format_date(date_of_filing), arn, remarks,
+                    'Yes' if days_overdue else 'No', days_overdue
+                ]
+
+    def write_xlsx(self, path, plan, as_of=None):
+        """Write one sheet per return type with a write-only (streaming) workbook"""
+        wb = openpyxl.Workbook(write_only=True)
+        header_font = Font(bold=True, color="FFFFFF")
+        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+
+        sheets = {}
+        for return_type in plan:
+            ws = wb.create_sheet(title=return_type[:31])
+            ws.freeze_panes = 'A2'
+            for col_num, width in enumerate((12, 35, 18, 14, 12, 12, 16, 14, 20, 30, 9, 13), 1):
+                ws.column_dimensions[get_column_letter(col_num)].width = width
+            header = []
+            for title in REPORT_HEADERS:
+                cell = WriteOnlyCell(ws, value=title)
+                cell.font = header_font
+                cell.fill = header_fill
+                cell.alignment = Alignment(horizontal="center", vertical="center")
+                header.append(cell)
+            ws.append(header)
+            sheets[return_type] = ws
+
+        count = 0
+        for return_type, values in self.rows(plan, as_of):
+            sheets[return_type].append(values)
+            count += 1
+        wb.save(path)
+        return count
+
+    def iter_csv(self, plan, as_of=None):
+        """CSV text chunks for all return types in a single file (fast path for large outputs)"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['Return Type'] + REPORT_HEADERS)
+        for return_type, values in self.rows(plan, as_of):
+            writer.writerow([return_type] + values)
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
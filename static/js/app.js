@@ -3,6 +3,24 @@
 let currentReturnType = null;
 let currentPeriod = null;
 let returnClientsData = [];
+let currentDashboardRequest = null;
+let currentDashboardPeriod = null;
+let lastChangeSeq = null;
+let returnStream = null;
+const CHANGE_POLL_INTERVAL_MS = 15000;
+
+// Return details grid: only the rows in view are in the DOM
+let returnClientsByCode = new Map();
+let returnSearchIndex = new Map();   // client_code -> lowercase "name gstin"
+let returnGridView = [];             // returnClientsData after search/status filters
+let pristineReturnRows = new Map();  // client_code -> editable fields as last loaded/saved
+let dirtyReturnRows = new Set();     // client codes whose fields differ from pristine
+let returnRowHeight = null;
+let renderedReturnRange = null;
+let returnScrollFrame = null;
+let returnSearchTimer = null;
+const RETURN_GRID_OVERSCAN = 10;
+const RETURN_SEARCH_DEBOUNCE_MS = 200;
 
 // Helper to get the current date (or override for testing)
 function getToday() {
@@ -141,6 +159,7 @@ document.addEventListener('DOMContentLoaded', setGstReturnDropdownDefaults);
 
 document.addEventListener('DOMContentLoaded', function() {
     initializeApp();
+    startChangeFeed();
 });
 
 document.addEventListener('DOMContentLoaded', function () {
@@ -203,6 +222,7 @@ document.addEventListener('DOMContentLoaded', function () {
     select2Initialized = false;
     $('.modal-backdrop').remove();
     $('body').removeClass('modal-open').css('padding-right', '').css('overflow', 'auto');
+    closeReturnStream();
   });
 
   // Modal open: (re-)initialize select2, pre-select all statuses except Filed
@@ -215,6 +235,8 @@ document.addEventListener('DOMContentLoaded', function () {
       $statusSelect.val(defaultSel).trigger('change');
       select2Initialized = true;
     }
+    // The viewport has a height only once the modal is visible
+    renderVisibleReturnRows(true);
   });
 
   // Handle Select/Deselect All logic
@@ -248,13 +270,15 @@ document.addEventListener('DOMContentLoaded', function () {
 });
 
 
-function filterGridByStatus() {
+function getStatusFilteredClients() {
   const selectedStatuses = $('#statusFilter').val();  // Array or null
-  const filtered = (!selectedStatuses || selectedStatuses.length === 0)
+  return (!selectedStatuses || selectedStatuses.length === 0)
     ? returnClientsData
     : returnClientsData.filter(client => selectedStatuses.includes(client.status));
+}
 
-  displayReturnDetails(currentReturnType, currentPeriod, filtered);
+function filterGridByStatus() {
+  applyReturnFilters(true);
 }
 
 
@@ -298,9 +322,9 @@ function setupEventListeners() {
         searchInput.addEventListener('input', handleSearch);
     }
 
-    const statusFilter = document.getElementById('statusFilter');
-    if (statusFilter) {
-        statusFilter.addEventListener('change', handleStatusFilter);
+    const returnGridViewport = document.getElementById('returnGridViewport');
+    if (returnGridViewport) {
+        returnGridViewport.addEventListener('scroll', handleReturnGridScroll, { passive: true });
     }
 }
 
@@ -354,6 +378,7 @@ function handleReturnDashboard(event) {
         return;
     }
     showLoading(true);
+    currentDashboardRequest = data;
     fetch('/api/return_dashboard', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
@@ -377,11 +402,22 @@ function handleReturnDashboard(event) {
 function displayReturnDashboard(dashboardData, period) {
     const dashboardContainer = document.getElementById('dashboardContainer');
     if (!dashboardContainer) return;
+    currentDashboardPeriod = period;
 
     dashboardContainer.innerHTML = `
         <div class="row mb-4">
             <div class="col-12">
-                <h3 class="text-primary">Return Dashboard - ${period}</h3>
+                <div class="d-flex justify-content-between align-items-center flex-wrap gap-2">
+                    <h3 class="text-primary mb-0">Return Dashboard - ${period}</h3>
+                    <div class="d-flex gap-2">
+                        <button class="btn btn-outline-success btn-sm" onclick="exportReturnStatus('period')">
+                            <i class="fas fa-file-excel"></i> Export ${period}
+                        </button>
+                        <button class="btn btn-outline-success btn-sm" onclick="exportReturnStatus('financial_year')">
+                            <i class="fas fa-file-excel"></i> Export Financial Year
+                        </button>
+                    </div>
+                </div>
                 <hr>
             </div>
         </div>
@@ -413,6 +449,108 @@ function displayReturnDashboard(dashboardData, period) {
     }
 
     dashboardContainer.style.display = 'block';
+
+    const fySel = document.getElementById('financial_year');
+    loadOverdueWidget(fySel ? fySel.value : null);
+}
+
+// Server-built status workbook for the dashboard period or its whole financial year
+function exportReturnStatus(scope) {
+    const params = new URLSearchParams();
+    if (scope === 'period') {
+        params.set('period', currentDashboardPeriod);
+        // A quarter-end month is also a monthly period; limit to the returns shown
+        document.querySelectorAll('#dashboardContainer [data-return-type]').forEach(card => {
+            params.append('return_type', card.dataset.returnType);
+        });
+    } else {
+        const fySel = document.getElementById('financial_year');
+        params.set('financial_year', fySel ? fySel.value : '');
+    }
+    window.location.href = `/api/export_returns?${params.toString()}`;
+}
+
+// Overdue / due-soon widget shown above the dashboard cards
+function loadOverdueWidget(financialYear) {
+    const dashboardContainer = document.getElementById('dashboardContainer');
+    if (!dashboardContainer) return;
+
+    const params = new URLSearchParams();
+    if (financialYear) params.set('financial_year', financialYear);
+
+    fetch(`/api/overdue?${params.toString()}`)
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) return;
+        const existing = document.getElementById('overdueWidget');
+        if (existing) existing.remove();
+        const widget = createOverdueWidget(data.data);
+        const header = dashboardContainer.firstElementChild;
+        dashboardContainer.insertBefore(widget, header ? header.nextSibling : null);
+    })
+    .catch(error => console.error('Overdue widget error:', error));
+}
+
+function createOverdueWidget(overdueData) {
+    const summary = overdueData.summary;
+    const formatAmount = amount => `₹${Number(amount).toLocaleString('en-IN')}`;
+    const overdueRows = overdueData.obligations
+        .filter(o => o.state === 'overdue' || o.state === 'due_soon')
+        .sort((a, b) => b.days_overdue - a.days_overdue)
+        .slice(0, 10)
+        .map(o => `
+            <tr class="${o.state === 'overdue' ? 'table-danger' : 'table-warning'}">
+                <td>${o.return_type}</td>
+                <td>${o.period}</td>
+                <td>${formatDate(o.due_date)}</td>
+                <td>${o.pending}</td>
+                <td>${o.state === 'overdue' ? `${o.days_overdue} days` : 'Due soon'}</td>
+                <td>${formatAmount(o.late_fee_projected)}</td>
+            </tr>
+        `).join('');
+
+    const widget = document.createElement('div');
+    widget.id = 'overdueWidget';
+    widget.className = 'card mb-4';
+    widget.innerHTML = `
+        <div class="card-header">
+            <i class="fas fa-exclamation-triangle text-danger"></i>
+            Due Date Tracker - FY ${overdueData.financial_year} (as of ${formatDate(overdueData.as_of)})
+        </div>
+        <div class="card-body">
+            <div class="return-stats">
+                <div class="stat-item stat-pending">
+                    <div class="stat-value">${summary.overdue}</div>
+                    <div class="stat-label">Overdue</div>
+                </div>
+                <div class="stat-item stat-total">
+                    <div class="stat-value">${summary.due_soon}</div>
+                    <div class="stat-label">Due in ${overdueData.within_days} days</div>
+                </div>
+                <div class="stat-item stat-filed">
+                    <div class="stat-value">${summary.filed_late}</div>
+                    <div class="stat-label">Filed Late</div>
+                </div>
+                <div class="stat-item">
+                    <div class="stat-value">${formatAmount(summary.late_fee_projected)}</div>
+                    <div class="stat-label">Projected Late Fee</div>
+                </div>
+            </div>
+            ${overdueRows ? `
+            <div class="table-responsive mt-3">
+                <table class="table table-sm table-bordered small">
+                    <thead class="table-dark">
+                        <tr>
+                            <th>Return</th><th>Period</th><th>Due Date</th>
+                            <th>Pending</th><th>Overdue By</th><th>Projected Fee</th>
+                        </tr>
+                    </thead>
+                    <tbody>${overdueRows}</tbody>
+                </table>
+            </div>` : ''}
+        </div>
+    `;
+    return widget;
 }
 
 // Ensure createDashboardCard returns a .dashboard-card root (see below)
@@ -423,6 +561,7 @@ function displayReturnDashboard(dashboardData, period) {
 function createDashboardCard(returnType, data, period) {
     const card = document.createElement('div');
     card.className = 'dashboard-card';
+    card.dataset.returnType = returnType;
 
     // Extract due date based on returnType & frequency
     const dueDate = GST_RETURNS?.[returnType]?.due_date || "";
@@ -530,6 +669,90 @@ function createDashboardCard(returnType, data, period) {
 }
 
 
+// Switch the browser to another firm; every page and stream then reads its data
+function switchTenant(tenant) {
+    fetch('/api/tenants', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ tenant })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            window.location.reload();
+        } else {
+            showAlert(data.error, 'danger');
+        }
+    })
+    .catch(error => console.error('Tenant switch error:', error));
+}
+
+// Change feed: apply other users' writes as deltas instead of re-fetching
+function startChangeFeed() {
+    if (!document.getElementById('dashboardContainer')) return;
+
+    fetch('/api/changes')
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            lastChangeSeq = data.latest;
+            setInterval(pollChanges, CHANGE_POLL_INTERVAL_MS);
+        }
+    })
+    .catch(error => console.error('Change feed error:', error));
+}
+
+function pollChanges() {
+    if (lastChangeSeq === null || document.hidden) return;
+
+    fetch(`/api/changes?since=${lastChangeSeq}`)
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) return;
+        lastChangeSeq = data.latest;
+        applyChanges(data.data, data.more);
+    })
+    .catch(error => console.error('Change feed error:', error));
+}
+
+function applyChanges(changes, more) {
+    let refreshDashboard = more;
+
+    changes.forEach(change => {
+        if (change.entity === 'client') {
+            refreshDashboard = true;
+            return;
+        }
+        if (change.period === currentDashboardPeriod) {
+            refreshDashboard = true;
+        }
+        if (change.return_type === currentReturnType && change.period === currentPeriod && change.payload) {
+            const client = returnClientsByCode.get(change.client_code);
+            if (client) applyRemoteReturnUpdate(client, change.payload);
+        }
+    });
+
+    if (refreshDashboard) refreshReturnDashboard();
+}
+
+// Re-request the dashboard for the current selection without the loading spinner
+function refreshReturnDashboard() {
+    if (!currentDashboardRequest) return;
+
+    fetch('/api/return_dashboard', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(currentDashboardRequest)
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            displayReturnDashboard(data.data, data.period);
+        }
+    })
+    .catch(error => console.error('Dashboard refresh error:', error));
+}
+
 function showReturnDetails(returnType, period) {
     currentReturnType = returnType;
     currentPeriod = period;
@@ -544,7 +767,7 @@ function showReturnDetails(returnType, period) {
     .then(data => {
         showLoading(false);
         if (data.success) {
-            returnClientsData = data.data;
+            setReturnClientsData(data.data);
 
             // ✅ Pre-select all statuses except 'Filed'
 		  const defaultStatuses = [
@@ -552,7 +775,8 @@ function showReturnDetails(returnType, period) {
 		  ];
 		  $('#statusFilter').val(defaultStatuses).trigger('change');
 
-		  filterGridByStatus();
+		  displayReturnDetails(returnType, period);
+		  openReturnStream(returnType, period);
         } else {
             showAlert(data.error, 'danger');
         }
@@ -563,63 +787,294 @@ function showReturnDetails(returnType, period) {
     });
 }
 
-function displayReturnDetails(returnType, period, clients) {
+// Live row updates from other users editing the same return type and period
+function openReturnStream(returnType, period) {
+    closeReturnStream();
+    if (!window.EventSource) return;
+
+    const params = new URLSearchParams({ return_type: returnType, period: period });
+    returnStream = new EventSource(`/api/return_stream?${params.toString()}`);
+
+    returnStream.addEventListener('row', event => {
+        const update = JSON.parse(event.data);
+        const client = returnClientsByCode.get(update.client_code);
+        if (client) applyRemoteReturnUpdate(client, update);
+    });
+
+    // The server dropped updates for this subscriber; reload the grid data
+    returnStream.addEventListener('resync', () => reloadReturnRows(returnType, period));
+}
+
+function closeReturnStream() {
+    if (returnStream) {
+        returnStream.close();
+        returnStream = null;
+    }
+}
+
+// Move every filtered row at one status to a later one in a single request
+function moveFilteredReturnStatus() {
+    const fromStatus = document.getElementById('bulkFromStatus').value;
+    const toStatus = document.getElementById('bulkToStatus').value;
+    const statuses = ['Data Received', 'Saved', 'Payment Issued', 'Submitted', 'Filed'];
+    if (statuses.indexOf(toStatus) <= statuses.indexOf(fromStatus)) {
+        showAlert(`${toStatus} does not come after ${fromStatus}.`, 'warning');
+        return;
+    }
+
+    // Rows with unsaved edits are left for their own save
+    const clientCodes = returnGridView
+        .filter(client => client.status === fromStatus && !dirtyReturnRows.has(client.client_code))
+        .map(client => client.client_code);
+    if (clientCodes.length === 0) {
+        showAlert(`No filtered rows are at ${fromStatus}.`, 'info');
+        return;
+    }
+    if (!confirm(`Move ${clientCodes.length} returns from ${fromStatus} to ${toStatus}?`)) return;
+    // The server selects by its own stored status, so codes are sent whenever
+    // the view is narrower or any row has unsaved edits: a dirty row's local
+    // status says nothing about whether the server would move it
+    const atStatus = [...returnClientsByCode.values()].filter(client => client.status === fromStatus).length;
+    const sendCodes = clientCodes.length < atStatus || dirtyReturnRows.size > 0;
+
+    const returnType = currentReturnType;
+    const period = currentPeriod;
+    fetch('/api/return_status_transition', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            return_type: returnType,
+            period: period,
+            from_status: fromStatus,
+            to_status: toStatus,
+            remarks: document.getElementById('bulkRemarks').value,
+            client_codes: sendCodes ? clientCodes : null
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            showAlert(data.message, 'success');
+            reloadReturnRows(returnType, period);
+            refreshReturnDashboard();
+        } else {
+            showAlert(data.error, 'danger');
+        }
+    })
+    .catch(error => showAlert(error.message, 'danger'));
+}
+
+function reloadReturnRows(returnType, period) {
+    fetch('/api/return_clients', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ return_type: returnType, period: period })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success && returnType === currentReturnType && period === currentPeriod) {
+            // Keep the user's unsaved edits over the reloaded values
+            const edits = new Map([...dirtyReturnRows].map(code => [code, pickReturnEdits(returnClientsByCode.get(code))]));
+            setReturnClientsData(data.data);
+            edits.forEach((edit, code) => {
+                const client = returnClientsByCode.get(code);
+                if (client) {
+                    Object.assign(client, edit);
+                    dirtyReturnRows.add(code);
+                }
+            });
+            applyReturnFilters(false);
+        }
+    })
+    .catch(error => console.error('Grid reload error:', error));
+}
+
+function displayReturnDetails(returnType, period) {
     let modal = document.getElementById('returnDetailsModal');
     if (!modal) {
         createReturnDetailsModal();
         modal = document.getElementById('returnDetailsModal');
+        document.getElementById('returnGridViewport')
+            .addEventListener('scroll', handleReturnGridScroll, { passive: true });
     }
     document.getElementById('returnDetailsModalLabel').textContent = `${returnType} - ${period}`;
-    const tableBody = document.getElementById('returnDetailsTableBody');
-    tableBody.innerHTML = '';
+    applyReturnFilters(true);
 
+    bootstrap.Modal.getOrCreateInstance(modal).show();
+}
+
+// Replace the grid data, rebuild the lookup and search indexes and snapshot
+// the loaded values as pristine (nothing is dirty afterwards)
+function setReturnClientsData(clients) {
+    returnClientsData = clients;
+    returnClientsByCode = new Map();
+    returnSearchIndex = new Map();
+    pristineReturnRows = new Map();
+    dirtyReturnRows = new Set();
     clients.forEach(client => {
-        const row = document.createElement('tr');
-        row.innerHTML = `
-            <td>${client.client_name}</td>
-            <td>${client.gstin}</td>
-            <td>${client.period}</td>            
-            <td>
-                <select class="form-select form-select-sm status-input" name="status"
-                    onchange="statusDropdownChanged(this, ${client.client_code})">
-                    <option value="Data Received" ${client.status === 'Data Received' ? 'selected' : ''}>Data Received</option>
-                    <option value="Saved" ${client.status === 'Saved' ? 'selected' : ''}>Saved</option>
-                    <option value="Payment Issued" ${client.status === 'Payment Issued' ? 'selected' : ''}>Payment Issued</option>
-                    <option value="Submitted" ${client.status === 'Submitted' ? 'selected' : ''}>Submitted</option>
-                    <option value="Filed" ${client.status === 'Filed' ? 'selected' : ''}>Filed</option>
-                </select>
-            </td>
-			<td>
-                <input type="date" class="form-control form-control-sm date-of-filing-input"
-                    value="${client.date_of_filing || ''}"
-                    onchange="updateReturnField(${client.client_code}, 'date_of_filing', this.value)">
-            </td>
-            <td>
-                <input type="text" class="form-control form-control-sm arn-input" name="arn"
-                    value="${client.arn || ''}"
-                    ${client.status !== 'Filed' ? 'disabled' : ''}
-                    onchange="updateReturnField(${client.client_code}, 'arn', this.value)">
-            </td>
-            <td>
-                <input type="text" class="form-control form-control-sm"
-                    value="${client.remarks || ''}"
-                    onchange="updateReturnField(${client.client_code}, 'remarks', this.value)">
-            </td>
-            <td>
-                <button class="btn btn-sm btn-success" onclick="saveReturnData(${client.client_code})">
-                    <i class="fas fa-save"></i>
-                </button>
-            </td>
-        `;
-        tableBody.appendChild(row);
+        returnClientsByCode.set(client.client_code, client);
+        returnSearchIndex.set(client.client_code, `${client.client_name || ''} ${client.gstin || ''}`.toLowerCase());
+        pristineReturnRows.set(client.client_code, pickReturnEdits(client));
     });
+}
 
-    // After rendering rows, ensure ARN fields are set properly as per status
-    document.querySelectorAll('#returnDetailsTableBody tr').forEach(row => {
-        setArnFieldState(row);
+// Editable fields, normalised so '' and null compare equal
+function pickReturnEdits(client) {
+    return {
+        status: client.status,
+        date_of_filing: client.date_of_filing || '',
+        arn: client.arn || '',
+        remarks: client.remarks || ''
+    };
+}
+
+function isReturnRowModified(client) {
+    const pristine = pristineReturnRows.get(client.client_code);
+    if (!pristine) return true;
+    const current = pickReturnEdits(client);
+    return Object.keys(current).some(field => current[field] !== pristine[field]);
+}
+
+// The server now holds these values for the row
+function markReturnRowSaved(client) {
+    pristineReturnRows.set(client.client_code, pickReturnEdits(client));
+    markReturnRowDirty(client.client_code, false);
+}
+
+// Another user's save; rows with unsaved local edits keep them and will
+// get a version conflict on save instead of being silently overwritten
+function applyRemoteReturnUpdate(client, update) {
+    if (dirtyReturnRows.has(client.client_code)) return;
+    // Only the row's own fields; change payloads may carry other keys
+    Object.keys(update).forEach(key => {
+        if (key in client) client[key] = update[key];
+    });
+    pristineReturnRows.set(client.client_code, pickReturnEdits(client));
+    patchReturnRow(client);
+}
+
+// Recompute the filtered view from the status filter and search term
+function applyReturnFilters(resetScroll) {
+    const searchInput = document.getElementById('searchInput');
+    const searchTerm = searchInput ? searchInput.value.trim().toLowerCase() : '';
+    const clients = getStatusFilteredClients();
+
+    returnGridView = searchTerm
+        ? clients.filter(client => returnSearchIndex.get(client.client_code).includes(searchTerm))
+        : clients;
+
+    const viewport = document.getElementById('returnGridViewport');
+    if (viewport && resetScroll) viewport.scrollTop = 0;
+    renderVisibleReturnRows(true);
+}
+
+function handleReturnGridScroll() {
+    if (returnScrollFrame) return;
+    returnScrollFrame = requestAnimationFrame(() => {
+        returnScrollFrame = null;
+        renderVisibleReturnRows(false);
     });
+}
 
-    new bootstrap.Modal(document.getElementById('returnDetailsModal')).show();
+function createReturnSpacer(height) {
+    const spacer = document.createElement('tr');
+    spacer.className = 'virtual-spacer';
+    spacer.innerHTML = `<td colspan="8" style="height: ${height}px;"></td>`;
+    return spacer;
+}
+
+// Render only the rows inside the viewport (plus overscan), padded by spacer rows
+function renderVisibleReturnRows(force) {
+    const tableBody = document.getElementById('returnDetailsTableBody');
+    const viewport = document.getElementById('returnGridViewport');
+    if (!tableBody || !viewport) return;
+
+    const rowHeight = returnRowHeight || 40;
+    const viewportHeight = viewport.clientHeight || 600;
+    const total = returnGridView.length;
+    const start = Math.max(0, Math.floor(viewport.scrollTop / rowHeight) - RETURN_GRID_OVERSCAN);
+    const end = Math.min(total, start + Math.ceil(viewportHeight / rowHeight) + 2 * RETURN_GRID_OVERSCAN);
+
+    if (!force && renderedReturnRange && renderedReturnRange[0] === start && renderedReturnRange[1] === end) {
+        return;
+    }
+    renderedReturnRange = [start, end];
+
+    const fragment = document.createDocumentFragment();
+    if (start > 0) fragment.appendChild(createReturnSpacer(start * rowHeight));
+    for (let i = start; i < end; i++) {
+        const row = createReturnRow(returnGridView[i]);
+        setArnFieldState(row);
+        fragment.appendChild(row);
+    }
+    if (end < total) fragment.appendChild(createReturnSpacer((total - end) * rowHeight));
+
+    tableBody.innerHTML = '';
+    tableBody.appendChild(fragment);
+
+    // Measure a real row once so spacer heights match the rendered table
+    if (!returnRowHeight && end > start && viewport.clientHeight) {
+        const firstRow = tableBody.querySelector('tr[data-client-code]');
+        if (firstRow && firstRow.offsetHeight) {
+            returnRowHeight = firstRow.offsetHeight;
+            renderVisibleReturnRows(true);
+        }
+    }
+}
+
+function createReturnRow(client) {
+    const row = document.createElement('tr');
+    row.dataset.clientCode = client.client_code;
+    if (dirtyReturnRows.has(client.client_code)) row.classList.add('table-warning');
+    row.innerHTML = `
+        <td>${client.client_name}</td>
+        <td>${client.gstin}</td>
+        <td>${client.period}</td>            
+        <td>
+            <select class="form-select form-select-sm status-input" name="status"
+                onchange="statusDropdownChanged(this, ${client.client_code})">
+                <option value="Data Received" ${client.status === 'Data Received' ? 'selected' : ''}>Data Received</option>
+                <option value="Saved" ${client.status === 'Saved' ? 'selected' : ''}>Saved</option>
+                <option value="Payment Issued" ${client.status === 'Payment Issued' ? 'selected' : ''}>Payment Issued</option>
+                <option value="Submitted" ${client.status === 'Submitted' ? 'selected' : ''}>Submitted</option>
+                <option value="Filed" ${client.status === 'Filed' ? 'selected' : ''}>Filed</option>
+            </select>
+        </td>
+        <td>
+            <input type="date" class="form-control form-control-sm date-of-filing-input"
+                value="${client.date_of_filing || ''}"
+                onchange="updateReturnField(${client.client_code}, 'date_of_filing', this.value)">
+        </td>
+        <td>
+            <input type="text" class="form-control form-control-sm arn-input" name="arn"
+                value="${client.arn || ''}"
+                ${client.status !== 'Filed' ? 'disabled' : ''}
+                onchange="updateReturnField(${client.client_code}, 'arn', this.value)">
+        </td>
+        <td>
+            <input type="text" class="form-control form-control-sm"
+                value="${client.remarks || ''}"
+                onchange="updateReturnField(${client.client_code}, 'remarks', this.value)">
+        </td>
+        <td>
+            <button class="btn btn-sm btn-success" onclick="saveReturnData(${client.client_code})">
+                <i class="fas fa-save"></i>
+            </button>
+        </td>
+    `;
+    return row;
+}
+
+// Replace a single rendered row in place (used when applying change-feed deltas)
+function patchReturnRow(client) {
+    const tableBody = document.getElementById('returnDetailsTableBody');
+    if (!tableBody) return;
+    // Rows scrolled out of view pick the change up when next rendered
+    const existing = tableBody.querySelector(`tr[data-client-code="${client.client_code}"]`);
+    if (!existing) return;
+    const row = createReturnRow(client);
+    tableBody.replaceChild(row, existing);
+    setArnFieldState(row);
 }
 
 async function exportReturnGridToExcel() {
@@ -781,8 +1236,37 @@ function createReturnDetailsModal() {
 							</div>
 						</div>
 
+						<!-- Bulk status move for the filtered rows -->
+						<div class="row align-items-end g-2 mb-3">
+							<div class="col-md-2">
+								<label for="bulkFromStatus" class="form-label mb-1">Move From</label>
+								<select id="bulkFromStatus" class="form-select form-select-sm">
+									<option value="Data Received">Data Received</option>
+									<option value="Saved">Saved</option>
+									<option value="Payment Issued">Payment Issued</option>
+								</select>
+							</div>
+							<div class="col-md-2">
+								<label for="bulkToStatus" class="form-label mb-1">To</label>
+								<select id="bulkToStatus" class="form-select form-select-sm">
+									<option value="Saved">Saved</option>
+									<option value="Payment Issued">Payment Issued</option>
+									<option value="Submitted">Submitted</option>
+								</select>
+							</div>
+							<div class="col-md-5">
+								<label for="bulkRemarks" class="form-label mb-1">Remarks (optional)</label>
+								<input type="text" id="bulkRemarks" class="form-control form-control-sm">
+							</div>
+							<div class="col-md-3 text-end">
+								<button onclick="moveFilteredReturnStatus()" class="btn btn-sm btn-outline-primary">
+									<i class="fas fa-forward"></i> Move Filtered Rows
+								</button>
+							</div>
+						</div>
+
 						<!-- Return Filing Table -->
-						<div class="table-responsive">
+						<div class="table-responsive return-grid-viewport" id="returnGridViewport">
 							<table class="table table-bordered table-hover small">
 								<thead class="table-dark">
 									<tr>
@@ -832,55 +1316,71 @@ function statusDropdownChanged(selectEl, clientCode) {
 }
 
 function updateReturnField(clientCode, field, value) {
-    const clientIndex = returnClientsData.findIndex(c => c.client_code === clientCode);
-    if (clientIndex !== -1) {
-        returnClientsData[clientIndex][field] = value;
-
-        // Only manage ARN logic when field updated is 'status'
-        if (field === 'status') {
-            const row = event.target.closest('tr');
-            const arnInput = row.querySelector('input[name="arn"]');
-            
-            if (value === 'Filed') {
-                // Enable ARN input
-                if (arnInput) arnInput.removeAttribute('disabled');
-            } else {
-                // Clear ARN value from UI and memory
-                if (arnInput) {
-                    arnInput.value = '';
-                    arnInput.setAttribute('disabled', true);
-                }
-                // 💡 This is key:
-                returnClientsData[clientIndex]['arn'] = '';
-            }
-        }
+    const client = returnClientsByCode.get(clientCode);
+    if (!client) return;
+
+    client[field] = value;
+    // ARN only applies to filed returns (statusDropdownChanged updates the input)
+    if (field === 'status' && value !== 'Filed') {
+        client.arn = '';
     }
+    // Editing a field back to its loaded value makes the row clean again
+    markReturnRowDirty(clientCode, isReturnRowModified(client));
 }
 
+function markReturnRowDirty(clientCode, dirty) {
+    if (dirty) {
+        dirtyReturnRows.add(clientCode);
+    } else {
+        dirtyReturnRows.delete(clientCode);
+    }
+    const row = document.querySelector(`#returnDetailsTableBody tr[data-client-code="${clientCode}"]`);
+    if (row) row.classList.toggle('table-warning', dirty);
+}
 
-function saveReturnData(clientCode) {
-    const client = returnClientsData.find(c => c.client_code === clientCode);
-    if (!client) return;
 
-    const returnData = {
-        client_code: clientCode,
+function buildReturnPayload(client) {
+    return {
+        client_code: client.client_code,
         return_type: currentReturnType,
         period: currentPeriod,
         date_of_filing: client.date_of_filing || null,
         status: client.status,
         arn: client.arn || null,
-        remarks: client.remarks || null
+        remarks: client.remarks || null,
+        row_version: client.row_version ?? 0
     };
+}
+
+// Someone else saved this row first: show their values so the user can redo the edit
+function applyReturnConflict(client, current) {
+    if (current) {
+        Object.assign(client, current);
+        markReturnRowSaved(client);
+        patchReturnRow(client);
+    }
+}
+
+function saveReturnData(clientCode) {
+    const client = returnClientsByCode.get(clientCode);
+    if (!client) return;
+    if (!validateReturnClient(client)) return;
 
     fetch('/api/save_return_data', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(returnData)
+        body: JSON.stringify(buildReturnPayload(client))
     })
     .then(response => response.json())
     .then(data => {
         if (data.success) {
-            showAlert('Return data saved successfully!', 'success');
+            client.row_version = data.row_version;
+            markReturnRowSaved(client);
+            showAlert(data.unchanged ? 'No changes to save.' : 'Return data saved successfully!',
+                data.unchanged ? 'info' : 'success');
+        } else if (data.conflict) {
+            applyReturnConflict(client, data.current);
+            showAlert(data.error, 'warning');
         } else {
             showAlert(data.error, 'danger');
         }
@@ -890,106 +1390,90 @@ function saveReturnData(clientCode) {
     });
 }
 
-// Validate a single row's data within the modal table/form
-function validateReturnRow(rowElem) {
-    const status = rowElem.querySelector(".status-input")?.value?.trim();
-    const arn = rowElem.querySelector(".arn-input")?.value?.trim();
-    const dateOfFiling = rowElem.querySelector(".date-of-filing-input")?.value?.trim();
+// Validate a client's grid data (the row itself may be scrolled out of the DOM)
+function validateReturnClient(client) {
+    const arn = (client.arn || '').trim();
+    const dateOfFiling = (client.date_of_filing || '').trim();
     
     let missing = [];
-    if (status === "Filed") {
+    if (client.status === "Filed") {
         if (!arn) missing.push("ARN");
         if (!dateOfFiling) missing.push("Date of Filing");
     }
     if (missing.length) {
-        // Add error highlighting to row
-        rowElem.classList.add("row-error");
-        // Remove highlight after 3.5s
-        setTimeout(() => rowElem.classList.remove("row-error"), 3500);
+        // Add error highlighting to row if it is rendered
+        const rowElem = document.querySelector(`#returnDetailsTableBody tr[data-client-code="${client.client_code}"]`);
+        if (rowElem) {
+            rowElem.classList.add("row-error");
+            // Remove highlight after 3.5s
+            setTimeout(() => rowElem.classList.remove("row-error"), 3500);
+        }
         
         // Show combined toast error
-        showAlert(`${missing.join(' and ')} required when status is "Filed".`);
+        showAlert(`${client.client_name}: ${missing.join(' and ')} required when status is "Filed".`);
         return false;
     }
     return true;
 }
 
+// Save only the rows edited since they were loaded or last saved
 function saveAllReturnData() {
-	const tableBody = document.getElementById('returnDetailsTableBody');
-    const rows = tableBody.querySelectorAll('tr');
-    
-    let allValid = true;
-    rows.forEach(row => {
-        if (!validateReturnRow(row)) {
-            allValid = false;
-        }
-    });
+    const dirtyClients = [...dirtyReturnRows]
+        .map(code => returnClientsByCode.get(code))
+        .filter(Boolean);
+
+    if (dirtyClients.length === 0) {
+        showAlert('No changes to save.', 'info');
+        return;
+    }
 
+    const allValid = dirtyClients.every(validateReturnClient);
     if (!allValid) {
-        // Stop submission, toasts already shown
+        // Stop submission, toast already shown
         return;
     }
 	
-    const promises = returnClientsData.map(client => {
-        const returnData = {
-            client_code: client.client_code,
+    fetch('/api/save_return_data_bulk', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
             return_type: currentReturnType,
             period: currentPeriod,
-            date_of_filing: client.date_of_filing || null,
-            status: client.status,
-            arn: client.arn || null,
-            remarks: client.remarks || null
-        };
-        return fetch('/api/save_return_data', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(returnData)
-        }).then(response => response.json());
-    });
-
-    Promise.all(promises)
-        .then(results => {
-            const successCount = results.filter(r => r.success).length;
-            const errorCount = results.length - successCount;
-            if (errorCount === 0) {
-                showAlert(`All ${successCount} return data saved successfully!`, 'success');
-            } else {
-                showAlert(`${successCount} saved successfully, ${errorCount} failed.`, 'warning');
-            }
+            rows: dirtyClients.map(buildReturnPayload)
         })
-        .catch(error => {
-            showAlert(error.message, 'danger');
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            showAlert(data.error, 'danger');
+            return;
+        }
+        data.results.forEach(result => {
+            const client = returnClientsByCode.get(result.client_code);
+            if (!client) return;
+            if (result.result === 'saved' || result.result === 'unchanged') {
+                client.row_version = result.row_version;
+                markReturnRowSaved(client);
+            } else if (result.result === 'conflict') {
+                applyReturnConflict(client, result.current);
+            }
         });
-}
-
-function handleSearch() {
-    const searchTerm = document.getElementById('searchInput').value.toLowerCase();
-    const tableBody = document.getElementById('returnDetailsTableBody');
-    const rows = tableBody.querySelectorAll('tr');
-    rows.forEach(row => {
-        const clientName = row.cells[0].textContent.toLowerCase();
-        const gstin = row.cells[1].textContent.toLowerCase();
-        if (clientName.includes(searchTerm) || gstin.includes(searchTerm)) {
-            row.style.display = '';
+        const { saved, unchanged, conflict, error } = data.summary;
+        if (conflict === 0 && error === 0) {
+            showAlert(`${saved} return data saved successfully!` + (unchanged ? ` (${unchanged} unchanged)` : ''), 'success');
         } else {
-            row.style.display = 'none';
+            showAlert(`${saved} saved, ${unchanged} unchanged, ${conflict} changed by someone else, ${error} failed.`, 'warning');
         }
+    })
+    .catch(error => {
+        showAlert(error.message, 'danger');
     });
 }
 
-function handleStatusFilter() {
-    const statusFilter = document.getElementById('statusFilter').value;
-    const tableBody = document.getElementById('returnDetailsTableBody');
-    const rows = tableBody.querySelectorAll('tr');
-    rows.forEach(row => {
-        const statusSelect = row.cells[4].querySelector('select');
-        const currentStatus = statusSelect.value;
-        if (statusFilter === '' || currentStatus === statusFilter) {
-            row.style.display = '';
-        } else {
-            row.style.display = 'none';
-        }
-    });
+// Debounced: filter against the precomputed search index once typing pauses
+function handleSearch() {
+    clearTimeout(returnSearchTimer);
+    returnSearchTimer = setTimeout(() => applyReturnFilters(true), RETURN_SEARCH_DEBOUNCE_MS);
 }
 
 function showLoading(show) {
@@ -1061,7 +1545,7 @@ window.showReturnDetails = showReturnDetails;
 window.updateReturnField = updateReturnField;
 window.saveReturnData = saveReturnData;
 window.saveAllReturnData = saveAllReturnData;
+window.exportReturnStatus = exportReturnStatus;
 window.handleSearch = handleSearch;
-window.handleStatusFilter = handleStatusFilter;
 window.showAlert = showAlert;
 window.statusDropdownChanged = statusDropdownChanged;
@@ -0,0 +1,92 @@
+import contextvars
+import os
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
+from config import Config
+
+# Where one firm's data lives
+TenantPaths = namedtuple('TenantPaths', 'database archive_folder backup_folder credential_key_file')
+
+# Firm the current request (or CLI run) works on
+_current_tenant = contextvars.ContextVar(
+    'current_tenant', default=os.environ.get('GST_TENANT') or Config.DEFAULT_TENANT)
+
+
+class UnknownTenant(ValueError):
+    """Raised for a tenant ID that is not configured"""
+
+
+def tenant_ids():
+    """Configured tenants, the default one first"""
+    return [Config.DEFAULT_TENANT] + [tenant for tenant in Config.TENANTS if tenant != Config.DEFAULT_TENANT]
+
+
+def current_tenant():
+    return _current_tenant.get()
+
+
+def set_tenant(tenant):
+    """Switch the current context to `tenant`; returns the token for reset_tenant()"""
+    if tenant not in tenant_ids():
+        raise UnknownTenant(f'Unknown tenant: {tenant}')
+    return _current_tenant.set(tenant)
+
+
+def reset_tenant(token):
+    _current_tenant.reset(token)
+
+
+@contextmanager
+def use_tenant(tenant):
+    token = set_tenant(tenant)
+    try:
+        yield
+    finally:
+        reset_tenant(token)
+
+
+def tenant_paths(tenant=None):
+    """TenantPaths of `tenant` (default: the current one)"""
+    return _tenant_paths(tenant or current_tenant())
+
+
+@lru_cache(maxsize=None)
+def _tenant_paths(tenant):
+    # The default tenant keeps the single-firm locations, so existing installs need no move
+    if tenant == Config.DEFAULT_TENANT:
+        return TenantPaths(Config.DATABASE_PATH, Config.ARCHIVE_FOLDER,
+                           Config.BACKUP_FOLDER, Config.CREDENTIAL_KEY_FILE)
+    folder = os.path.join(Config.TENANT_FOLDER, tenant)
+    return TenantPaths(os.path.join(folder, 'gst_tracking.accdb'), os.path.join(folder, 'archive'),
+                       os.path.join(folder, 'backups'), os.path.join(folder, 'credential.key'))
+
+
+class TenantScoped:
+    """One instance of a stateful service per tenant, created on first use
+
+    Attribute access is forwarded to the current tenant's instance, so the
+    app's module-level models and trackers keep their call sites while
+    every firm gets its own caches, cursors and database connection.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def get(self, tenant=None):
+        tenant = tenant or current_tenant()
+        instance = self._instances.get(tenant)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(tenant)
+                if instance is None:
+                    with use_tenant(tenant):
+                        instance = self._factory()
+                    self._instances[tenant] = instance
+        return instance
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
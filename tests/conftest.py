@@ -0,0 +1,241 @@
+"""Test fixtures: the Access database is replaced by a SQLite file per tenant
+
+pyodbc.connect() is pointed at SQLite, with the few Access-only bits of
+SQL the app uses translated on the way. Each test gets a tenant of its
+own, so its database, archive, backups and cached models start empty.
+"""
+import itertools
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import types
+from datetime import date, datetime
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import pyodbc
+except ImportError:
+    # No ODBC driver manager on this machine; only the fake connection below is used
+    pyodbc = types.ModuleType('pyodbc')
+    pyodbc.Error = type('Error', (Exception,), {})
+    sys.modules['pyodbc'] = pyodbc
+
+from config import Config
+
+# Everything the app writes goes under one temporary folder
+DATA_FOLDER = tempfile.mkdtemp(prefix='gst-tests-')
+Config.DATABASE_PATH = os.path.join(DATA_FOLDER, 'default', 'gst_tracking.accdb')
+Config.ARCHIVE_FOLDER = os.path.join(DATA_FOLDER, 'default', 'archive')
+Config.BACKUP_FOLDER = os.path.join(DATA_FOLDER, 'default', 'backups')
+Config.CREDENTIAL_KEY_FILE = os.path.join(DATA_FOLDER, 'default', 'credential.key')
+Config.CREDENTIAL_KEY = None
+Config.TENANT_FOLDER = os.path.join(DATA_FOLDER, 'tenants')
+Config.UPLOAD_FOLDER = os.path.join(DATA_FOLDER, 'uploads')
+Config.PROFILE_FOLDER = os.path.join(DATA_FOLDER, 'profiles')
+Config.PROFILE_SAMPLE_RATE = 0
+Config.PROFILE_ON_REQUEST = False
+Config.TENANTS = []
+os.makedirs(os.path.dirname(Config.DATABASE_PATH), exist_ok=True)
+open(Config.DATABASE_PATH, 'a').close()
+
+
+# SQLite stand-in for the Access ODBC driver -----------------------------
+
+def _iso_date(value):
+    return value.isoformat()
+
+
+def _iso_datetime(value):
+    return value.isoformat(' ')
+
+
+def _parse_datetime(value):
+    # Access DATE/DATETIME columns come back from pyodbc as datetime
+    return datetime.fromisoformat(value.decode())
+
+
+sqlite3.register_adapter(date, _iso_date)
+sqlite3.register_adapter(datetime, _iso_datetime)
+sqlite3.register_converter('DATE', _parse_datetime)
+sqlite3.register_converter('DATETIME', _parse_datetime)
+
+# SQLite drops the column type of aggregates such as MIN(ChangedAt); Access keeps it
+_TIMESTAMP = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(\.\d+)?')
+
+
+def _typed_row(row):
+    if row is None or not any(isinstance(value, str) and _TIMESTAMP.fullmatch(value) for value in row):
+        return row
+    return tuple(datetime.fromisoformat(value) if isinstance(value, str) and _TIMESTAMP.fullmatch(value) else value
+                 for value in row)
+
+_TOP = re.compile(r'SELECT\s+TOP\s+(\d+)\s+(.*)', re.IGNORECASE | re.DOTALL)
+
+
+def access_to_sqlite(query):
+    """The Access-only SQL the app sends, rewritten for SQLite"""
+    query = query.replace('COUNTER PRIMARY KEY', 'INTEGER PRIMARY KEY AUTOINCREMENT')
+    query = query.replace('@@IDENTITY', 'last_insert_rowid()')
+    query = query.replace('DateValue(', 'date(')
+    top = _TOP.search(query)
+    if top:
+        query = query[:top.start()] + f"SELECT {top.group(2).rstrip()} LIMIT {top.group(1)}"
+    return query
+
+
+class _CatalogRow:
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self._connection = connection
+        self._cursor = connection.cursor()
+        self.fast_executemany = False
+
+    def execute(self, query, params=()):
+        try:
+            self._cursor.execute(access_to_sqlite(query), tuple(params or ()))
+        except sqlite3.Error as e:
+            raise pyodbc.Error(str(e)) from e
+        return self
+
+    def executemany(self, query, seq_of_params):
+        try:
+            self._cursor.executemany(access_to_sqlite(query), [tuple(params) for params in seq_of_params])
+        except sqlite3.Error as e:
+            raise pyodbc.Error(str(e)) from e
+        return self
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        return _typed_row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [_typed_row(row) for row in self._cursor.fetchall()]
+
+    def fetchmany(self, size):
+        return [_typed_row(row) for row in self._cursor.fetchmany(size)]
+
+    def tables(self, tableType=None):
+        rows = self._connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+        return [_CatalogRow(table_name=row[0]) for row in rows]
+
+    def columns(self, table=None):
+        rows = self._connection.execute(f"PRAGMA table_info({table})").fetchall()
+        return [_CatalogRow(column_name=row[1]) for row in rows]
+
+    def close(self):
+        self._cursor.close()
+
+
+class FakeConnection:
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False,
+                                           detect_types=sqlite3.PARSE_DECLTYPES)
+
+    def cursor(self):
+        return FakeCursor(self._connection)
+
+    def execute(self, query, params=()):
+        return self.cursor().execute(query, params)
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def close(self):
+        self._connection.close()
+
+
+def connect(connection_string, **kwargs):
+    path = re.search(r'DBQ=([^;]*);', connection_string).group(1)
+    return FakeConnection(path)
+
+
+pyodbc.connect = connect
+
+import app as app_module  # noqa: E402  (after the database is faked)
+from database import create_database_tables, create_database_indexes  # noqa: E402
+from tenants import tenant_paths, use_tenant  # noqa: E402
+
+_tenant_numbers = itertools.count(1)
+
+
+def _create_tenant(monkeypatch):
+    tenant_id = f'test{next(_tenant_numbers)}'
+    monkeypatch.setattr(Config, 'TENANTS', Config.TENANTS + [tenant_id])
+    path = tenant_paths(tenant_id).database
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'a').close()
+    with use_tenant(tenant_id):
+        create_database_tables()
+        create_database_indexes()
+    return tenant_id
+
+
+@pytest.fixture
+def tenant(monkeypatch):
+    """A fresh tenant with an empty database, current for the test"""
+    tenant_id = _create_tenant(monkeypatch)
+    with use_tenant(tenant_id):
+        yield tenant_id
+
+
+@pytest.fixture
+def make_tenant(monkeypatch):
+    """Create further fresh tenants; returns the tenant ID"""
+    return lambda: _create_tenant(monkeypatch)
+
+
+@pytest.fixture
+def client(tenant):
+    """Flask test client whose requests work on the test's tenant"""
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as test_client:
+        test_client.environ_base['HTTP_X_TENANT_ID'] = tenant
+        yield test_client
+
+
+def make_gstin(number, state='27'):
+    """A valid GSTIN for test client `number`"""
+    from gstin import gstin_check_character
+    first_fourteen = f'{state}AAAAA{number:04d}A1Z'
+    return first_fourteen + gstin_check_character(first_fourteen)
+
+
+@pytest.fixture
+def make_client(client):
+    """Create a client through the API; returns its ClientCode"""
+    numbers = itertools.count(1)
+
+    def create(taxpayer_type='Monthly', **fields):
+        number = next(numbers)
+        data = {
+            'client_name': f'Client {number}',
+            'date_of_registration': '2020-04-01',
+            'gstin': make_gstin(number),
+            'taxpayer_type': taxpayer_type,
+            'gst_portal_userid': f'user{number}',
+            'gst_portal_password': f'secret{number}',
+            'client_email_id': f'client{number}@example.com',
+            'mobile_no': f'98000{number:05d}',
+            **fields
+        }
+        response = client.post('/api/clients', json=data)
+        assert response.get_json()['success'], response.get_json()
+        return app_module.client_model.get_client_by_gstin(data['gstin']).client_code
+
+    return create
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+import app as app_module
+from archive import ReturnArchive, get_archive
+from database import DatabaseConnection
+from periods import get_calendar
+
+FINANCIAL_YEAR = '2020-21'
+PERIOD = get_calendar().month_period('Apr', FINANCIAL_YEAR)
+
+
+def _save(client, client_code, row_version=0, **fields):
+    return client.post('/api/save_return_data', json={
+        'client_code': client_code, 'return_type': 'GSTR-1', 'period': PERIOD,
+        'status': 'Submitted', 'row_version': row_version, **fields})
+
+
+def test_archived_year_is_read_through_and_read_only(client, make_client):
+    client_code = make_client()
+    _save(client, client_code, remarks='filed late')
+
+    assert get_archive().archive_financial_year(FINANCIAL_YEAR) == 1
+
+    stored = app_module.gst_return_model.get_return_data(client_code, 'GSTR-1', PERIOD)
+    assert stored.remarks == 'filed late'
+    response = _save(client, client_code, row_version=1, status='Filed', arn='AA1', date_of_filing='2020-05-11')
+    assert 'read-only' in response.get_json()['error']
+
+
+def test_year_is_read_only_while_being_archived(client, make_client):
+    client_code = make_client()
+    archive = get_archive()
+    open(archive.pending_path(FINANCIAL_YEAR), 'w').close()
+    try:
+        response = _save(client, client_code)
+    finally:
+        os.remove(archive.pending_path(FINANCIAL_YEAR))
+
+    assert 'being archived' in response.get_json()['error']
+
+
+def test_update_landing_during_the_copy_aborts_the_archive(client, make_client, monkeypatch):
+    client_code = make_client()
+    _save(client, client_code)
+    archive = get_archive()
+    iter_rows = archive.db.iter_rows
+
+    def copy_then_update(*args, **kwargs):
+        rows = list(iter_rows(*args, **kwargs))
+        # A write that passed check_writable before archiving started commits mid-copy;
+        # it changes a status but not the row count
+        writer = DatabaseConnection()
+        writer.connect()
+        writer.execute_non_query(
+            "UPDATE GSTReturnData SET Status = 'Filed', RowVersion = RowVersion + 1 WHERE ClientCode = ?",
+            (client_code,))
+        writer.disconnect()
+        yield from rows
+
+    monkeypatch.setattr(archive.db, 'iter_rows', copy_then_update)
+    with pytest.raises(RuntimeError, match='changed while archiving'):
+        archive.archive_financial_year(FINANCIAL_YEAR)
+
+    assert not archive.is_archived(PERIOD)
+    assert not os.path.exists(archive.path_for(FINANCIAL_YEAR))
+    assert not os.path.exists(archive.pending_path(FINANCIAL_YEAR))
+    stored = app_module.gst_return_model.get_return_data(client_code, 'GSTR-1', PERIOD)
+    assert stored.status == 'Filed' and stored.row_version == 2
+
+
+def test_year_archived_by_another_process_is_seen_by_the_app(client, make_client):
+    client_code = make_client()
+    _save(client, client_code, remarks='filed late')
+    assert not get_archive().is_archived(PERIOD)  # the app's archive has scanned its folder
+
+    # `python archive.py archive` works on its own ReturnArchive
+    assert ReturnArchive().archive_financial_year(FINANCIAL_YEAR) == 1
+
+    assert get_archive().archived_financial_years() == [FINANCIAL_YEAR]
+    stored = app_module.gst_return_model.get_return_data(client_code, 'GSTR-1', PERIOD)
+    assert stored.remarks == 'filed late'
+    response = _save(client, make_client())
+    assert 'read-only' in response.get_json()['error']
@@ -0,0 +1,75 @@
+import gzip
+
+from backup import BackupManager, BACKUP_TABLES, INCREMENTAL, SNAPSHOT
+from database import DatabaseConnection
+from periods import get_calendar
+
+APRIL = get_calendar().month_period('Apr', '2025-26')
+MAY = get_calendar().month_period('May', '2025-26')
+
+
+def _save(client, client_code, period, row_version=0, **fields):
+    response = client.post('/api/save_return_data', json={
+        'client_code': client_code, 'return_type': 'GSTR-1', 'period': period,
+        'status': 'Saved', 'row_version': row_version, **fields})
+    assert response.get_json()['success'], response.get_json()
+
+
+def _live_rows():
+    db = DatabaseConnection()
+    db.connect()
+    try:
+        return {table: sorted(tuple(row) for row in db.fetch_all(f"SELECT {', '.join(columns)} FROM {table}"))
+                for table, (columns, _) in BACKUP_TABLES.items()}
+    finally:
+        db.disconnect()
+
+
+def test_snapshot_plus_incrementals_restore_the_book(client, make_client):
+    first, second, third = make_client(), make_client(), make_client()
+    _save(client, first, APRIL)
+    _save(client, second, APRIL)
+    manager = BackupManager()
+    manager.snapshot()
+
+    # Updates, inserts and deletes, spread over two incrementals
+    _save(client, first, APRIL, row_version=1, status='Submitted', remarks='sent')
+    _save(client, third, MAY)
+    assert client.delete(f'/api/clients/{second}').get_json()['success']
+    manager.incremental()
+    fourth = make_client()
+    _save(client, fourth, APRIL, status='Payment Issued')
+    _save(client, first, MAY, remarks='second period')
+    manager.incremental()
+    source = _live_rows()
+
+    # Damage the live tables, then rebuild them from the chain
+    db = DatabaseConnection()
+    db.connect()
+    db.execute_transaction([("DELETE FROM GSTReturnData", None),
+                            ("UPDATE ClientMaster SET ClientName = 'overwritten'", None)])
+    db.disconnect()
+
+    counts = manager.restore()
+
+    assert _live_rows() == source
+    assert counts == {table: len(rows) for table, rows in source.items()}
+    assert manager.verify()['match'] is True
+
+
+def test_backups_are_listed_without_unpacking(client, make_client, monkeypatch):
+    make_client()
+    manager = BackupManager()
+    snapshot = manager.snapshot()
+    make_client()
+    incremental = manager.incremental()
+
+    def unpack(*args, **kwargs):
+        raise AssertionError('listing backups must not unpack them')
+
+    monkeypatch.setattr(gzip, 'open', unpack)
+    chain = manager.chain()
+
+    assert [backup['file'] for backup in chain] == [snapshot, incremental]
+    assert [backup['kind'] for backup in chain] == [SNAPSHOT, INCREMENTAL]
+    assert chain[1]['base_seq'] == chain[0]['seq'] < chain[1]['seq']
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+from backup import BackupManager
+from changefeed import ChangeCursor, ChangeFeed
+from database import DatabaseConnection
+from periods import get_calendar
+from test_backup import _live_rows
+
+PERIOD = get_calendar().month_period('Apr', '2025-26')
+
+
+def _write(client_code, seq, changed_at=None):
+    """One writer's committed transaction: its return row, and its change at ChangeSeq `seq`
+
+    Writers take their ChangeSeq when they insert the change row but commit
+    later, so a lower seq can become visible after a higher one; explicit
+    seqs stand in for two such interleaved transactions.
+    """
+    db = DatabaseConnection()
+    db.connect()
+    db.execute_transaction([
+        ("""INSERT INTO GSTReturnData (ClientCode, ReturnType, Period, Status, RowVersion)
+            VALUES (?, 'GSTR-1', ?, 'Saved', 1)""", (client_code, PERIOD)),
+        ("""INSERT INTO ChangeLog (ChangeSeq, ChangedAt, Entity, Action, ClientCode, ReturnType, Period)
+            VALUES (?, ?, 'return', 'insert', ?, 'GSTR-1', ?)""",
+         (seq, changed_at or datetime.now(), client_code, PERIOD)),
+    ])
+    db.disconnect()
+
+
+def test_change_committed_after_a_later_one_is_not_skipped(make_client):
+    first, second = make_client(), make_client()
+    feed = ChangeFeed()
+    cursor = ChangeCursor(feed)
+    cursor.poll()
+    seq = feed.latest_seq()
+
+    # Writer A took seq + 1, writer B took seq + 2 and commits first
+    _write(second, seq + 2)
+    assert [change['client_code'] for change in cursor.poll()] == [second]
+    assert cursor.position == seq
+
+    _write(first, seq + 1)
+    assert [change['client_code'] for change in cursor.poll()] == [first]
+    assert cursor.position == seq + 2
+    assert cursor.poll() == []
+
+
+def test_seq_of_a_rolled_back_write_stops_holding_the_position(make_client):
+    client_code = make_client()
+    feed = ChangeFeed()
+    cursor = ChangeCursor(feed)
+    cursor.poll()
+    seq = feed.latest_seq()
+
+    # Nothing ever commits at seq + 1, and the change after it is older than CHANGE_GAP_SECONDS
+    _write(client_code, seq + 2, changed_at=datetime.now() - timedelta(hours=1))
+
+    assert len(cursor.poll()) == 1
+    assert cursor.position == seq + 2
+
+
+def test_new_cursor_starts_below_changes_still_being_committed(make_client):
+    client_code = make_client()
+    seq = ChangeFeed().latest_seq()
+    _write(client_code, seq + 2)
+
+    assert ChangeFeed().safe_seq() == seq
+
+
+def test_incremental_backup_picks_up_a_change_committed_late(make_client):
+    first, second = make_client(), make_client()
+    manager = BackupManager()
+    manager.snapshot()
+    seq = ChangeFeed().latest_seq()
+
+    _write(second, seq + 2)
+    manager.incremental()
+    _write(first, seq + 1)
+    manager.incremental()
+    source = _live_rows()
+
+    db = DatabaseConnection()
+    db.connect()
+    db.execute_transaction([("DELETE FROM GSTReturnData", None)])
+    db.disconnect()
+    manager.restore()
+
+    assert _live_rows() == source
+    assert len(source['GSTReturnData']) == 2
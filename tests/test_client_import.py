@@ -0,0 +1,179 @@
+import time
+from datetime import datetime
+
+from client_import import (ClientImport, MODE_INSERT, MODE_UPSERT,
+                           INSERT, UPDATE, UNCHANGED, DUPLICATE, ERROR)
+from conftest import make_gstin
+from records import CLIENT_COLUMNS, client_projection
+
+
+class StubVault:
+    def __init__(self, credentials):
+        self.credentials = credentials
+
+    def get_all_credentials(self, accessed_by=None, purpose='export'):
+        return self.credentials
+
+
+class StubClients:
+    """The two reads ClientImport.plan makes, over an in-memory client list"""
+
+    def __init__(self, clients, credentials=None):
+        self.clients = clients
+        self.vault = StubVault(credentials or {})
+
+    def get_all_clients(self, fields=None):
+        return self.clients
+
+
+def stored_client(number, **fields):
+    values = {
+        'client_code': number,
+        'client_name': f'Client {number}',
+        'date_of_registration': datetime(2020, 4, 1),
+        'effective_date_of_cancellation': None,
+        'gstin': make_gstin(number),
+        'taxpayer_type': 'Monthly',
+        'gst_portal_userid': f'user{number}',
+        'eway_bill_userid': None,
+        'client_email_id': f'client{number}@example.com',
+        'mobile_no': f'98000{number:05d}',
+        'row_version': 1,
+        **fields
+    }
+    return client_projection().record(**values)
+
+
+def sheet_row(number, client_code=None, password='secret', **fields):
+    """One template row (IMPORT_COLUMNS order) describing client `number`"""
+    values = {
+        'client_code': client_code,
+        'client_name': f'Client {number}',
+        'date_of_registration': datetime(2020, 4, 1),
+        'effective_date_of_cancellation': None,
+        'gstin': make_gstin(number),
+        'taxpayer_type': 'Monthly',
+        'gst_portal_userid': f'user{number}',
+        'gst_portal_password': password,
+        'eway_bill_userid': None,
+        'eway_bill_password': None,
+        'client_email_id': f'client{number}@example.com',
+        'mobile_no': float(f'98000{number:05d}'),  # numeric Excel cell
+        'email_password': None,
+        **fields
+    }
+    return tuple(values.values())
+
+
+def plan(mode, clients, rows, credentials=None):
+    importer = ClientImport(StubClients(clients, credentials), mode)
+    return importer.plan(list(enumerate(rows, start=2)))
+
+
+def test_insert_mode_skips_clients_already_in_the_book():
+    entries = plan(MODE_INSERT, [stored_client(1)], [
+        sheet_row(1),                       # GSTIN already in the book
+        sheet_row(2),                       # new
+        sheet_row(2, client_name='Again'),  # same new GSTIN twice in the file
+        sheet_row(3, gstin='27AAAAA0003A1Z0'),
+        sheet_row(4, client_email_id=None),
+    ])
+
+    assert [entry['action'] for entry in entries] == [DUPLICATE, INSERT, DUPLICATE, ERROR, ERROR]
+    assert entries[0]['client_code'] == 1
+    assert entries[2]['first_row'] == 3
+    assert 'check character' in entries[3]['error']
+    assert 'client_email_id' in entries[4]['error']
+
+
+def test_upsert_mode_diffs_matched_clients():
+    clients = [stored_client(1), stored_client(2), stored_client(3)]
+    entries = plan(MODE_UPSERT, clients, [
+        sheet_row(1, client_code=1, mobile_no='9111111111'),  # matched by code, one field changed
+        sheet_row(2),                                         # matched by GSTIN, identical
+        sheet_row(5),                                         # new client
+        sheet_row(6, client_code=99),                         # unknown code
+        sheet_row(3, client_code=1),                          # code 1 with client 3's GSTIN
+        sheet_row(2, client_name='Twice'),                    # client 2 again
+    ], credentials={2: {'gst_portal_password': 'secret'}})
+
+    assert [entry['action'] for entry in entries] == [UPDATE, UNCHANGED, INSERT, ERROR, ERROR, DUPLICATE]
+    assert entries[0]['client_code'] == 1
+    assert entries[0]['changes']['mobile_no'] == {'from': '9800000001', 'to': '9111111111'}
+    # Client 1 has no stored password, so supplying one is a (masked) change
+    assert entries[0]['changes']['gst_portal_password'] == {'from': None, 'to': '********'}
+    assert entries[1]['changes'] == {}
+    assert 'not found' in entries[3]['error']
+    assert 'already belongs to client 3' in entries[4]['error']
+    assert entries[5]['first_row'] == 3
+
+    assert ClientImport.summarize(entries) == {INSERT: 1, UPDATE: 1, UNCHANGED: 1, DUPLICATE: 1, ERROR: 2}
+    assert all('_data' not in entry for entry in ClientImport.preview(entries))
+
+
+def _gstin(number):
+    # make_gstin numbers have four digits; each further ten thousand uses another state code
+    return make_gstin(number % 10000, state=('27', '29', '30')[number // 10000])
+
+
+def _seed_book(count):
+    """Clients 1..count as stored_client() describes them, written in one batch"""
+    import app as app_module
+    from database import DatabaseConnection
+
+    vault = app_module.client_model.vault
+    credentials = [vault.insert_statement({'gst_portal_password': 'secret'})(number)
+                   for number in range(1, count + 1)]
+    db = DatabaseConnection()
+    db.connect()
+    cursor = db.connection.cursor()
+    cursor.fast_executemany = True
+    cursor.executemany(f"""
+        INSERT INTO ClientMaster ({', '.join(CLIENT_COLUMNS.values())})
+        VALUES ({', '.join('?' * len(CLIENT_COLUMNS))})
+    """, [tuple(stored_client(number, gstin=_gstin(number))) for number in range(1, count + 1)])
+    cursor.executemany(credentials[0][0], [params for _, params in credentials])
+    db.connection.commit()
+    db.disconnect()
+
+
+def test_reimport_of_20k_rows_with_2_percent_changed(tenant, record_property):
+    """Benchmark: re-import a 20,000-client master sheet in which 400 rows were edited"""
+    import app as app_module
+    from database import DatabaseConnection
+
+    clients = app_module.client_model
+    _seed_book(20000)
+    # The corrected sheet, as exported: every row carries its Client Code, every 50th has a new mobile number
+    edited = set(range(1, 20001, 50))
+    sheet = [sheet_row(number, client_code=number, gstin=_gstin(number),
+                       **({'mobile_no': f'97000{number:05d}'} if number in edited else {}))
+             for number in range(1, 20001)]
+
+    started = time.perf_counter()
+    importer = ClientImport(clients, MODE_UPSERT)
+    entries = importer.plan(list(enumerate(sheet, start=2)))
+    plan_seconds = time.perf_counter() - started
+    assert ClientImport.summarize(entries) == {INSERT: 0, UPDATE: 400, UNCHANGED: 19600, DUPLICATE: 0, ERROR: 0}
+
+    started = time.perf_counter()
+    assert importer.apply(entries) == (0, 400)
+    apply_seconds = time.perf_counter() - started
+
+    # The same kind of edit written one client at a time, as before batched updates
+    single = [(entry['client_code'], dict(entry['_data'], mobile_no=f"96000{entry['client_code']:05d}", row_version=2))
+              for entry in entries if entry['action'] == UPDATE]
+    started = time.perf_counter()
+    assert all(clients.update_client(client_code, data) for client_code, data in single)
+    one_by_one_seconds = time.perf_counter() - started
+
+    record_property('plan_20k_rows_seconds', round(plan_seconds, 3))
+    record_property('apply_400_updates_seconds', round(apply_seconds, 3))
+    record_property('400_single_updates_seconds', round(one_by_one_seconds, 3))
+
+    db = DatabaseConnection()
+    db.connect()
+    logged = db.fetch_one("SELECT COUNT(*) FROM ChangeLog WHERE Entity = 'client' AND Action = 'update'")[0]
+    db.disconnect()
+    assert logged == 800
+    assert apply_seconds < one_by_one_seconds
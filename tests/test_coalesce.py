@@ -0,0 +1,67 @@
+import threading
+
+from coalesce import SingleFlight
+
+
+def _start(flight, key, compute):
+    """Run flight.do(key, compute) on a thread; returns (thread, results list)"""
+    results = []
+    thread = threading.Thread(target=lambda: results.append(flight.do(key, compute)))
+    thread.start()
+    return thread, results
+
+
+def test_result_computed_before_invalidation_is_not_cached():
+    flight = SingleFlight(ttl=60)
+    started, release = threading.Event(), threading.Event()
+
+    def stale():
+        started.set()
+        release.wait()
+        return 'before save'
+
+    thread, results = _start(flight, ('firm', 'Monthly', 'Apr'), stale)
+    started.wait()
+    flight.invalidate('firm')
+    # A caller after the save does not join the computation that read the old data
+    assert flight.do(('firm', 'Monthly', 'Apr'), lambda: 'after save') == 'after save'
+    release.set()
+    thread.join()
+
+    assert results == ['before save']
+    # The stale result did not replace the one cached after the save
+    assert flight.do(('firm', 'Monthly', 'Apr'), lambda: 'recomputed') == 'after save'
+
+
+def test_waiting_callers_share_the_result_of_an_invalidated_computation():
+    flight = SingleFlight(ttl=60)
+    started, release = threading.Event(), threading.Event()
+
+    def compute():
+        started.set()
+        release.wait()
+        return 'counts'
+
+    leader, leader_results = _start(flight, ('firm', 'Monthly', 'Apr'), compute)
+    started.wait()
+    follower, follower_results = _start(flight, ('firm', 'Monthly', 'Apr'), lambda: 'second computation')
+    while flight.metrics()['coalesced'] == 0:
+        pass
+    flight.invalidate('firm')
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert leader_results == follower_results == ['counts']
+
+
+def test_invalidation_is_scoped_to_one_tenant():
+    flight = SingleFlight(ttl=60)
+    flight.do(('firm-a', 'Monthly', 'Apr'), lambda: 'a')
+    flight.do(('firm-b', 'Monthly', 'Apr'), lambda: 'b')
+
+    flight.invalidate('firm-a')
+
+    assert flight.do(('firm-a', 'Monthly', 'Apr'), lambda: 'a recomputed') == 'a recomputed'
+    assert flight.do(('firm-b', 'Monthly', 'Apr'), lambda: 'b recomputed') == 'b'
+    assert flight.metrics()['cached'] == 1
@@ -0,0 +1,36 @@
+import app as app_module
+from records import format_record
+
+
+def _update_password(client, client_code, password):
+    data = format_record(app_module.client_model.get_client_by_code(client_code))
+    data['gst_portal_password'] = password
+    response = client.put(f'/api/clients/{client_code}', json=data)
+    assert response.get_json()['success'], response.get_json()
+
+
+def test_saved_password_replaces_cached_one(client, make_client):
+    client_code = make_client()
+    vault = app_module.client_model.vault
+    assert vault.get_credentials(client_code)['gst_portal_password'] == 'secret1'
+
+    _update_password(client, client_code, 'changed')
+
+    assert vault.get_credentials(client_code)['gst_portal_password'] == 'changed'
+
+
+def test_read_overlapping_a_write_is_not_cached(client, make_client, monkeypatch):
+    client_code = make_client()
+    vault = app_module.client_model.vault
+    fetch_one = vault.db.fetch_one
+
+    def read_then_commit_elsewhere(query, params=None):
+        row = fetch_one(query, params)
+        _update_password(client, client_code, 'changed')  # commits after our read
+        return row
+
+    with monkeypatch.context() as patch:
+        patch.setattr(vault.db, 'fetch_one', read_then_commit_elsewhere)
+        assert vault.get_credentials(client_code)['gst_portal_password'] == 'secret1'
+
+    assert vault.get_credentials(client_code)['gst_portal_password'] == 'changed'
@@ -0,0 +1,69 @@
+import pytest
+
+import app as app_module
+from conftest import make_gstin
+from gstin import gstin_check_character, normalize_gstin, validate_gstin
+
+KNOWN_GOOD = '27AAPFU0939F1ZV'
+
+
+def test_known_good_gstin():
+    assert gstin_check_character(KNOWN_GOOD[:14]) == 'V'
+    assert validate_gstin(KNOWN_GOOD) is None
+    assert validate_gstin(f'  {KNOWN_GOOD.lower()} ') is None
+    assert normalize_gstin(f'  {KNOWN_GOOD.lower()} ') == KNOWN_GOOD
+
+
+@pytest.mark.parametrize('gstin, error', [
+    (None, 'GSTIN (empty) must be 15 characters'),
+    (KNOWN_GOOD[:14], 'must be 15 characters'),
+    (KNOWN_GOOD + 'V', 'must be 15 characters'),
+    ('2AAAPFU0939F1ZV', 'does not follow'),        # state code not numeric
+    ('27AAPF10939F1ZV', 'does not follow'),        # PAN letters
+    ('27AAPFU0939F0ZV', 'does not follow'),        # entity number 0
+    ('27AAPFU0939F1YV', 'does not follow'),        # 14th character not Z
+    ('40AAPFU0939F1Z' + gstin_check_character('40AAPFU0939F1Z'), 'unknown state code 40'),
+    ('27AAPFU0939F1ZW', 'invalid check character'),
+    ('29AAPFU0939F1ZV', 'invalid check character'),  # state code changed, check character not
+])
+def test_invalid_gstins(gstin, error):
+    assert error in validate_gstin(gstin)
+
+
+def _client_data(number, **fields):
+    return {
+        'client_name': f'Client {number}',
+        'date_of_registration': '2020-04-01',
+        'gstin': make_gstin(number),
+        'taxpayer_type': 'Monthly',
+        'gst_portal_userid': f'user{number}',
+        'gst_portal_password': f'secret{number}',
+        'client_email_id': f'client{number}@example.com',
+        'mobile_no': f'98000{number:05d}',
+        **fields
+    }
+
+
+def test_create_rejects_invalid_and_duplicate_gstins(client, make_client):
+    holder = make_client()
+
+    duplicate = client.post('/api/clients', json=_client_data(7, gstin=f' {make_gstin(1).lower()} ')).get_json()
+    invalid = client.post('/api/clients', json=_client_data(8, gstin='27AAPFU0939F1ZW')).get_json()
+
+    assert duplicate['success'] is False
+    assert duplicate['error'] == f'GSTIN {make_gstin(1)} already belongs to client {holder} (Client 1)'
+    assert invalid['success'] is False and 'invalid check character' in invalid['error']
+    assert len(client.get('/api/clients').get_json()['data']) == 1
+
+
+def test_update_rejects_a_gstin_held_by_another_client(client, make_client):
+    first, second = make_client(), make_client()
+
+    taken = client.put(f'/api/clients/{second}', json=_client_data(2, gstin=make_gstin(1), row_version=1)).get_json()
+    own = client.put(f'/api/clients/{second}', json=_client_data(2, client_name='Renamed', row_version=1)).get_json()
+
+    assert taken['success'] is False
+    assert taken['error'] == f'GSTIN {make_gstin(1)} already belongs to client {first} (Client 1)'
+    assert own['success'] is True
+    stored = app_module.client_model.get_client_by_code(second)
+    assert stored.gstin == make_gstin(2) and stored.client_name == 'Renamed'
@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+
+from database import DatabaseConnection
+from history import StatusHistory
+from periods import get_calendar
+
+FINANCIAL_YEAR = '2025-26'
+APRIL = get_calendar().month_period('Apr', FINANCIAL_YEAR)
+MAY = get_calendar().month_period('May', FINANCIAL_YEAR)
+LAST_YEAR_APRIL = get_calendar().month_period('Apr', '2024-25')
+START = datetime(2025, 5, 1, 10, 0)
+
+
+def _history(client, client_code, return_type='GSTR-1', period=APRIL):
+    response = client.get('/api/return_history', query_string={
+        'client_code': client_code, 'return_type': return_type, 'period': period})
+    assert response.get_json()['success'], response.get_json()
+    return [(row['from_status'], row['to_status']) for row in response.get_json()['data']]
+
+
+def _save(client, client_code, status, row_version=0, **fields):
+    response = client.post('/api/save_return_data', json={
+        'client_code': client_code, 'return_type': 'GSTR-1', 'period': APRIL,
+        'status': status, 'row_version': row_version, **fields})
+    assert response.get_json()['success'], response.get_json()
+    return response.get_json()['row_version']
+
+
+def _record(client_code, *steps, return_type='GSTR-1', period=APRIL):
+    """Status history of one row: (status, days after START) per transition"""
+    history = StatusHistory()
+    statements, previous = [], None
+    for status, days in steps:
+        statements.append(history.transition_statement(
+            client_code, return_type, period, previous, status, START + timedelta(days=days)))
+        previous = status
+    db = DatabaseConnection()
+    db.connect()
+    try:
+        db.execute_transaction(statements)
+    finally:
+        db.disconnect()
+
+
+def test_save_writes_a_transition_only_when_the_status_changes(client, make_client):
+    client_code = make_client()
+    version = _save(client, client_code, 'Saved')
+    version = _save(client, client_code, 'Saved', version, remarks='Invoices checked')
+    _save(client, client_code, 'Filed', version, arn='AA270525000001', date_of_filing='2025-05-09')
+
+    assert _history(client, client_code) == [(None, 'Saved'), ('Saved', 'Filed')]
+
+
+def test_bulk_save_writes_a_transition_per_saved_row(client, make_client):
+    first, second, third = make_client(), make_client(), make_client()
+    version = _save(client, third, 'Saved')
+    response = client.post('/api/save_return_data_bulk', json={
+        'return_type': 'GSTR-1', 'period': APRIL, 'rows': [
+            {'client_code': first, 'status': 'Saved', 'row_version': 0},
+            {'client_code': second, 'status': 'Payment Issued', 'row_version': 0},
+            {'client_code': third, 'status': 'Saved', 'row_version': version},
+        ]})
+    assert response.get_json()['summary']['saved'] == 2
+
+    assert _history(client, first) == [(None, 'Saved')]
+    assert _history(client, second) == [(None, 'Payment Issued')]
+    assert _history(client, third) == [(None, 'Saved')]
+
+
+def test_transition_status_writes_a_transition_per_moved_row(client, make_client):
+    stored, implicit = make_client(), make_client()
+    make_client(taxpayer_type='Quarterly')  # not applicable to GSTR-1
+    _save(client, stored, 'Data Received', remarks='Sales register received')
+
+    response = client.post('/api/return_status_transition', json={
+        'return_type': 'GSTR-1', 'period': APRIL, 'from_status': 'Data Received', 'to_status': 'Saved'})
+    assert response.get_json()['total'] == 2
+
+    assert _history(client, stored) == [(None, 'Data Received'), ('Data Received', 'Saved')]
+    assert _history(client, implicit) == [(None, 'Saved')]
+    assert _history(client, implicit, period=MAY) == []
+
+
+def test_cycle_times_per_return_type(tenant):
+    _record(1, ('Saved', 0), ('Filed', 2))
+    _record(2, ('Data Received', 0), ('Saved', 1), ('Filed', 4))
+    _record(3, ('Saved', 0), ('Submitted', 7), ('Filed', 10))
+    _record(4, ('Saved', 0))  # not filed yet
+    _record(1, ('Saved', 0), ('Filed', 6), return_type='GSTR-3B')
+
+    stats = StatusHistory().cycle_times(financial_year=FINANCIAL_YEAR)
+    assert stats == {
+        'GSTR-1': {'count': 3, 'median_days': 4.0, 'mean_days': 5.3, 'p90_days': 8.8},
+        'GSTR-3B': {'count': 1, 'median_days': 6.0, 'mean_days': 6.0, 'p90_days': 6.0},
+    }
+    assert list(StatusHistory().cycle_times(return_types=['GSTR-3B'])) == ['GSTR-3B']
+
+
+def test_cycle_times_between_statuses_count_skipped_statuses(tenant):
+    _record(1, ('Saved', 0), ('Filed', 2))
+    _record(2, ('Data Received', 0), ('Saved', 1), ('Payment Issued', 2), ('Filed', 4))
+
+    # Row 1 skipped 'Payment Issued', so it reached it when it was filed
+    stats = StatusHistory().cycle_times(from_status='Saved', to_status='Payment Issued')
+    assert stats['GSTR-1']['count'] == 2
+    assert stats['GSTR-1']['median_days'] == 1.5  # 2 days and 1 day
+
+
+def test_cycle_times_filter_by_financial_year(tenant):
+    _record(1, ('Saved', 0), ('Filed', 2))
+    _record(1, ('Saved', 0), ('Filed', 30), period=LAST_YEAR_APRIL)
+
+    assert StatusHistory().cycle_times(financial_year=FINANCIAL_YEAR)['GSTR-1']['count'] == 1
+    assert StatusHistory().cycle_times()['GSTR-1']['count'] == 2
+    assert StatusHistory().cycle_times(financial_year='2023-24') == {}
+
+
+def test_cycle_time_endpoint(client, make_client):
+    _record(make_client(), ('Saved', 0), ('Filed', 3))
+
+    response = client.get('/api/analytics/cycle_time', query_string={'financial_year': FINANCIAL_YEAR})
+    assert response.get_json()['data']['GSTR-1']['median_days'] == 3.0
+
+    response = client.get('/api/analytics/cycle_time', query_string={'from_status': 'Filed', 'to_status': 'Saved'})
+    assert not response.get_json()['success']
+    assert 'does not come after' in response.get_json()['error']
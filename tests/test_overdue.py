@@ -0,0 +1,97 @@
+import calendar
+from collections import namedtuple
+from datetime import date
+
+import pytest
+
+import app as app_module
+from config import Config
+from overdue import late_fee
+from periods import get_calendar
+
+FINANCIAL_YEAR = '2025-26'
+APRIL = get_calendar().month_period('Apr', FINANCIAL_YEAR)
+
+Dates = namedtuple('Dates', 'date_of_registration effective_date_of_cancellation')
+
+
+def _days_around(financial_year):
+    """First, 15th and last day of every month from two months before to three months after a financial year"""
+    start = int(financial_year[:4])
+    days = []
+    for index in range(-2, 15):
+        year, month = start + (index + 3) // 12, (index + 3) % 12 + 1
+        days += [date(year, month, 1), date(year, month, 15),
+                 date(year, month, calendar.monthrange(year, month)[1])]
+    return days
+
+
+@pytest.mark.parametrize('return_type', list(Config.GST_RETURNS))
+def test_applicability_window_agrees_with_is_client_applicable(return_type):
+    model = app_module.gst_return_model.get()
+    periods = get_calendar().periods_in_financial_year(Config.GST_RETURNS[return_type]['frequency'], FINANCIAL_YEAR)
+    for period in periods:
+        registered_by, cancelled_from = get_calendar().applicability_window(return_type, period)
+        # The two conditions are independent, so each date is checked with the other one open
+        for day in _days_around(FINANCIAL_YEAR):
+            registered = Dates(day, None)
+            assert model.is_client_applicable(registered, return_type, period) == (day <= registered_by), \
+                (return_type, period, 'registered', day)
+            cancelled = Dates(date(2017, 7, 1), day)
+            assert model.is_client_applicable(cancelled, return_type, period) == (day >= cancelled_from), \
+                (return_type, period, 'cancelled', day)
+
+
+def test_late_fee():
+    assert late_fee('GSTR-1', 0) == 0
+    assert late_fee('GSTR-1', 3) == 150
+    assert late_fee('GSTR-1', 1000) == 10000   # capped
+    assert late_fee('GSTR-9', 1000) == 200000  # no cap
+    assert late_fee('IFF', 30) == 0
+
+
+def _file(client, client_code, return_type, filed_on):
+    response = client.post('/api/save_return_data', json={
+        'client_code': client_code, 'return_type': return_type, 'period': APRIL, 'status': 'Filed',
+        'arn': f'AA{client_code:04d}', 'date_of_filing': filed_on, 'row_version': 0})
+    assert response.get_json()['success'], response.get_json()
+
+
+def test_overdue_due_soon_and_filed_late(client, make_client):
+    on_time, late, pending = make_client(), make_client(), make_client()
+    make_client(date_of_registration='2025-06-01')     # registered after April
+    make_client(taxpayer_type='Quarterly')             # not liable for GSTR-1
+    make_client(effective_date_of_cancellation='2025-03-31')
+    _file(client, on_time, 'GSTR-1', '2025-05-11')     # on the due date
+    _file(client, late, 'GSTR-1', '2025-05-13')        # two days late
+
+    response = client.get('/api/overdue', query_string={
+        'financial_year': FINANCIAL_YEAR, 'as_of': '2025-05-14', 'within_days': 7}).get_json()
+    assert response['success'], response
+    data = response['data']
+    obligations = {(o['return_type'], o['period']): o for o in data['obligations']}
+
+    assert obligations[('GSTR-1', APRIL)] == {
+        'return_type': 'GSTR-1', 'period': APRIL, 'due_date': '2025-05-11', 'state': 'overdue',
+        'applicable': 3, 'filed': 2, 'pending': 1, 'filed_late': 1, 'days_overdue': 3,
+        'late_fee_accrued': 100, 'late_fee_projected': 150}
+    gstr3b = obligations[('GSTR-3B', APRIL)]
+    assert (gstr3b['state'], gstr3b['pending'], gstr3b['due_date']) == ('due_soon', 3, '2025-05-20')
+    # IFF (due 13 May) falls to the quarterly client, who has not filed it
+    iff = obligations[('IFF', APRIL)]
+    assert (iff['state'], iff['applicable'], iff['late_fee_projected']) == ('overdue', 1, 0)
+    # Nothing due after the horizon is listed
+    assert all(o['due_date'] <= '2025-05-21' for o in data['obligations'])
+    assert data['summary'] == {'overdue': 2, 'due_soon': 3, 'filed_late': 1,
+                               'late_fee_accrued': 100, 'late_fee_projected': 150}
+
+
+def test_overdue_counts_follow_new_filings(client, make_client):
+    client_code = make_client()
+    query = {'financial_year': FINANCIAL_YEAR, 'as_of': '2025-05-14', 'return_type': 'GSTR-1'}
+    before = client.get('/api/overdue', query_string=query).get_json()['data']['obligations'][0]
+    _file(client, client_code, 'GSTR-1', '2025-05-12')
+    after = client.get('/api/overdue', query_string=query).get_json()['data']['obligations'][0]
+
+    assert (before['state'], before['pending']) == ('overdue', 1)
+    assert (after['state'], after['filed_late'], after['late_fee_accrued']) == ('complete', 1, 50)
@@ -0,0 +1,123 @@
+from datetime import date, datetime
+
+import pytest
+
+from config import Config
+from periods import get_calendar
+
+MONTHLY = ('GSTR-1', 'GSTR-3B', 'PMT-06')
+QUARTER_END = ('GSTR-3B (Q)', 'CMP-08')
+ANNUAL = ('GSTR-9', 'GSTR-9C', 'GSTR-4')
+
+
+def _old_boundary_period(day, return_type, is_last):
+    """GSTReturn.calculate_first/last_return_period as models.py had them before the calendar"""
+    quarter_end = day.replace(month=3 if day.month <= 3 else 6 if day.month <= 6 else 9 if day.month <= 9 else 12)
+    if return_type in MONTHLY or (return_type == 'IFF' and not is_last):
+        return day.strftime('%b-%Y')
+    if return_type in QUARTER_END or return_type == 'IFF':
+        return quarter_end.strftime('%b-%Y')
+    if return_type in ANNUAL:
+        start = day.year if day.month >= 4 else day.year - 1
+        return f"{start}-{str(start + 1)[-2:]}"
+    return None
+
+
+def _old_compare(period1, period2):
+    """GSTReturn.compare_periods as models.py had it, for periods it could parse"""
+    if '-' in period1 and len(period1.split('-')[1]) == 2:
+        first, second = int(period1.split('-')[0]), int(period2.split('-')[0])
+    else:
+        first, second = datetime.strptime(period1, '%b-%Y'), datetime.strptime(period2, '%b-%Y')
+    return (first > second) - (first < second)
+
+
+DAYS = [date(year, month, day) for year in (2024, 2025, 2026) for month in range(1, 13) for day in (1, 28)]
+
+
+@pytest.mark.parametrize('return_type', list(Config.GST_RETURNS))
+def test_boundary_periods_match_the_old_logic(return_type):
+    calendar = get_calendar()
+    for day in DAYS:
+        assert calendar.first_return_period(day, return_type) == _old_boundary_period(day, return_type, False), day
+        assert calendar.last_return_period(day, return_type) == _old_boundary_period(day, return_type, True), day
+
+
+@pytest.mark.parametrize('return_type, first, last', [
+    ('GSTR-1', 'Feb-2025', 'Feb-2025'),
+    ('IFF', 'Feb-2025', 'Mar-2025'),
+    ('PMT-06', 'Feb-2025', 'Feb-2025'),
+    ('GSTR-3B (Q)', 'Mar-2025', 'Mar-2025'),
+    ('CMP-08', 'Mar-2025', 'Mar-2025'),
+    ('GSTR-9', '2024-25', '2024-25'),
+    ('GSTR-4', '2024-25', '2024-25'),
+])
+def test_boundary_periods(return_type, first, last):
+    calendar = get_calendar()
+    assert calendar.first_return_period('2025-02-03', return_type) == first
+    assert calendar.last_return_period(datetime(2025, 2, 3, 9, 30), return_type) == last
+
+
+def test_boundary_periods_without_a_date_or_for_unknown_return_types():
+    calendar = get_calendar()
+    assert calendar.first_return_period(None, 'GSTR-1') is None
+    assert calendar.last_return_period('', 'GSTR-1') is None
+    assert calendar.first_return_period(date(2025, 2, 3), 'GSTR-2') is None
+
+
+@pytest.mark.parametrize('period1, period2', [
+    ('Apr-2025', 'Apr-2025'),
+    ('Mar-2025', 'Apr-2025'),
+    ('Jan-2026', 'Dec-2025'),
+    ('Apr-2040', 'Mar-2040'),  # outside the precomputed years
+    ('2025-26', '2024-25'),
+    ('2025-26', '2025-26'),
+])
+def test_compare_matches_the_old_logic(period1, period2):
+    assert get_calendar().compare(period1, period2) == _old_compare(period1, period2)
+    assert get_calendar().compare(period2, period1) == _old_compare(period2, period1)
+
+
+def test_compare_of_empty_and_unknown_periods():
+    calendar = get_calendar()
+    assert calendar.compare('', 'Apr-2025') == 0
+    assert calendar.compare('Apr-2025', None) == 0
+    with pytest.raises(ValueError, match='Unknown period: April 2025'):
+        calendar.compare('April 2025', 'Apr-2025')
+
+
+@pytest.mark.parametrize('return_type, period, due', [
+    ('GSTR-1', 'Apr-2025', date(2025, 5, 11)),
+    ('GSTR-1', 'Dec-2025', date(2026, 1, 11)),
+    ('GSTR-3B', 'Mar-2026', date(2026, 4, 20)),
+    ('IFF', 'Jan-2026', date(2026, 2, 13)),
+    ('PMT-06', 'Feb-2026', date(2026, 3, 25)),
+    ('GSTR-3B (Q)', 'Jun-2025', date(2025, 7, 22)),
+    ('CMP-08', 'Dec-2025', date(2026, 1, 18)),
+    ('GSTR-9', '2025-26', date(2026, 12, 31)),
+    ('GSTR-9C', '2024-25', date(2025, 12, 31)),
+    ('GSTR-4', '2025-26', date(2026, 6, 30)),
+    ('GSTR-1', 'Apr-2040', date(2040, 5, 11)),  # outside the precomputed years
+])
+def test_due_dates(return_type, period, due):
+    assert get_calendar().due_date(return_type, period) == due
+
+
+def test_no_due_date_for_unknown_return_types_or_periods():
+    calendar = get_calendar()
+    assert calendar.due_date('GSTR-2', 'Apr-2025') is None
+    assert calendar.due_date('GSTR-1', 'April 2025') is None
+
+
+@pytest.mark.parametrize('frequency, month, quarter, period', [
+    ('Monthly', 'Apr', None, 'Apr-2025'),
+    ('Monthly', 'December', None, 'Dec-2025'),
+    ('Monthly', 'January', None, 'Jan-2026'),
+    ('Monthly', 'Mar', None, 'Mar-2026'),
+    ('Quarterly', None, 'Apr-Jun', 'Jun-2025'),
+    ('Quarterly', None, 'Jan-Mar', 'Mar-2026'),
+    ('Annually', None, None, '2025-26'),
+    ('Weekly', 'Apr', None, None),
+])
+def test_period_for(frequency, month, quarter, period):
+    assert get_calendar().period_for(frequency, '2025-26', month=month, quarter=quarter) == period
@@ -0,0 +1,106 @@
+import os
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+import app as app_module
+from config import Config
+from profiling import ProfileStore, StackSampler
+
+
+def _spin(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _sampler(samples, duration=0.0423):
+    return SimpleNamespace(samples=Counter(samples), duration=duration)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """The app's profile store, in a folder of its own"""
+    store = ProfileStore(folder=str(tmp_path / 'profiles'))
+    monkeypatch.setattr(app_module, 'profile_store', store)
+    return store
+
+
+def test_sampler_collects_collapsed_stacks_of_its_thread():
+    sampler = StackSampler(interval=0.001).start()
+    _spin(0.1)
+    samples = sampler.stop()
+
+    assert sampler.duration >= 0.1
+    assert sum(samples.values()) > 0
+    stack = max(samples, key=samples.get)
+    frames = stack.split(';')
+    assert frames[-1].startswith('_spin (test_profiling.py:')
+    assert frames[-2].startswith('test_sampler_collects_collapsed_stacks_of_its_thread (')
+
+
+def test_store_writes_and_lists_profiles(store):
+    name = store.save('save_return_data', 'POST', _sampler({'a (x.py:1);b (x.py:5)': 3, 'a (x.py:1)': 1}))
+
+    with open(store.path_for(name)) as profile_file:
+        assert profile_file.read() == 'a (x.py:1);b (x.py:5) 3\na (x.py:1) 1\n'
+    [profile] = store.list_profiles()
+    assert profile['file'] == name
+    assert profile['method'] == 'POST'
+    assert profile['endpoint'] == 'save-return-data'  # '_' separates the parts of the name
+    assert profile['duration_ms'] == 42
+    assert profile['size'] == os.path.getsize(store.path_for(name))
+
+
+def test_store_keeps_the_newest_profiles(tmp_path):
+    store = ProfileStore(folder=str(tmp_path), keep=2)
+    names = [store.save(f'endpoint{number}', 'GET', _sampler({'a (x.py:1)': 1})) for number in range(3)]
+
+    assert [profile['file'] for profile in store.list_profiles()] == names[:0:-1]
+    assert store.path_for(names[0]) is None
+
+
+@pytest.mark.parametrize('name', [
+    'missing.collapsed',
+    '../profiles/x.collapsed',
+    'notes.txt',
+])
+def test_path_for_rejects_names_that_are_not_stored_profiles(tmp_path, name):
+    store = ProfileStore(folder=str(tmp_path))
+    (tmp_path / 'notes.txt').write_text('not a profile')
+
+    assert store.path_for(name) is None
+
+
+def test_profiled_request_is_listed_and_downloadable(client, store, make_client):
+    make_client()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(Config, 'PROFILE_ON_REQUEST', True)
+        response = client.get('/api/clients', headers={'X-Profile': '1'})
+    name = response.headers['X-Profile-File']
+    assert name.endswith('.collapsed')
+
+    [profile] = client.get('/api/profiles').get_json()['data']
+    assert profile['file'] == name and profile['method'] == 'GET'
+    download = client.get(f'/api/profiles/{name}')
+    assert download.status_code == 200
+    with open(store.path_for(name), 'rb') as profile_file:
+        assert download.data == profile_file.read()
+
+
+def test_profile_requests_are_ignored_unless_enabled(client, store):
+    response = client.get('/api/clients?profile=1', headers={'X-Profile': '1'})
+
+    assert 'X-Profile-File' not in response.headers
+    assert store.list_profiles() == []
+
+
+@pytest.mark.parametrize('name', [
+    'missing.collapsed',
+    '..%2Fconfig.py',
+    '..%2F..%2Fprofiles%2Fx.collapsed',
+])
+def test_unknown_profile_downloads_are_not_found(client, store, name):
+    assert client.get(f'/api/profiles/{name}').status_code == 404
@@ -0,0 +1,22 @@
+import app as app_module
+from periods import get_calendar
+
+PERIOD = get_calendar().month_period('Apr', '2025-26')
+
+
+def test_return_clients_joins_stored_rows_in_one_read(client, make_client, monkeypatch):
+    saved, unsaved = make_client(), make_client()
+    client.post('/api/save_return_data', json={
+        'client_code': saved, 'return_type': 'GSTR-1', 'period': PERIOD,
+        'status': 'Submitted', 'remarks': 'done', 'row_version': 0})
+
+    def per_row_read(*args, **kwargs):
+        raise AssertionError('return rows must be read once per period, not per client')
+
+    monkeypatch.setattr(app_module.gst_return_model.get(), 'get_return_data', per_row_read)
+    response = client.post('/api/return_clients', json={'return_type': 'GSTR-1', 'period': PERIOD})
+
+    rows = {row['client_code']: row for row in response.get_json()['data']}
+    assert rows[saved]['status'] == 'Submitted' and rows[saved]['remarks'] == 'done'
+    assert rows[saved]['row_version'] == 1
+    assert rows[unsaved]['status'] == 'Data Received' and rows[unsaved]['row_version'] == 0
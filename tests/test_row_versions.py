@@ -0,0 +1,146 @@
+import threading
+
+import pytest
+
+import app as app_module
+from periods import get_calendar
+
+RETURN_TYPE = 'GSTR-1'
+PERIOD = get_calendar().month_period('Apr', '2025-26')
+
+
+def _row(client_code, row_version, **fields):
+    return {'client_code': client_code, 'return_type': RETURN_TYPE, 'period': PERIOD,
+            'status': 'Saved', 'row_version': row_version, **fields}
+
+
+def _concurrently(tenant, requests):
+    """Send (path, body) requests at the same moment, one thread each; returns the responses in order"""
+    barrier = threading.Barrier(len(requests))
+    responses = [None] * len(requests)
+
+    def send(index, path, body):
+        with app_module.app.test_client() as writer:
+            writer.environ_base['HTTP_X_TENANT_ID'] = tenant
+            barrier.wait()
+            responses[index] = writer.post(path, json=body)
+
+    threads = [threading.Thread(target=send, args=(index, path, body))
+               for index, (path, body) in enumerate(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+@pytest.mark.parametrize('stored', [False, True], ids=['first-insert', 'update'])
+def test_second_writer_from_same_version_gets_conflict(client, tenant, make_client, stored):
+    client_code = make_client()
+    version = 0
+    if stored:
+        version = client.post('/api/save_return_data', json=_row(client_code, 0)).get_json()['row_version']
+
+    responses = _concurrently(tenant, [
+        ('/api/save_return_data', _row(client_code, version, status='Submitted', remarks='writer A')),
+        ('/api/save_return_data', _row(client_code, version, status='Payment Issued', remarks='writer B')),
+    ])
+
+    assert sorted(response.status_code for response in responses) == [200, 409]
+    winner = next(response for response in responses if response.status_code == 200).get_json()
+    loser = next(response for response in responses if response.status_code == 409).get_json()
+    assert winner['success'] and winner['row_version'] == version + 1
+    assert loser['success'] is False and loser['conflict'] is True
+    assert loser['current']['row_version'] == version + 1
+
+    stored_row = app_module.gst_return_model.get_return_data(client_code, RETURN_TYPE, PERIOD)
+    assert stored_row.row_version == version + 1
+    assert stored_row.remarks == loser['current']['remarks']
+
+
+def test_writers_on_different_rows_do_not_conflict(tenant, make_client):
+    first, second = make_client(), make_client()
+
+    responses = _concurrently(tenant, [
+        ('/api/save_return_data', _row(first, 0, remarks='writer A')),
+        ('/api/save_return_data', _row(second, 0, remarks='writer B')),
+    ])
+
+    assert [response.status_code for response in responses] == [200, 200]
+    assert all(response.get_json()['row_version'] == 1 for response in responses)
+
+
+def _bulk(*rows):
+    return {'return_type': RETURN_TYPE, 'period': PERIOD,
+            'rows': [{key: value for key, value in row.items() if key not in ('return_type', 'period')}
+                     for row in rows]}
+
+
+def test_bulk_save_from_stale_version_reports_conflict(client, make_client):
+    first, second = make_client(), make_client()
+    client.post('/api/save_return_data_bulk', json=_bulk(_row(first, 0), _row(second, 0)))
+
+    writer_a = client.post('/api/save_return_data_bulk', json=_bulk(_row(first, 1, status='Submitted')))
+    writer_b = client.post('/api/save_return_data_bulk', json=_bulk(
+        _row(first, 1, status='Payment Issued'), _row(second, 1, status='Submitted')))
+
+    assert writer_a.get_json()['results'][0] == {'client_code': first, 'result': 'saved', 'row_version': 2}
+    results = {result['client_code']: result for result in writer_b.get_json()['results']}
+    assert results[first]['result'] == 'conflict'
+    assert results[first]['current']['status'] == 'Submitted'
+    assert results[first]['current']['row_version'] == 2
+    # The conflicting row does not undo the rest of the batch
+    assert results[second] == {'client_code': second, 'result': 'saved', 'row_version': 2}
+
+
+def test_bulk_writers_on_different_rows_do_not_conflict(tenant, make_client):
+    first, second = make_client(), make_client()
+
+    responses = _concurrently(tenant, [
+        ('/api/save_return_data_bulk', _bulk(_row(first, 0, remarks='writer A'))),
+        ('/api/save_return_data_bulk', _bulk(_row(second, 0, remarks='writer B'))),
+    ])
+
+    for response in responses:
+        assert response.get_json()['summary'] == {'saved': 1, 'unchanged': 0, 'conflict': 0, 'error': 0}
+
+
+def test_writer_that_read_before_another_write_gets_conflict(client, make_client):
+    from models import RowVersionConflict
+
+    client_code = make_client()
+    client.post('/api/save_return_data', json=_row(client_code, 0))
+    stale = app_module.gst_return_model.get_return_data(client_code, RETURN_TYPE, PERIOD)
+
+    # Writer A commits between writer B's read and B's guarded write
+    assert client.post('/api/save_return_data', json=_row(client_code, 1, status='Submitted')).status_code == 200
+    with pytest.raises(RowVersionConflict) as conflict:
+        app_module.gst_return_model.save_return_data(_row(client_code, 1, status='Payment Issued'), existing=stale)
+
+    assert conflict.value.current.row_version == 2
+    assert conflict.value.current.status == 'Submitted'
+
+
+def test_status_transition_changes_carry_each_rows_new_version(client, make_client):
+    twice, once, unstored = make_client(), make_client(), make_client()
+    client.post('/api/save_return_data', json=_row(twice, 0, status='Data Received', remarks='first'))
+    client.post('/api/save_return_data', json=_row(twice, 1, status='Data Received', remarks='second'))
+    client.post('/api/save_return_data', json=_row(once, 0, status='Data Received', remarks='first'))
+    since = client.get('/api/changes').get_json()['latest']
+
+    response = client.post('/api/return_status_transition', json={
+        'return_type': RETURN_TYPE, 'period': PERIOD, 'from_status': 'Data Received', 'to_status': 'Saved'})
+    assert response.get_json()['total'] == 3
+
+    changes = client.get(f'/api/changes?since={since}').get_json()['data']
+    payloads = {change['client_code']: change['payload'] for change in changes}
+    assert payloads == {twice: {'status': 'Saved', 'row_version': 3},
+                        once: {'status': 'Saved', 'row_version': 2},
+                        unstored: {'status': 'Saved', 'row_version': 1}}
+    for client_code, payload in payloads.items():
+        stored_row = app_module.gst_return_model.get_return_data(client_code, RETURN_TYPE, PERIOD)
+        assert stored_row.row_version == payload['row_version']
+
+    # A grid that applied the change saves from it without a conflict
+    saved = client.post('/api/save_return_data', json=_row(twice, payloads[twice]['row_version'], status='Submitted'))
+    assert saved.status_code == 200
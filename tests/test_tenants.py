@@ -0,0 +1,137 @@
+import statistics
+import threading
+import time
+
+import app as app_module
+from conftest import make_gstin
+from database import PoolTimeout, get_pool
+from periods import get_calendar
+from tenants import use_tenant
+
+RETURN_TYPE = 'GSTR-1'
+PERIOD = get_calendar().month_period('Apr', '2025-26')
+DASHBOARD = {'frequency': 'Monthly', 'financial_year': '2025-26', 'month': 'Apr'}
+
+
+def _tenant_client(tenant, number=0):
+    """Test client of one tenant; each gets its own address, so rate limits do not mix"""
+    test_client = app_module.app.test_client()
+    test_client.environ_base.update({'HTTP_X_TENANT_ID': tenant, 'REMOTE_ADDR': f'10.0.{number // 250}.{number % 250 + 1}'})
+    return test_client
+
+
+def _seed(tenant, count):
+    test_client = _tenant_client(tenant)
+    for number in range(1, count + 1):
+        response = test_client.post('/api/clients', json={
+            'client_name': f'{tenant} client {number}',
+            'date_of_registration': '2020-04-01',
+            'gstin': make_gstin(number),
+            'taxpayer_type': 'Monthly',
+            'gst_portal_userid': f'user{number}',
+            'gst_portal_password': f'secret{number}',
+            'client_email_id': f'client{number}@example.com',
+            'mobile_no': f'98000{number:05d}'
+        })
+        assert response.get_json()['success'], response.get_json()
+
+
+def test_models_caches_and_pools_are_per_tenant(make_tenant):
+    first, second = make_tenant(), make_tenant()
+    _seed(first, 2)
+    _seed(second, 3)
+
+    assert app_module.overdue_tracker.get(first) is not app_module.overdue_tracker.get(second)
+    assert get_pool(first) is not get_pool(second)
+    for tenant, count in ((first, 2), (second, 3)):
+        with use_tenant(tenant):
+            assert app_module.overdue_tracker.get_counts(RETURN_TYPE, PERIOD)['total_clients'] == count
+        dashboard = _tenant_client(tenant).post('/api/return_dashboard', json=DASHBOARD).get_json()
+        assert dashboard['data'][RETURN_TYPE]['total_clients'] == count
+
+    # A save in one firm leaves the other firm's cached dashboard in place
+    computed = app_module.dashboard_flight.metrics()['computed']
+    _tenant_client(first).post('/api/save_return_data', json={
+        'client_code': 1, 'return_type': RETURN_TYPE, 'period': PERIOD, 'status': 'Saved', 'row_version': 0})
+    _tenant_client(second).post('/api/return_dashboard', json=DASHBOARD)
+    assert app_module.dashboard_flight.metrics()['computed'] == computed
+
+
+def test_busy_tenant_pool_does_not_starve_another_tenant(make_tenant, monkeypatch):
+    busy, other = make_tenant(), make_tenant()
+    _seed(busy, 1)
+    _seed(other, 1)
+    pool = get_pool(busy)
+    monkeypatch.setattr(pool, 'timeout', 0.2)
+
+    # A long import on the busy firm holds every one of its connections
+    held = [pool.acquire() for _ in range(pool.size)]
+    try:
+        started = time.perf_counter()
+        response = _tenant_client(other).post('/api/return_clients', json={'return_type': RETURN_TYPE, 'period': PERIOD})
+        elapsed = time.perf_counter() - started
+        assert response.get_json()['success']
+        assert len(response.get_json()['data']) == 1
+        assert elapsed < pool.timeout
+        try:
+            pool.acquire()
+            assert False, 'the busy pool should have no connection free'
+        except PoolTimeout:
+            pass
+    finally:
+        for connection in held:
+            pool.release(connection)
+    assert get_pool(other).stats()['in_use'] == 0
+
+
+def test_twenty_tenants_concurrently(make_tenant, record_property):
+    """Benchmark: 20 firms loading their return grids at once, against each firm alone"""
+    tenants = [make_tenant() for _ in range(20)]
+    for number, tenant in enumerate(tenants):
+        _seed(tenant, 10 + number)
+    requests_per_tenant = 20
+    body = {'return_type': RETURN_TYPE, 'period': PERIOD}
+
+    def run(number, tenant, latencies):
+        test_client = _tenant_client(tenant, number)
+        for _ in range(requests_per_tenant):
+            started = time.perf_counter()
+            response = test_client.post('/api/return_clients', json=body).get_json()
+            latencies.append(time.perf_counter() - started)
+            # Every firm sees exactly its own clients
+            assert len(response['data']) == 10 + number
+            assert all(row['client_name'].startswith(f'{tenant} ') for row in response['data'])
+
+    # Baseline: the same work one firm after another
+    started = time.perf_counter()
+    for number, tenant in enumerate(tenants):
+        run(number, tenant, [])
+    sequential = time.perf_counter() - started
+
+    latencies = {tenant: [] for tenant in tenants}
+    errors = []
+
+    def worker(number, tenant):
+        try:
+            run(number, tenant, latencies[tenant])
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(number, tenant)) for number, tenant in enumerate(tenants)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    concurrent = time.perf_counter() - started
+
+    assert not errors, errors
+    every = sorted(latency for tenant_latencies in latencies.values() for latency in tenant_latencies)
+    p95 = every[int(len(every) * 0.95)]
+    record_property('sequential_seconds', round(sequential, 3))
+    record_property('concurrent_seconds', round(concurrent, 3))
+    record_property('p95_latency_ms', round(p95 * 1000, 1))
+    record_property('median_latency_ms', round(statistics.median(every) * 1000, 1))
+    # Firms only share the interpreter, not a connection pool or a database lock
+    assert concurrent < sequential * 2
+    assert all(get_pool(tenant).stats()['in_use'] == 0 for tenant in tenants)
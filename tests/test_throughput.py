@@ -0,0 +1,133 @@
+from datetime import date
+
+import app as app_module
+from backup import BackupManager
+from database import DatabaseConnection
+from overdue import current_financial_year
+from periods import get_calendar
+from throughput import ThroughputRollups
+
+FINANCIAL_YEAR = '2025-26'
+APRIL = get_calendar().month_period('Apr', FINANCIAL_YEAR)
+MAY = get_calendar().month_period('May', FINANCIAL_YEAR)
+
+
+def _save(client, client_code, period, row_version=0, status='Saved', filed_on=None, **fields):
+    if filed_on:
+        fields.update({'arn': f'AA{client_code:04d}', 'date_of_filing': filed_on})
+    response = client.post('/api/save_return_data', json={
+        'client_code': client_code, 'return_type': 'GSTR-1', 'period': period,
+        'status': status, 'row_version': row_version, **fields})
+    assert response.get_json()['success'], response.get_json()
+
+
+def _obligation(period):
+    data = app_module.throughput_rollups.get_throughput(FINANCIAL_YEAR, return_types=['GSTR-1'], period=period)
+    return data['obligations'][0]
+
+
+def _rollup_rows():
+    db = DatabaseConnection()
+    db.connect()
+    try:
+        return {table: sorted(tuple(row) for row in db.fetch_all(f"SELECT * FROM {table}"))
+                for table in ('FilingRollup', 'StatusRollup')}
+    finally:
+        db.disconnect()
+
+
+def test_refresh_recomputes_only_the_groups_that_changed(client, make_client):
+    first, second = make_client(), make_client()
+    _save(client, first, APRIL)
+    _save(client, second, MAY)
+    rollups = app_module.throughput_rollups.get()
+
+    assert rollups.refresh() == 2  # first refresh rebuilds every group
+    assert rollups.refresh() == 0
+    _save(client, second, APRIL, status='Filed', filed_on='2025-05-09')
+    assert rollups.refresh() == 1
+
+    april = _obligation(APRIL)
+    assert april['filed'] == 1
+    assert april['status_distribution']['Saved'] == 1
+    assert april['status_distribution']['Filed'] == 1
+    assert _obligation(MAY)['status_distribution']['Saved'] == 1
+
+
+def test_client_delete_rebuilds_every_group(client, make_client):
+    first, second = make_client(), make_client()
+    _save(client, first, APRIL, status='Filed', filed_on='2025-05-09')
+    _save(client, second, MAY)
+    rollups = app_module.throughput_rollups.get()
+    rollups.refresh()
+
+    assert client.delete(f'/api/clients/{first}').get_json()['success']
+    assert rollups.refresh() == 2
+
+    april = _obligation(APRIL)
+    assert april['applicable'] == 1 and april['filed'] == 0
+    assert april['status_distribution']['Data Received'] == 1
+
+
+def test_restore_rebuilds_the_rollups(client, make_client):
+    first, second = make_client(), make_client()
+    _save(client, first, APRIL, status='Filed', filed_on='2025-05-09')
+    manager = BackupManager()
+    manager.snapshot()
+    rollups = app_module.throughput_rollups.get()
+    rollups.refresh()
+    expected = _rollup_rows()
+
+    # Saved after the backup, so the restore takes it away again
+    _save(client, second, APRIL, status='Filed', filed_on='2025-05-10')
+    rollups.refresh()
+    assert _rollup_rows() != expected
+    manager.restore()
+    rollups.refresh()
+
+    assert _rollup_rows() == expected
+
+
+def test_burndown_towards_the_due_date(client, make_client):
+    on_time, late, pending = make_client(), make_client(), make_client()
+    _save(client, on_time, APRIL, status='Filed', filed_on='2025-05-05')
+    _save(client, late, APRIL, status='Filed', filed_on='2025-05-15')
+    _save(client, pending, APRIL, status='Submitted')
+
+    april = _obligation(APRIL)
+
+    assert april['due_date'] == '2025-05-11'
+    assert april['applicable'] == 3 and april['filed'] == 2 and april['remaining'] == 1
+    assert april['burndown'] == [{'date': '2025-05-05', 'filed': 1, 'remaining': 2},
+                                 {'date': '2025-05-15', 'filed': 1, 'remaining': 1}]
+    assert april['remaining_at_due'] == 2
+    assert april['status_distribution'] == {'Data Received': 0, 'Saved': 0, 'Payment Issued': 0,
+                                            'Submitted': 1, 'Filed': 2}
+
+
+def test_remaining_at_due():
+    due = date(2025, 5, 11)
+    # Filed on the due date still counts as on time; an ARN without a date counts before any dated filing
+    filings = [(date(2025, 5, 11), 2), (date(2025, 5, 12), 3), (None, 1)]
+    obligation = ThroughputRollups._obligation('GSTR-1', APRIL, due, 10, filings, {})
+    assert obligation['remaining_at_due'] == 7
+    assert obligation['remaining'] == 4
+
+    # Nothing filed after the due date: what is left at the end was left at the due date
+    obligation = ThroughputRollups._obligation('GSTR-1', APRIL, due, 10, [(date(2025, 5, 1), 4)], {})
+    assert obligation['remaining_at_due'] == obligation['remaining'] == 6
+    # Over-filing (clients no longer applicable) never shows a negative backlog
+    obligation = ThroughputRollups._obligation('GSTR-1', APRIL, due, 1, [(date(2025, 5, 20), 3)], {})
+    assert obligation['remaining_at_due'] == 1 and obligation['remaining'] == 0
+
+
+def test_status_activity_per_day(client, make_client):
+    client_code = make_client()
+    _save(client, client_code, APRIL, status='Saved')
+    _save(client, client_code, APRIL, row_version=1, status='Submitted')
+    _save(client, make_client(), APRIL, status='Submitted')
+
+    # Transitions are counted on the day they happen, in that day's financial year
+    activity = app_module.throughput_rollups.get_throughput(current_financial_year())['activity']
+
+    assert activity == [{'date': date.today().isoformat(), 'transitions': {'Saved': 1, 'Submitted': 2}}]
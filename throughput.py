@@ -0,0 +1,318 @@
+import threading
+from datetime import date, datetime
+import pyodbc
+from database import DatabaseConnection
+from config import Config
+from changefeed import ChangeCursor, ENTITY_RETURN
+from periods import get_calendar, period_from_ordinal
+from history import STATUS_CODES, financial_year_ordinals
+from archive import get_archive, financial_year_periods
+
+# RollupState rows: how far each rollup has consumed its source
+RETURNS_POSITION = 'returns'     # ChangeLog.ChangeSeq
+ACTIVITY_POSITION = 'activity'   # ReturnStatusHistory.HistoryID
+
+# Client changes that add or remove return rows across every period
+_REBUILD_ACTIONS = ('delete', 'restore')
+
+# Periods per IN (...) list
+_CHUNK = 100
+
+
+def _chunks(items, size=_CHUNK):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _format_date(value):
+    return value.strftime('%Y-%m-%d') if value else None
+
+
+class ThroughputRollups:
+    """Filing velocity, backlog burn-down and status mix served from rollup tables
+
+    FilingRollup (filed returns per return type, period and filing date) and
+    StatusRollup (stored rows per status) are recomputed only for the
+    (return type, period) groups the change feed touched since the last
+    refresh. ActivityRollup adds up status transitions per day from the
+    append-only status history. Reads touch only these small tables.
+    """
+
+    def __init__(self, feed, overdue_tracker):
+        self.db = DatabaseConnection()
+        self.feed = feed
+        self.overdue = overdue_tracker
+        self._lock = threading.Lock()
+
+    # Refresh ------------------------------------------------------------
+
+    def refresh(self):
+        """Bring every rollup up to date; returns the number of groups recomputed"""
+        with self._lock:
+            positions = self._positions()
+            recomputed = self._refresh_returns(positions.get(RETURNS_POSITION))
+            self._refresh_activity(positions.get(ACTIVITY_POSITION))
+        return recomputed
+
+    def _positions(self):
+        self.db.connect()
+        rows = self.db.fetch_all("SELECT RollupName, LastPosition FROM RollupState")
+        self.db.disconnect()
+        return {row[0]: row[1] for row in rows}
+
+    @staticmethod
+    def _save_position(cursor, name, position, is_new):
+        if is_new:
+            cursor.execute("INSERT INTO RollupState (RollupName, LastPosition) VALUES (?, ?)", (name, position))
+        else:
+            cursor.execute("UPDATE RollupState SET LastPosition = ? WHERE RollupName = ?", (position, name))
+
+    def _changed_groups(self, position):
+        """(latest seq, {(return_type, period)} changed since position, or None for everything)"""
+        if position is None:
+            return self.feed.safe_seq(), None
+
+        # The position stays below changes that may still commit, so their groups are read again
+        cursor = ChangeCursor(self.feed, position=position)
+        groups = set()
+        for change in cursor.poll():
+            if change['entity'] == ENTITY_RETURN:
+                groups.add((change['return_type'], change['period']))
+            elif change['action'] in _REBUILD_ACTIONS:
+                return cursor.position, None
+        return cursor.position, groups
+
+    def _refresh_returns(self, position):
+        # The position is read before the aggregates: a save landing in
+        # between is recomputed again on the next refresh.
+        latest, groups = self._changed_groups(position)
+        if groups is not None and not groups and latest == position:
+            return 0
+
+        calendar = get_calendar()
+        archive = get_archive()
+        self.db.connect()
+        try:
+            cursor = self.db.connection.cursor()
+            if groups is None:
+                groups = self._all_groups(cursor)
+
+            by_type = {}
+            for return_type, period in groups:
+                if calendar.ordinal(period) is not None:
+                    by_type.setdefault(return_type, set()).add(period)
+
+            filed_rows, status_rows = [], []
+            for return_type, periods in by_type.items():
+                live = [p for p in periods if not archive.is_archived(p)]
+                archived = [p for p in periods if archive.is_archived(p)]
+                filed = archive.filing_counts([return_type], archived) if archived else []
+                statuses = archive.status_counts([return_type], archived) if archived else []
+                for chunk in _chunks(live):
+                    placeholders = ', '.join('?' * len(chunk))
+                    filed += cursor.execute(f"""
+                        SELECT ReturnType, Period, DateOfFiling, COUNT(*)
+                        FROM GSTReturnData
+                        WHERE ReturnType = ? AND Period IN ({placeholders})
+                          AND (ARN IS NOT NULL OR DateOfFiling IS NOT NULL)
+                        GROUP BY ReturnType, Period, DateOfFiling
+                    """, [return_type] + chunk).fetchall()
+                    statuses += cursor.execute(f"""
+                        SELECT ReturnType, Period, Status, COUNT(*)
+                        FROM GSTReturnData
+                        WHERE ReturnType = ? AND Period IN ({placeholders})
+                        GROUP BY ReturnType, Period, Status
+                    """, [return_type] + chunk).fetchall()
+
+                filed_rows += [(rt, calendar.ordinal(period), _as_date(filed_on), count)
+                               for rt, period, filed_on, count in filed]
+                status_rows += [(rt, calendar.ordinal(period), STATUS_CODES[status], count)
+                                for rt, period, status, count in statuses if status in STATUS_CODES]
+
+            for return_type, periods in by_type.items():
+                for chunk in _chunks(calendar.ordinal(p) for p in periods):
+                    placeholders = ', '.join('?' * len(chunk))
+                    for table in ('FilingRollup', 'StatusRollup'):
+                        cursor.execute(f"DELETE FROM {table} WHERE ReturnType = ? AND PeriodOrdinal IN ({placeholders})",
+                                       [return_type] + chunk)
+            cursor.fast_executemany = True
+            if filed_rows:
+                cursor.executemany("""
+                    INSERT INTO FilingRollup (ReturnType, PeriodOrdinal, FiledOn, FiledCount)
+                    VALUES (?, ?, ?, ?)
+                """, filed_rows)
+            if status_rows:
+                cursor.executemany("""
+                    INSERT INTO StatusRollup (ReturnType, PeriodOrdinal, StatusCode, ReturnCount)
+                    VALUES (?, ?, ?, ?)
+                """, status_rows)
+            self._save_position(cursor, RETURNS_POSITION, latest, position is None)
+            self.db.connection.commit()
+            cursor.close()
+            return sum(len(periods) for periods in by_type.values())
+        except pyodbc.Error as e:
+            print(f"Rollup refresh error: {e}")
+            try:
+                self.db.connection.rollback()
+            except:
+                pass
+            return 0
+        finally:
+            self.db.disconnect()
+
+    def _all_groups(self, cursor):
+        """Every (return_type, period) that has rows live, in the archive or in the rollups"""
+        groups = {tuple(row) for row in cursor.execute(
+            "SELECT DISTINCT ReturnType, Period FROM GSTReturnData").fetchall()}
+        for table in ('FilingRollup', 'StatusRollup'):
+            groups.update((row[0], period_from_ordinal(row[1])) for row in cursor.execute(
+                f"SELECT DISTINCT ReturnType, PeriodOrdinal FROM {table}").fetchall())
+        for financial_year in get_archive().archived_financial_years():
+            groups.update((return_type, period) for return_type in Config.GST_RETURNS
+                          for period in financial_year_periods(financial_year))
+        return groups
+
+    def _refresh_activity(self, position):
+        self.db.connect()
+        try:
+            cursor = self.db.connection.cursor()
+            top = cursor.execute("SELECT MAX(HistoryID) FROM ReturnStatusHistory").fetchone()
+            top = top[0] if top and top[0] else 0
+            if top <= (position or 0):
+                cursor.close()
+                return
+
+            rows = cursor.execute("""
+                SELECT DateValue(ChangedAt), ReturnType, ToStatus, COUNT(*)
+                FROM ReturnStatusHistory
+                WHERE HistoryID > ? AND HistoryID <= ?
+                GROUP BY DateValue(ChangedAt), ReturnType, ToStatus
+            """, (position or 0, top)).fetchall()
+            for day, return_type, code, count in rows:
+                day = _as_date(day)
+                cursor.execute("""
+                    UPDATE ActivityRollup SET TransitionCount = TransitionCount + ?
+                    WHERE ActivityDate = ? AND ReturnType = ? AND ToStatus = ?
+                """, (count, day, return_type, code))
+                if cursor.rowcount == 0:
+                    cursor.execute("""
+                        INSERT INTO ActivityRollup (ActivityDate, ReturnType, ToStatus, TransitionCount)
+                        VALUES (?, ?, ?, ?)
+                    """, (day, return_type, code, count))
+            self._save_position(cursor, ACTIVITY_POSITION, top, position is None)
+            self.db.connection.commit()
+            cursor.close()
+        except pyodbc.Error as e:
+            print(f"Activity rollup refresh error: {e}")
+            try:
+                self.db.connection.rollback()
+            except:
+                pass
+        finally:
+            self.db.disconnect()
+
+    # Reads --------------------------------------------------------------
+
+    def get_throughput(self, financial_year, return_types=None, period=None):
+        """Daily filed counts, per-obligation burn-down and status mix, and daily status activity"""
+        self.refresh()
+        calendar = get_calendar()
+        first, last, annual = financial_year_ordinals(financial_year)
+        conditions, params = ["(PeriodOrdinal BETWEEN ? AND ? OR PeriodOrdinal = ?)"], [first, last, annual]
+        if return_types:
+            conditions.append(f"ReturnType IN ({', '.join('?' * len(return_types))})")
+            params += list(return_types)
+        where = ' AND '.join(conditions)
+
+        start_year = int(financial_year[:4])
+        activity_params = [date(start_year, 4, 1), date(start_year + 1, 3, 31)] + list(return_types or [])
+        activity_filter = f"AND ReturnType IN ({', '.join('?' * len(return_types))})" if return_types else ""
+
+        self.db.connect()
+        filings = self.db.fetch_all(
+            f"SELECT ReturnType, PeriodOrdinal, FiledOn, FiledCount FROM FilingRollup WHERE {where}", params)
+        statuses = self.db.fetch_all(
+            f"SELECT ReturnType, PeriodOrdinal, StatusCode, ReturnCount FROM StatusRollup WHERE {where}", params)
+        activity = self.db.fetch_all(f"""
+            SELECT ActivityDate, ToStatus, SUM(TransitionCount)
+            FROM ActivityRollup
+            WHERE ActivityDate BETWEEN ? AND ? {activity_filter}
+            GROUP BY ActivityDate, ToStatus
+            ORDER BY ActivityDate
+        """, activity_params)
+        self.db.disconnect()
+
+        daily = {}
+        filed_by_obligation = {}
+        for return_type, ordinal, filed_on, count in filings:
+            filed_on = _as_date(filed_on)
+            filed_by_obligation.setdefault((return_type, ordinal), []).append((filed_on, count))
+            if filed_on:
+                day = daily.setdefault(filed_on, {})
+                day[return_type] = day.get(return_type, 0) + count
+
+        status_by_obligation = {}
+        for return_type, ordinal, code, count in statuses:
+            status_by_obligation.setdefault((return_type, ordinal), {})[Config.RETURN_STATUS[code]] = count
+
+        obligations = self.overdue.get_obligations(financial_year, return_types)
+        if period:
+            obligations = [o for o in obligations if o[1] == period]
+        counts = self.overdue.get_obligation_counts(obligations)
+
+        results = []
+        for return_type, obligation_period, due in obligations:
+            key = (return_type, calendar.ordinal(obligation_period))
+            applicable = counts[(return_type, obligation_period)]['applicable']
+            results.append(self._obligation(
+                return_type, obligation_period, due, applicable,
+                filed_by_obligation.get(key, []), status_by_obligation.get(key, {})))
+
+        activity_by_day = {}
+        for day, code, count in activity:
+            activity_by_day.setdefault(_as_date(day), {})[Config.RETURN_STATUS[code]] = count
+
+        return {
+            'financial_year': financial_year,
+            'daily_filed': [{'date': _format_date(day), 'filed': by_type, 'total': sum(by_type.values())}
+                            for day, by_type in sorted(daily.items())],
+            'obligations': results,
+            'activity': [{'date': _format_date(day), 'transitions': by_status}
+                         for day, by_status in sorted(activity_by_day.items())]
+        }
+
+    @staticmethod
+    def _obligation(return_type, period, due, applicable, filings, statuses):
+        """Burn-down of pending returns by filing date, and the status mix, for one obligation"""
+        undated = sum(count for filed_on, count in filings if not filed_on)
+        remaining = applicable - undated
+        burndown = []
+        remaining_at_due = None
+        for filed_on, count in sorted((f for f in filings if f[0]), key=lambda f: f[0]):
+            if remaining_at_due is None and due and filed_on > due:
+                remaining_at_due = max(remaining, 0)
+            remaining -= count
+            burndown.append({'date': _format_date(filed_on), 'filed': count, 'remaining': max(remaining, 0)})
+        if remaining_at_due is None:
+            remaining_at_due = max(remaining, 0)
+
+        # Applicable clients without a stored row are still at the first status
+        status_mix = {status: statuses.get(status, 0) for status in Config.RETURN_STATUS}
+        status_mix[Config.RETURN_STATUS[0]] += max(applicable - sum(statuses.values()), 0)
+
+        return {
+            'return_type': return_type,
+            'period': period,
+            'due_date': _format_date(due),
+            'applicable': applicable,
+            'filed': sum(count for _, count in filings),
+            'remaining': max(remaining, 0),
+            'remaining_at_due': remaining_at_due,
+            'burndown': burndown,
+            'status_distribution': status_mix
+        }